@@ -0,0 +1,69 @@
+import logging
+import signal
+import threading
+
+from BackEnd.MultiCameraSurveillanceSystem import MultiCameraSurveillanceSystem
+from BackEnd.common.EventBus import VIOLATION_DETECTED, SYSTEM_ERROR
+from BackEnd.core.Tracer import tracer
+
+
+def run_headless(config_file: str = "config/cameras.json", batch_size: int = 4, ingestion: str = "threads",
+                 columnar_log_dir: str = None, alert_audio: bool = False, metrics_port: int = None,
+                 trace_file: str = None, detection_cache_path: str = None) -> int:
+    """Chạy pipeline không có giao diện (máy chủ không màn hình), dừng bằng Ctrl+C hoặc SIGTERM.
+
+    Trả về mã thoát của tiến trình: 0 khi dừng bình thường, 1 khi hệ thống không khởi động được hoặc gặp
+    SYSTEM_ERROR (ví dụ không nạp được model).
+
+    ``trace_file``: ghi timeline từ lúc khởi động và xuất ra file này khi dừng. SIGUSR1 bật/tắt tracing
+    lúc đang chạy, mỗi lần tắt xuất một file trong thư mục traces. SIGUSR2 chạy SamplingProfiler trên các
+    thread pipeline trong ``profile_duration`` giây, kết quả nằm trong thư mục profiles.
+    """
+    logger = logging.getLogger("Headless")
+    system = MultiCameraSurveillanceSystem(config_file=config_file, batch_size=batch_size, ingestion=ingestion,
+                                           columnar_log_dir=columnar_log_dir, alert_audio=alert_audio,
+                                           metrics_port=metrics_port, detection_cache_path=detection_cache_path)
+    stop_event = threading.Event()
+    errors = []
+
+    def log_violation(camera_id, id1, id2, distance, timestamp, close_time, density, start_time):
+        logger.info(f"[{timestamp}] {camera_id}: ID {id1} - ID {id2} cách {distance:.2f}m trong {close_time:.1f}s "
+                    f"(mật độ {density:.2f})")
+
+    def on_error(message):
+        logger.error(f"Stopping after system error: {message}")
+        errors.append(message)
+        stop_event.set()
+
+    def request_stop(signum, frame):
+        stop_event.set()
+
+    def toggle_trace(signum, frame):
+        # Xuất file ngoài signal handler để không chặn thread chính giữa chừng
+        threading.Thread(target=tracer.toggle, name="TraceExport", daemon=True).start()
+
+    def start_profile(signum, frame):
+        system.profiler.start()
+
+    system.events.subscribe(VIOLATION_DETECTED, log_violation)
+    system.events.subscribe(SYSTEM_ERROR, on_error)
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+    if hasattr(signal, "SIGUSR1"):  # Không có trên Windows
+        signal.signal(signal.SIGUSR1, toggle_trace)
+        signal.signal(signal.SIGUSR2, start_profile)
+
+    if trace_file:
+        tracer.start()
+    system.start()
+    if not system.running:
+        return 1
+    try:
+        while system.running and not stop_event.wait(1.0):
+            pass
+    finally:
+        system.stop()
+        if trace_file:
+            tracer.stop()
+            tracer.export(trace_file)
+    return 1 if errors else 0
@@ -2,45 +2,166 @@ import json
 import logging
 import threading
 import time
-import numpy as np
 from datetime import datetime
-from PyQt5.QtCore import QObject, pyqtSignal
+from typing import Optional
+
+import cv2
+
+from BackEnd.config import latency_report_interval
 from BackEnd.core.ImprovedCameraWorker import ImprovedCameraWorker
+from BackEnd.core.PersonTracker import PersonTracker
 from BackEnd.core.BatchProcessor import BatchProcessor
-from BackEnd.core.TextToSpeech import TextToSpeech
+from BackEnd.core.AsyncIngestion import AsyncCameraIngestor
+from BackEnd.core.ConfigWatcher import ConfigWatcher
+from BackEnd.core.SnapshotWriter import SnapshotWriter
+from BackEnd.core.ClipRecorder import ClipRecorder
+from BackEnd.core.AlertAudioService import AlertAudioService
+from BackEnd.core.LatencyRecorder import LatencyRecorder
+from BackEnd.core.MetricsServer import MetricsServer
+from BackEnd.core.SamplingProfiler import SamplingProfiler
+from BackEnd.core.Tracer import tracer
 from BackEnd.data.DatabaseManager import DatabaseManager
-from BackEnd.common.DataClass import CameraConfig
+from BackEnd.data.ColumnarLog import ColumnarLog
+from BackEnd.data.DetectionCache import DetectionCache
+from BackEnd.data.RetentionManager import RetentionManager
+from BackEnd.common.DataClass import CameraConfig, DisplayProfile, RetentionPolicy
+from BackEnd.common.EventBus import (EventBus, FRAME_READY, VIOLATION_DETECTED, SYSTEM_STOPPED, SYSTEM_ERROR,
+                                     CAMERA_ADDED, CAMERA_REMOVED)
 
 
-class MultiCameraSurveillanceSystem(QObject):
-    # Tín hiệu để gửi dữ liệu đến GUI một cách an toàn
-    new_frame_ready = pyqtSignal(str, np.ndarray)
-    violation_detected = pyqtSignal(str, int, int, float, str, float, float)
-    system_stopped = pyqtSignal()
+class MultiCameraSurveillanceSystem:
+    """Pipeline giám sát không phụ thuộc Qt.
 
-    def __init__(self, config_file: str = "cameras.json", batch_size: int = 8):
-        super().__init__()
+    Kết quả được phát qua ``self.events`` (xem ``BackEnd.common.EventBus``): FRAME_READY,
+    VIOLATION_DETECTED, SYSTEM_ERROR và SYSTEM_STOPPED. Giao diện chỉ là một subscriber tùy chọn.
+    """
+
+    def __init__(self, config_file: str = "cameras.json", batch_size: int = 8, ingestion: str = "threads",
+                 max_decode_workers: int = 16, watch_config: bool = True, retention: RetentionPolicy = None,
+                 columnar_log_dir: str = None, detection_cache_path: str = None,
+                 alert_audio: bool = False, metrics_port: int = None, metrics_host: str = "127.0.0.1",
+                 db_path: str = "surveillance.db", detector=None):
+        self.init_time = time.time()
         self.config_file = config_file
         self.batch_size = batch_size
+        # "threads": mỗi camera một thread; "asyncio": một event loop cho tất cả camera
+        self.ingestion = ingestion
+        self.max_decode_workers = max_decode_workers
+        self.async_ingestor = None
+        self.watch_config = watch_config
+        self.config_watcher = None
+        self.config_lock = threading.Lock()
         self.cameras = {}
         self.camera_workers = {}
-        self.db_manager = DatabaseManager()
+        self.db_manager = DatabaseManager(db_path)
+        self.retention_policy = retention or RetentionPolicy()
+        self.retention_manager = None
+        # Thư mục lưu detection/track dạng cột cho phân tích offline (None = tắt)
+        self.columnar_log_dir = columnar_log_dir
+        self.columnar_log = None
+        self.latency = LatencyRecorder()
+        # Profiler lấy mẫu các thread pipeline, chỉ chạy khi được bật (profiler.start)
+        self.profiler = SamplingProfiler()
+        self.snapshot_writer = SnapshotWriter(latency=self.latency)
+        self.clip_recorder = ClipRecorder()
+        self.alert_audio_enabled = alert_audio
+        # Endpoint Prometheus /metrics (None = tắt)
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        self.metrics_server = None
+        self.alert_audio = None
+        self.display_profiles = {}
+        self._frame_published = {}
         self.running = False
         self.logger = logging.getLogger("SurveillanceSystem")
-        self.batch_processor = BatchProcessor(batch_size=self.batch_size)
+        self.events = EventBus()
+        # Cache detection cho camera là file video lặp lại (None = tắt, mặc định chỉ replay dùng cache)
+        self.detection_cache = DetectionCache(detection_cache_path) if detection_cache_path else None
+        # detector: thay YOLOv5 bằng detector khác (xem BatchProcessor), None = YOLOv5
+        self.batch_processor = BatchProcessor(batch_size=self.batch_size, detection_cache=self.detection_cache,
+                                              latency=self.latency, detector=detector)
+        self.first_result_time = None
+        self.startup_report = {}
         self.load_config()
-        # self.text_to_speech = TextToSpeech(voice="vi-VN-NamMinhNeural", rate="+50%", pitch="+50Hz")
+        self.config_loaded_time = time.time()
 
     def load_config(self):
         try:
-            with open(self.config_file, 'r') as f:
-                config = json.load(f)
-            for cam_config in config['cameras']:
-                self.cameras[cam_config['camera_id']] = CameraConfig(**cam_config)
+            self.cameras = self._read_camera_configs()
             self.logger.info(f"Loaded {len(self.cameras)} cameras from {self.config_file}")
         except Exception as e:
             self.logger.error(f"Error loading config: {e}. No cameras will be started.", exc_info=True)
 
+    def _read_camera_configs(self):
+        with open(self.config_file, 'r') as f:
+            config = json.load(f)
+        return {cam_config['camera_id']: CameraConfig(**cam_config) for cam_config in config['cameras']}
+
+    def _watched_paths(self):
+        return [self.config_file] + [PersonTracker.bev_config_path_for(worker.config)
+                                     for worker in self.camera_workers.values()]
+
+    def _on_config_files_changed(self, changed_paths):
+        with self.config_lock:
+            if not self.running:
+                return
+            if self.config_file in changed_paths:
+                self.reload_config()
+            for camera_id, worker in list(self.camera_workers.items()):
+                if PersonTracker.bev_config_path_for(worker.config) in changed_paths:
+                    worker.request_bev_reload()
+            self.config_watcher.set_paths(self._watched_paths())
+
+    def reload_config(self):
+        """Đọc lại cameras.json và áp dụng phần thay đổi mà không dừng pipeline.
+
+        Camera mới được tạo worker/tracker riêng, camera bị xoá được dừng, camera có cấu hình thay đổi
+        được cập nhật tại chỗ. BatchProcessor và trạng thái của các camera khác không bị ảnh hưởng.
+        """
+        try:
+            new_cameras = self._read_camera_configs()
+        except Exception as e:
+            self.logger.error(f"Error reloading config, keeping current cameras: {e}")
+            return
+        for camera_id in [cid for cid in self.cameras if cid not in new_cameras]:
+            self._remove_camera(camera_id)
+        for camera_id, config in new_cameras.items():
+            if camera_id not in self.cameras:
+                self._add_camera(config)
+            elif config != self.cameras[camera_id]:
+                self.cameras[camera_id] = config
+                self.camera_workers[camera_id].apply_config(config)
+
+    def _add_camera(self, config: CameraConfig):
+        worker = ImprovedCameraWorker(config, self.batch_processor, self.db_manager, self.columnar_log,
+                                      self.snapshot_writer, self.clip_recorder, self.latency)
+        if self.async_ingestor:
+            self.async_ingestor.add_worker(worker)
+        else:
+            worker.start()
+        self.cameras[config.camera_id] = config
+        self.camera_workers[config.camera_id] = worker
+        if self.alert_audio:
+            self.alert_audio.prepare([config.camera_id])
+        self.events.publish(CAMERA_ADDED, config.camera_id, config)
+        self.logger.info(f"Camera {config.camera_id} added")
+
+    def _remove_camera(self, camera_id: str):
+        self.cameras.pop(camera_id, None)
+        worker = self.camera_workers.pop(camera_id, None)
+        if worker is None:
+            return
+        if self.async_ingestor:
+            self.async_ingestor.remove_worker(camera_id)
+        else:
+            worker.stop()
+            if worker.is_alive():
+                worker.join(timeout=2.0)
+        self.display_profiles.pop(camera_id, None)
+        self._frame_published.pop(camera_id, None)
+        self.events.publish(CAMERA_REMOVED, camera_id)
+        self.logger.info(f"Camera {camera_id} removed")
+
     def start(self):
         if not self.cameras:
             self.logger.error("No cameras configured. System will not start.")
@@ -49,50 +170,172 @@ class MultiCameraSurveillanceSystem(QObject):
         self.logger.info("Starting Multi-Camera Surveillance System")
         self.running = True
         self.batch_processor.start()
+        if self.columnar_log_dir:
+            self.columnar_log = ColumnarLog(self.columnar_log_dir)
+        if self.alert_audio_enabled:
+            self.alert_audio = AlertAudioService()
+            self.alert_audio.prepare(self.cameras.keys())
+        if self.ingestion == "asyncio":
+            self.async_ingestor = AsyncCameraIngestor(max_decode_workers=self.max_decode_workers)
+            self.async_ingestor.start()
 
         for camera_id, config in self.cameras.items():
-            worker = ImprovedCameraWorker(config, self.batch_processor, self.db_manager)
-            worker.start()
+            worker = ImprovedCameraWorker(config, self.batch_processor, self.db_manager, self.columnar_log,
+                                          self.snapshot_writer, self.clip_recorder, self.latency)
+            if self.async_ingestor:
+                self.async_ingestor.add_worker(worker)
+            else:
+                worker.start()
             self.camera_workers[camera_id] = worker
 
-        self.result_thread = threading.Thread(target=self._process_batch_results, daemon=True)
+        if self.watch_config:
+            self.config_watcher = ConfigWatcher(self._watched_paths(), self._on_config_files_changed)
+            self.config_watcher.start()
+
+        if self.retention_policy.enabled:
+            self.retention_manager = RetentionManager(self.db_manager.db_path, self.retention_policy)
+            self.retention_manager.start()
+
+        self.latency.start_reporting(self.db_manager, latency_report_interval)
+        if self.metrics_port is not None:
+            try:
+                self.metrics_server = MetricsServer(self, self.metrics_host, self.metrics_port)
+                self.metrics_server.start()
+            except OSError as e:
+                self.logger.error(f"Cannot start metrics endpoint on {self.metrics_host}:{self.metrics_port}: {e}")
+
+        self.result_thread = threading.Thread(target=self._process_batch_results, name="ResultProcessor", daemon=True)
         self.result_thread.start()
+        threading.Thread(target=self._report_startup, name="StartupReport", daemon=True).start()
+
+    def _report_startup(self, timeout: float = 120.0):
+        """Chờ model và camera sẵn sàng rồi ghi log thời gian của từng giai đoạn khởi động"""
+        deadline = time.time() + timeout
+        self.batch_processor.model_ready.wait(timeout)
+        while self.running and time.time() < deadline:
+            if self.batch_processor.model_failed.is_set():
+                return
+            if self.first_result_time and all(w.first_frame_time for w in self.camera_workers.values()):
+                break
+            time.sleep(0.1)
+
+        def elapsed(t):
+            return round(t - self.init_time, 2) if t else None
+
+        self.startup_report = {
+            'config': elapsed(self.config_loaded_time),
+            'model': round(self.batch_processor.model_load_time, 2) if self.batch_processor.model_load_time else None,
+            'cameras': {camera_id: elapsed(w.first_frame_time) for camera_id, w in self.camera_workers.items()},
+            'first_result': elapsed(self.first_result_time),
+        }
+        cameras = ", ".join(f"{camera_id} {t}s" if t is not None else f"{camera_id} not ready"
+                            for camera_id, t in self.startup_report['cameras'].items())
+        self.logger.info(f"Startup timing: config {self.startup_report['config']}s, "
+                         f"model load {self.startup_report['model']}s, first frame: {cameras}, "
+                         f"first result {self.startup_report['first_result']}s")
+
+    def set_display_profile(self, camera_id: str, max_width: int = 0, max_fps: float = None):
+        """Khai báo độ phân giải và tốc độ khung hình mà giao diện cần cho camera.
+
+        Frame phát qua FRAME_READY được thu nhỏ về ``max_width`` và giới hạn ``max_fps`` ngay trên
+        backend; ``max_fps=0`` ngừng gửi frame (camera vẫn được xử lý bình thường). Camera chưa có
+        profile nhận frame đầy đủ.
+        """
+        self.display_profiles[camera_id] = DisplayProfile(max_width, max_fps)
+
+    def _display_width(self, camera_id: str) -> Optional[int]:
+        """Độ rộng frame giao diện cần cho lần phát tới của camera (0 = giữ nguyên), None nếu không cần phát"""
+        if not self.events.has_subscribers(FRAME_READY):
+            return None
+        profile = self.display_profiles.get(camera_id)
+        if profile is None:
+            return 0
+        if profile.max_fps is not None:
+            now = time.time()
+            if profile.max_fps <= 0 or now - self._frame_published.get(camera_id, 0.0) < 1.0 / profile.max_fps:
+                return None
+            self._frame_published[camera_id] = now
+        return profile.max_width
+
+    def _publish_frame(self, camera_id: str, frame, display_width: int):
+        # Frame vẽ ở độ phân giải gốc (khi đang ghi clip/ảnh vi phạm) vẫn cần thu nhỏ trước khi phát
+        height, width = frame.shape[:2]
+        if display_width and width > display_width:
+            frame = cv2.resize(frame, (display_width, max(int(height * display_width / width), 1)),
+                               interpolation=cv2.INTER_AREA)
+        self.events.publish(FRAME_READY, camera_id, frame)
 
     def _process_batch_results(self):
         while self.running:
             try:
                 batch_result = self.batch_processor.get_results()
                 if batch_result is None:
+                    if self.batch_processor.model_failed.is_set():
+                        self.logger.error("Detection model could not be loaded, no frame will be processed")
+                        self.events.publish(SYSTEM_ERROR, "Không nạp được model phát hiện người")
+                        return
                     time.sleep(0.005)
                     continue
+                if self.first_result_time is None:
+                    self.first_result_time = time.time()
 
+                frame_ids = batch_result.frame_ids or {}
+                frame_timestamps = batch_result.frame_timestamps or {}
                 for camera_id, detections in batch_result.camera_results.items():
                     worker = self.camera_workers.get(camera_id)
                     if worker and worker.is_active:
                         frame = worker.get_latest_frame()
                         if frame is not None:
-                            result = worker.process_detections(detections, frame)
-                            self.new_frame_ready.emit(camera_id, result.frame)
-                            for id1, id2, distance, closetime, quantity_per_acre in result.close_pairs:
-                                text = f"{camera_id} có vi phạm khoảng cách"
-                                # self.text_to_speech.play(text, load=f"Backend/audio/{camera_id}_violation.mp3")
-                                timestamp_str = datetime.now().strftime("%H:%M:%S")
-                                self.violation_detected.emit(camera_id, id1, id2, distance, timestamp_str, closetime,
-                                                             quantity_per_acre)
+                            display_width = self._display_width(camera_id)
+                            with tracer.span("process_detections", camera_id, frame_id=frame_ids.get(camera_id)):
+                                tracer.flow("f", f"{camera_id}/{frame_ids.get(camera_id)}")
+                                result = worker.process_detections(detections, frame, display_width)
+                            if display_width is not None:
+                                with tracer.span("publish_frame", camera_id):
+                                    self._publish_frame(camera_id, result.frame, display_width)
+                            submitted = frame_timestamps.get(camera_id)
+                            if submitted is not None:
+                                # Từ lúc camera worker gửi frame tới khi kết quả được phát đi
+                                self.latency.record(camera_id, "end_to_end", time.time() - submitted)
+                            if result.close_pairs and self.alert_audio:
+                                self.alert_audio.alert(camera_id)
+                            for id1, id2, distance, closetime, quantity_per_acre, start_time in result.close_pairs:
+                                timestamp_str = datetime.fromtimestamp(start_time).strftime("%d/%m %H:%M:%S")
+                                self.events.publish(VIOLATION_DETECTED, camera_id, id1, id2, distance, timestamp_str,
+                                                    closetime, quantity_per_acre, start_time)
             except Exception as e:
                 self.logger.error(f"Error processing batch results: {e}", exc_info=True)
                 time.sleep(0.01)
 
     def stop(self):
         self.logger.info("Stopping surveillance system...")
-        self.running = False
+        with self.config_lock:
+            self.running = False
+        if self.config_watcher:
+            self.config_watcher.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        self.profiler.stop()
+        if self.retention_manager:
+            self.retention_manager.stop()
         if self.batch_processor:
             self.batch_processor.stop()
+        if self.async_ingestor:
+            self.async_ingestor.stop()
         for worker in self.camera_workers.values():
             worker.stop()
         for worker in self.camera_workers.values():
             if worker.is_alive():
                 worker.join(timeout=2.0)
-        # self.text_to_speech.stop()
+        self.snapshot_writer.stop()
+        self.clip_recorder.stop()
+        if self.alert_audio:
+            self.alert_audio.stop()
+        if self.columnar_log:
+            self.columnar_log.stop()
+        if self.detection_cache:
+            self.detection_cache.close()
+        self.latency.stop()
+        self.db_manager.stop()
         self.logger.info("Surveillance system stopped.")
-        self.system_stopped.emit()
+        self.events.publish(SYSTEM_STOPPED)
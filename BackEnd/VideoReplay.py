@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import time
+from dataclasses import replace
+from typing import Dict, List, Tuple
+
+import cv2
+
+from BackEnd.core.BatchProcessor import BatchProcessor
+from BackEnd.core.FFmpegCapture import FFmpegCapture
+from BackEnd.core.ImprovedCameraWorker import ImprovedCameraWorker
+from BackEnd.core.SnapshotWriter import SnapshotWriter
+from BackEnd.data.DatabaseManager import DatabaseManager
+from BackEnd.data.ColumnarLog import ColumnarLog
+from BackEnd.data.DetectionCache import DetectionCache
+from BackEnd.common.DataClass import CameraConfig
+
+
+class FootageClock:
+    """Thời điểm của frame đang xử lý theo footage: lúc bắt đầu quay + số frame đã xử lý / FPS"""
+
+    def __init__(self, start_time: float, fps: float = 30.0):
+        self.start_time = start_time
+        self.fps = fps
+        self.frame_index = 0
+
+    def __call__(self) -> float:
+        return self.start_time + self.frame_index / self.fps
+
+
+class VideoReplay:
+    """Phân tích lại video lưu trữ nhanh nhất phần cứng cho phép.
+
+    Không giữ nhịp thời gian thực và không bỏ frame: frame của các video được lấy lần lượt theo
+    vòng (round-robin) cho tới khi đầy batch, nên thứ tự xử lý luôn xác định. Kết quả tracking và
+    vi phạm được ghi vào database qua ``ImprovedCameraWorker.process_detections`` như chế độ trực tiếp,
+    với thời điểm tính theo footage (``start_times`` hoặc mtime của file trừ độ dài video) chứ không theo lúc chạy.
+    """
+
+    def __init__(self, videos: List[Tuple[str, str]], config_file: str = None, batch_size: int = 16,
+                 db_manager: DatabaseManager = None, columnar_log_dir: str = None,
+                 detection_cache: DetectionCache = None, start_times: Dict[str, float] = None):
+        self.logger = logging.getLogger("VideoReplay")
+        self.start_times = start_times or {}
+        self.batch_size = batch_size
+        self.db_manager = db_manager or DatabaseManager()
+        self.columnar_log = ColumnarLog(columnar_log_dir) if columnar_log_dir else None
+        self.snapshot_writer = SnapshotWriter()
+        self.camera_configs = self._build_configs(videos, config_file)
+        self.batch_processor = BatchProcessor(batch_size=batch_size, detection_cache=detection_cache)
+
+    def _build_configs(self, videos: List[Tuple[str, str]], config_file: str) -> List[CameraConfig]:
+        known = {}
+        if config_file and os.path.exists(config_file):
+            with open(config_file, 'r') as f:
+                known = {cam['camera_id']: CameraConfig(**cam) for cam in json.load(f)['cameras']}
+        configs = []
+        for camera_id, path in videos:
+            base = known.get(camera_id) or CameraConfig(camera_id=camera_id, source=path, position="Replay")
+            configs.append(replace(base, source=path, loop_video=False))
+        return configs
+
+    def run(self) -> Dict:
+        start_time = time.time()
+        # Nạp model song song với việc mở các file video
+        self.batch_processor.load_model_async()
+        workers = []
+        for config in self.camera_configs:
+            clock = FootageClock(0.0)
+            worker = ImprovedCameraWorker(config, self.batch_processor, self.db_manager, self.columnar_log,
+                                          self.snapshot_writer, clock=clock)
+            worker._open_video_source()
+            if worker.cap is None or not worker.cap.isOpened():
+                self.logger.error(f"Cannot open video {config.source}, skipping.")
+                continue
+            clock.fps = worker.tracker.current_fps
+            clock.start_time = self._source_start_time(config, worker.cap, clock.fps)
+            workers.append(worker)
+
+        if not self.batch_processor.wait_until_ready():
+            raise RuntimeError("YOLOv5 model could not be loaded")
+        active = list(workers)
+        total_frames = 0
+        inference_time = 0.0
+        batches = 0
+        while active:
+            batch = self._fill_batch(active)
+            if not batch:
+                break
+            frames = [frame for _, frame, _ in batch]
+            thresholds = [worker.config.confidence_threshold for worker, _, _ in batch]
+            cache_keys = [cache_key for _, _, cache_key in batch]
+            batch_start = time.time()
+            detections = self.batch_processor.detect(frames, thresholds, cache_keys)
+            inference_time += time.time() - batch_start
+            batches += 1
+            for (worker, frame, _), camera_detections in zip(batch, detections):
+                worker.clock.frame_index = worker.frame_count
+                worker.frame_count += 1
+                worker.process_detections(camera_detections, frame, display_width=None)
+            total_frames += len(batch)
+
+        for worker in workers:
+            stats = worker.tracker.get_statistics()
+            self.db_manager.log_statistics(worker.config.camera_id, stats['total_tracks'], stats['active_tracks'],
+                                           stats['violations'], worker.clock())
+            worker.cleanup()
+
+        elapsed = time.time() - start_time
+        fps = total_frames / elapsed if elapsed > 0 else 0.0
+        if batches:
+            self.db_manager.log_performance(self.batch_size, inference_time / batches, fps)
+        self.snapshot_writer.stop()
+        self.db_manager.flush()
+        if self.columnar_log:
+            self.columnar_log.stop()
+        report = {
+            'videos': {worker.config.camera_id: worker.frame_count for worker in workers},
+            'frames': total_frames,
+            'batches': batches,
+            'elapsed': elapsed,
+            'fps': fps,
+            'inference_time': inference_time,
+        }
+        cache = self.batch_processor.detection_cache
+        if cache is not None:
+            cache.flush()
+            report['cache_hits'] = cache.hits
+            report['cache_misses'] = cache.misses
+        self.logger.info(f"Replayed {total_frames} frames from {len(workers)} videos in {elapsed:.1f}s "
+                         f"({fps:.1f} FPS, inference {inference_time:.1f}s)")
+        return report
+
+    def _source_start_time(self, config: CameraConfig, cap, fps: float) -> float:
+        """Thời điểm bắt đầu quay: ``start_times`` nếu có, không thì mtime của file (lúc quay xong) trừ độ dài video"""
+        if config.camera_id in self.start_times:
+            return self.start_times[config.camera_id]
+        try:
+            modified = os.path.getmtime(config.source)
+        except OSError:
+            self.logger.warning(f"Unknown start time for {config.source}, using current time")
+            return time.time()
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) if not isinstance(cap, FFmpegCapture) else 0
+        return modified - max(frames, 0) / fps
+
+    def _fill_batch(self, active: List[ImprovedCameraWorker]) -> List[Tuple[ImprovedCameraWorker, object, tuple]]:
+        """Lấy frame lần lượt từ từng video cho tới khi đầy batch; video đã hết bị loại khỏi ``active``"""
+        batch = []
+        while active and len(batch) < self.batch_size:
+            for worker in list(active):
+                ret, frame = worker.cap.read()
+                if not ret:
+                    active.remove(worker)
+                    continue
+                if isinstance(worker.cap, FFmpegCapture):
+                    # Buffer của pipe được dùng vòng tròn, cần giữ bản sao cho tới khi xử lý xong batch
+                    frame = frame.copy()
+                batch.append((worker, frame, worker.cache_key(frame)))
+                worker.source_frame_index += 1
+                if len(batch) >= self.batch_size:
+                    break
+        return batch
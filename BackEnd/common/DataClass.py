@@ -17,6 +17,8 @@ class BatchResult:
     camera_results: Dict[str, List[Dict]]
     processing_time: float
     timestamp: float
+    frame_ids: Dict[str, int] = None  # camera_id -> frame_id của frame đã đưa vào batch
+    frame_timestamps: Dict[str, float] = None  # camera_id -> thời điểm camera worker gửi frame đó
 
 
 @dataclass
@@ -25,7 +27,7 @@ class DetectionResult:
     frame_id: int
     timestamp: float
     detections: List[Dict]
-    close_pairs: List[Tuple[int, int, float]]
+    close_pairs: List[Tuple[int, int, float, float, float, float]]  # id1, id2, khoảng cách, TGTX, mật độ, bắt đầu
     frame: np.ndarray = None
 
 
@@ -43,3 +45,49 @@ class CameraConfig:
     frame_height: int = 480
     frame_width: int = 640
     acreage: int = 50
+    capture_backend: str = "opencv"
+    decode_width: int = None
+    decode_height: int = None
+    pre_event_seconds: float = 5.0
+    post_event_seconds: float = 5.0
+    bev_config: str = None  # File hiệu chỉnh BEV, mặc định config_BEV_<camera_id>.json trong dir_bevConfig
+
+
+@dataclass
+class ViolationEpisode:
+    camera_id: str
+    person_id1: int
+    person_id2: int
+    start_time: float
+    min_distance: float
+    end_time: float = None
+    snapshot: str = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end_time - self.start_time) if self.end_time is not None else 0.0
+
+
+@dataclass
+class RetentionPolicy:
+    """Thời gian giữ dữ liệu (ngày); None là giữ mãi"""
+    enabled: bool = True
+    statistics_days: float = 7
+    events_days: float = 30
+    episodes_days: float = 90
+    performance_days: float = 30
+    hourly_rollup_days: float = 30
+    daily_rollup_days: float = None
+    interval: float = 3600.0
+    initial_delay: float = 60.0
+    slice_rows: int = 500
+    vacuum_pages: int = 256
+    slice_pause: float = 0.05
+
+
+@dataclass
+class DisplayProfile:
+    """Nhu cầu hiển thị của một ô camera: chiều rộng tối đa (0 = giữ nguyên) và FPS tối đa
+    (None = không giới hạn, 0 = không gửi frame)"""
+    max_width: int = 0
+    max_fps: float = None
@@ -0,0 +1,48 @@
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable
+
+# Tên các sự kiện do MultiCameraSurveillanceSystem phát ra
+FRAME_READY = "new_frame_ready"  # (camera_id, frame)
+# (camera_id, id1, id2, distance, timestamp_str, close_time, density, start_time); start_time là thời điểm bắt đầu
+# của episode, trùng với violation_episodes.start_time
+VIOLATION_DETECTED = "violation_detected"
+SYSTEM_STOPPED = "system_stopped"  # ()
+SYSTEM_ERROR = "system_error"  # (message,) lỗi khiến hệ thống không thể xử lý tiếp, ví dụ không nạp được model
+CAMERA_ADDED = "camera_added"  # (camera_id, CameraConfig)
+CAMERA_REMOVED = "camera_removed"  # (camera_id,)
+
+
+class EventBus:
+    """Bus sự kiện publish/subscribe đơn giản, không phụ thuộc Qt.
+
+    Callback được gọi đồng bộ trên thread phát sự kiện, vì vậy callback cần ngắn gọn; giao diện
+    muốn cập nhật widget phải tự chuyển dữ liệu sang GUI thread (ví dụ qua pyqtSignal).
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger("EventBus")
+
+    def subscribe(self, event: str, callback: Callable):
+        with self._lock:
+            self._subscribers[event].append(callback)
+
+    def unsubscribe(self, event: str, callback: Callable):
+        with self._lock:
+            if callback in self._subscribers[event]:
+                self._subscribers[event].remove(callback)
+
+    def has_subscribers(self, event: str) -> bool:
+        return bool(self._subscribers.get(event))
+
+    def publish(self, event: str, *args):
+        with self._lock:
+            callbacks = list(self._subscribers.get(event, ()))
+        for callback in callbacks:
+            try:
+                callback(*args)
+            except Exception as e:
+                self.logger.error(f"Error in subscriber of '{event}': {e}", exc_info=True)
@@ -1,2 +1,39 @@
 dir_bevConfig = r"config\\"
 dir_capture = r"capture\\"
+
+# Ảnh vi phạm (SnapshotWriter)
+snapshot_jpeg_quality = 85
+snapshot_max_width = 1280  # Ảnh rộng hơn sẽ được thu nhỏ trước khi lưu
+snapshot_min_interval = 1.0  # Mỗi camera lưu tối đa một ảnh trong khoảng thời gian này (giây)
+snapshot_workers = 2
+snapshot_max_pending = 32
+
+# Clip quanh vi phạm (ClipRecorder)
+dir_recording = r"recordings\\"  # Dùng khi camera không khai báo recording_path
+clip_jpeg_quality = 70
+clip_max_width = 960
+clip_encoder_workers = 2
+clip_max_pending = 16
+clip_max_buffer_bytes = 32 * 1024 * 1024  # Giới hạn ring buffer của mỗi camera
+clip_max_clip_bytes = 128 * 1024 * 1024  # Clip dài hơn sẽ được chốt sớm
+
+# Cảnh báo âm thanh (AlertAudioService)
+dir_audio = r"BackEnd\\audio\\"  # Clip đã tổng hợp sẵn: {camera_id}_{template}_{hash}.mp3/.wav
+alert_voice = "vi-VN-NamMinhNeural"
+alert_rate = "+50%"
+alert_pitch = "+50Hz"
+alert_templates = {"violation": "{camera_id} có vi phạm khoảng cách"}
+alert_coalesce_window = 10.0  # Các cảnh báo lặp lại của cùng camera trong khoảng này (giây) chỉ phát một lần
+alert_max_queue = 8
+
+# Thống kê thời gian xử lý (LatencyRecorder)
+latency_report_interval = 60.0  # Chu kỳ ghi percentile của từng camera/giai đoạn vào bảng performance (giây)
+
+# Ghi timeline theo frame/batch (Tracer), xem bằng chrome://tracing hoặc ui.perfetto.dev
+dir_trace = r"traces\\"
+trace_max_events = 200000  # Buffer vòng trong bộ nhớ, sự kiện cũ nhất bị bỏ khi đầy
+
+# Lấy mẫu stack của các thread pipeline (SamplingProfiler), xem bằng flamegraph.pl hoặc speedscope
+dir_profile = r"profiles\\"
+profile_interval = 0.01  # Khoảng cách giữa hai lần lấy mẫu (giây)
+profile_duration = 30.0  # Thời gian mỗi lần profile khi bật lúc đang chạy (giây)
@@ -0,0 +1,177 @@
+import hashlib
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import BackEnd.config as config
+from BackEnd.core.AlertSynthesizer import EdgeTTSSynthesizer, ToneSynthesizer
+
+
+class AlertAudioService:
+    """Phát cảnh báo âm thanh ở background, không bao giờ chặn thread xử lý kết quả.
+
+    ``alert`` chỉ kiểm tra cửa sổ gộp rồi đưa yêu cầu vào một hàng đợi có giới hạn: cảnh báo lặp lại
+    của cùng camera trong ``coalesce_window`` giây được gộp làm một, hàng đợi đầy hoặc cảnh báo đã chờ
+    quá lâu thì bị bỏ, nên âm thanh không dồn lại khi có nhiều vi phạm liên tiếp. Mỗi cặp camera và mẫu
+    câu có một clip tổng hợp sẵn trong ``audio_dir`` (``{camera_id}_{template}_{hash}.mp3`` hoặc ``.wav``,
+    hash của câu cảnh báo và thông số giọng nên đổi câu hoặc giọng sẽ tạo clip mới), được tạo trước bằng
+    ``prepare``. Bộ tổng hợp được thử lần lượt theo ``synthesizers`` (mặc định edge-tts rồi tiếng bíp
+    offline); bộ nào lỗi sẽ bị bỏ qua trong ``retry_after`` giây.
+    """
+
+    def __init__(self, audio_dir: str = config.dir_audio, synthesizers: List = None,
+                 templates: Dict[str, str] = None, coalesce_window: float = config.alert_coalesce_window,
+                 max_queue: int = config.alert_max_queue, max_delay: float = None, retry_after: float = 300.0,
+                 player_command: List[str] = None):
+        self.audio_dir = audio_dir
+        self.synthesizers = synthesizers or [EdgeTTSSynthesizer(), ToneSynthesizer()]
+        self.templates = templates or config.alert_templates
+        self.coalesce_window = coalesce_window
+        self.max_delay = max_delay if max_delay is not None else coalesce_window
+        self.retry_after = retry_after
+        self.player_command = player_command or ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet"]
+        self.logger = logging.getLogger("AlertAudio")
+        self.alert_queue = queue.Queue(maxsize=max_queue)
+        self.prepare_queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._last_alert: Dict[Tuple[str, str], float] = {}
+        self._failed_until: Dict[str, float] = {}
+        self._process: Optional[subprocess.Popen] = None
+        self.player_available = True
+        self.played = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.stale = 0
+        self.running = True
+        os.makedirs(audio_dir, exist_ok=True)
+        self.player_thread = threading.Thread(target=self._player_loop, name="AlertAudio", daemon=True)
+        self.prepare_thread = threading.Thread(target=self._prepare_loop, name="AlertAudioPrepare", daemon=True)
+        self.player_thread.start()
+        self.prepare_thread.start()
+
+    def alert(self, camera_id: str, template: str = "violation") -> bool:
+        """Yêu cầu phát cảnh báo; trả về False nếu bị gộp hoặc bị bỏ (không bao giờ chờ)"""
+        now = time.time()
+        key = (camera_id, template)
+        with self._lock:
+            if not self.running:
+                return False
+            last = self._last_alert.get(key)
+            if last is not None and now - last < self.coalesce_window:
+                self.coalesced += 1
+                return False
+            self._last_alert[key] = now
+        try:
+            self.alert_queue.put_nowait((camera_id, template, now))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def prepare(self, camera_ids: Iterable[str]):
+        """Tổng hợp trước clip của các camera (ở background) để lần cảnh báo đầu tiên không phải chờ"""
+        for camera_id in camera_ids:
+            for template in self.templates:
+                self.prepare_queue.put((camera_id, template))
+
+    def _clip_path(self, camera_id: str, template: str, synthesizer) -> str:
+        text = self.templates[template].format(camera_id=camera_id)
+        digest = hashlib.sha1(f"{text}|{synthesizer.name}|{synthesizer.settings}".encode()).hexdigest()[:8]
+        return os.path.join(self.audio_dir, f"{camera_id}_{template}_{digest}.{synthesizer.extension}")
+
+    def _find_clip(self, camera_id: str, template: str) -> Optional[str]:
+        for synthesizer in self.synthesizers:
+            path = self._clip_path(camera_id, template, synthesizer)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _render(self, camera_id: str, template: str) -> Optional[str]:
+        """Tạo clip bằng bộ tổng hợp ưu tiên nhất còn dùng được; dừng ở clip đã có sẵn"""
+        text = self.templates[template].format(camera_id=camera_id)
+        with self._render_lock:
+            for synthesizer in self.synthesizers:
+                path = self._clip_path(camera_id, template, synthesizer)
+                if os.path.exists(path):
+                    return path
+                if time.time() < self._failed_until.get(synthesizer.name, 0.0):
+                    continue
+                tmp_path = f"{path}.tmp"
+                try:
+                    synthesizer.synthesize(text, tmp_path)
+                    os.replace(tmp_path, path)
+                    self.logger.info(f"Synthesized alert clip {path} with {synthesizer.name}")
+                    return path
+                except Exception as e:
+                    self._failed_until[synthesizer.name] = time.time() + self.retry_after
+                    self.logger.warning(f"Synthesizer {synthesizer.name} failed for {camera_id}: {e}")
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+        return None
+
+    def _prepare_loop(self):
+        while True:
+            item = self.prepare_queue.get()
+            if item is None:
+                break
+            try:
+                self._render(*item)
+            except Exception as e:
+                self.logger.error(f"Error preparing alert clip for {item[0]}: {e}")
+
+    def _player_loop(self):
+        while True:
+            item = self.alert_queue.get()
+            if item is None:
+                break
+            camera_id, template, requested_at = item
+            if time.time() - requested_at > self.max_delay:
+                self.stale += 1
+                continue
+            try:
+                path = self._find_clip(camera_id, template) or self._render(camera_id, template)
+                if path is not None:
+                    self._play(path)
+            except Exception as e:
+                self.logger.error(f"Error playing alert for {camera_id}: {e}")
+
+    def _play(self, path: str):
+        if not self.player_available:
+            return
+        try:
+            self._process = subprocess.Popen(self.player_command + [path], stdin=subprocess.DEVNULL,
+                                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            self.player_available = False
+            self.logger.error(f"Audio player '{self.player_command[0]}' not found, alert audio disabled")
+            return
+        try:
+            self._process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        self.played += 1
+
+    def stop(self):
+        with self._lock:
+            if not self.running:
+                return
+            self.running = False
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+        # Bỏ các cảnh báo chưa phát để chỗ cho tín hiệu dừng trong hàng đợi có giới hạn
+        while True:
+            try:
+                self.alert_queue.get_nowait()
+            except queue.Empty:
+                break
+        self.alert_queue.put(None)
+        self.prepare_queue.put(None)
+        self.player_thread.join(timeout=2.0)
+        self.logger.info(f"Alert audio stopped ({self.played} played, {self.coalesced} coalesced, "
+                         f"{self.dropped} dropped, {self.stale} stale)")
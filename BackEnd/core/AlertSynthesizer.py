@@ -0,0 +1,60 @@
+import asyncio
+import math
+import struct
+import wave
+
+import BackEnd.config as config
+
+
+class EdgeTTSSynthesizer:
+    """Đọc nội dung cảnh báo bằng giọng edge-tts (cần mạng), lưu thành file mp3"""
+    name = "edge-tts"
+    extension = "mp3"
+
+    def __init__(self, voice: str = config.alert_voice, rate: str = config.alert_rate,
+                 pitch: str = config.alert_pitch, timeout: float = 15.0):
+        self.voice = voice
+        self.rate = rate
+        self.pitch = pitch
+        self.timeout = timeout
+
+    @property
+    def settings(self) -> str:
+        """Các thông số ảnh hưởng tới clip, dùng để đặt tên file clip"""
+        return f"{self.voice}|{self.rate}|{self.pitch}"
+
+    def synthesize(self, text: str, path: str):
+        from edge_tts import Communicate
+
+        communicate = Communicate(text, self.voice, rate=self.rate, pitch=self.pitch)
+        asyncio.run(asyncio.wait_for(communicate.save(path), self.timeout))
+
+
+class ToneSynthesizer:
+    """Phương án dự phòng offline: tiếng bíp WAV, không cần mạng hay thư viện ngoài"""
+    name = "tone"
+    extension = "wav"
+
+    def __init__(self, frequency: float = 880.0, beeps: int = 3, beep_seconds: float = 0.15,
+                 gap_seconds: float = 0.1, sample_rate: int = 16000, volume: float = 0.5):
+        self.frequency = frequency
+        self.beeps = beeps
+        self.beep_seconds = beep_seconds
+        self.gap_seconds = gap_seconds
+        self.sample_rate = sample_rate
+        self.volume = volume
+
+    @property
+    def settings(self) -> str:
+        return f"{self.frequency}|{self.beeps}|{self.beep_seconds}|{self.gap_seconds}|{self.sample_rate}|{self.volume}"
+
+    def synthesize(self, text: str, path: str):
+        beep = [int(32767 * self.volume * math.sin(2 * math.pi * self.frequency * i / self.sample_rate))
+                for i in range(int(self.beep_seconds * self.sample_rate))]
+        gap = [0] * int(self.gap_seconds * self.sample_rate)
+        samples = (beep + gap) * self.beeps
+        with wave.open(path, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.sample_rate)
+            f.writeframes(struct.pack(f"<{len(samples)}h", *samples))
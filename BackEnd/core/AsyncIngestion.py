@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from BackEnd.core.ImprovedCameraWorker import ImprovedCameraWorker
+
+
+class AsyncCameraIngestor:
+    """Đọc frame từ nhiều camera trên một event loop asyncio duy nhất.
+
+    Thay vì một OS thread cho mỗi camera, mỗi camera là một coroutine: các lời gọi chặn của OpenCV
+    (mở nguồn, grab/read/decode) chạy trong một thread pool có giới hạn, còn việc chờ giữ nhịp FPS
+    và chờ kết nối lại dùng ``asyncio.sleep`` nên không giữ thread nào. Các ``ImprovedCameraWorker``
+    được dùng lại nguyên vẹn (không gọi ``start()``), vì vậy frame vẫn đi vào
+    ``BatchProcessor.add_frame`` như chế độ thread.
+    """
+
+    def __init__(self, max_decode_workers: int = 16):
+        self.max_decode_workers = max_decode_workers
+        self.logger = logging.getLogger("AsyncIngestion")
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.loop_thread: Optional[threading.Thread] = None
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.workers: Dict[str, ImprovedCameraWorker] = {}
+        self._loop_ready = threading.Event()
+
+    def start(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.max_decode_workers, thread_name_prefix="Decode")
+        self.loop_thread = threading.Thread(target=self._run_loop, name="AsyncIngestion", daemon=True)
+        self.loop_thread.start()
+        self._loop_ready.wait()
+        self.logger.info(f"Async ingestion started with {self.max_decode_workers} decode workers")
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._loop_ready.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    def add_worker(self, worker: ImprovedCameraWorker):
+        """Bắt đầu đọc một camera (có thể gọi từ bất kỳ thread nào)"""
+        self.workers[worker.config.camera_id] = worker
+        self.loop.call_soon_threadsafe(self._spawn, worker)
+
+    def remove_worker(self, camera_id: str, timeout: float = 5.0):
+        """Dừng một camera và chờ coroutine của nó kết thúc"""
+        worker = self.workers.pop(camera_id, None)
+        if worker is None:
+            return
+        worker.stop()
+        future = asyncio.run_coroutine_threadsafe(self._wait_task(camera_id), self.loop)
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            self.logger.warning(f"Camera {camera_id} did not stop cleanly: {e}")
+
+    def _spawn(self, worker: ImprovedCameraWorker):
+        camera_id = worker.config.camera_id
+        self.tasks[camera_id] = self.loop.create_task(self._ingest(worker), name=f"Ingest-{camera_id}")
+
+    async def _wait_task(self, camera_id: str):
+        task = self.tasks.pop(camera_id, None)
+        if task is not None:
+            await task
+
+    async def _ingest(self, worker: ImprovedCameraWorker):
+        worker.running = True
+        worker.logger.info(f"Starting camera {worker.config.camera_id} (async)")
+        try:
+            while worker.running:
+                opened = await self.loop.run_in_executor(self.executor, worker._ensure_source_open)
+                if not opened:
+                    await asyncio.sleep(worker.reconnect_delay)
+                    continue
+                keep_running = await self.loop.run_in_executor(self.executor, worker._capture_once)
+                if not keep_running:
+                    break
+                delay = worker._pace_delay()
+                # Luôn nhường event loop để một nguồn không chiếm hết loop
+                await asyncio.sleep(max(delay, 0))
+        except Exception as e:
+            worker.logger.error(f"Error in async ingestion for {worker.config.camera_id}: {e}", exc_info=True)
+            worker.is_active = False
+        finally:
+            await self.loop.run_in_executor(self.executor, worker.cleanup)
+
+    def stop(self, timeout: float = 5.0):
+        if self.loop is None:
+            return
+        for worker in self.workers.values():
+            worker.stop()
+
+        async def _drain():
+            if self.tasks:
+                await asyncio.wait(list(self.tasks.values()), timeout=timeout)
+            self.tasks.clear()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_drain(), self.loop).result(timeout=timeout + 1)
+        except Exception as e:
+            self.logger.warning(f"Async ingestion did not drain cleanly: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join(timeout=timeout)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.workers.clear()
+        self.logger.info("Async ingestion stopped")
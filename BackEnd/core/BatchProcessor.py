@@ -1,39 +1,132 @@
-import torch
 import cv2
+import hashlib
 import queue
 import threading
 import time
 import logging
 import numpy as np
-from collections import deque
+from collections import Counter
 from typing import Dict, List, Optional
 
 from BackEnd.common.DataClass import FrameBatch, BatchResult
+from BackEnd.data.DetectionCache import DetectionCache
+from BackEnd.core.LatencyRecorder import LatencyRecorder
+from BackEnd.core.Tracer import tracer
+
+torch = None  # import torch mất vài giây nên chỉ import khi nạp model (xem _import_torch)
+
+
+def _import_torch():
+    global torch
+    if torch is None:
+        import torch as _torch
+        torch = _torch
+        torch.backends.cudnn.benchmark = True  # Tối ưu kernel cho batch size cố định
+        torch.backends.cudnn.fastest = True  # Ưu tiên thuật toán nhanh nhất
+    return torch
 
 
 class BatchProcessor:
     """Xử lý batch frames từ nhiều camera"""
 
-    def __init__(self, batch_size: int = 8, max_wait_time: float = 0.05):
+    model_name = 'yolov5m'
+    inference_size = 640
+
+    def __init__(self, batch_size: int = 8, max_wait_time: float = 0.05, detection_cache: DetectionCache = None,
+                 latency: LatencyRecorder = None, detector=None):
         self.batch_size = batch_size
         self.max_wait_time = max_wait_time
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        # Cache detection cho nguồn là file video; frame đã có trong cache không cần chạy lại YOLO
+        self.detection_cache = detection_cache
+        self.model_version: Optional[str] = None
+        self.latency = latency  # Ghi thời gian chờ/tiền xử lý/inference/trích xuất của từng camera
+        # Detector thay cho YOLOv5 (benchmark, chạy không cần trọng số): callable nhận danh sách frame BGR,
+        # trả về mỗi frame một mảng N x 5 (x1, y1, x2, y2, confidence) các người phát hiện được
+        self.detector = detector
         self.logger = logging.getLogger("BatchProcessor")
-        self.logger.info(f"Loading YOLOv5 model on {self.device}...")
-        self.model = torch.hub.load('ultralytics/yolov5', 'yolov5m', pretrained=True)
-        self.model.to(self.device)
-        self.model.eval()
-        self.logger.info("YOLOv5 model loaded.")
+        # Model được nạp ở background (load_model_async) để camera có thể mở song song
+        self.device = None
+        self.model = None
+        self.model_ready = threading.Event()
+        self.model_failed = threading.Event()  # Nạp model lỗi: không còn frame nào được xử lý
+        self.model_load_time: Optional[float] = None
+        self.model_loader_thread: Optional[threading.Thread] = None
         self.input_queue = queue.Queue(maxsize=100)
         self.output_queue = queue.Queue(maxsize=100)
         self.batch_id_counter = 0
         self.running = False
-        self.batch_times = deque(maxlen=100)
-        self.processor_thread = threading.Thread(target=self._batch_processing_loop)
+        # Bộ đếm cho MetricsServer: frame bị bỏ theo (camera_id, lý do) và số batch theo kích thước.
+        # Thread khác chỉ đọc qua dropped_snapshot/batch_size_snapshot (có thể thêm khoá mới khi đang đọc)
+        self.dropped_frames: Counter = Counter()
+        self.batch_size_counts: Counter = Counter()
+        self._counters_lock = threading.Lock()
+        # frame_id mới nhất của mỗi camera đã rời khỏi pipeline (đã xử lý hoặc bị bỏ),
+        # dùng làm phản hồi để camera worker biết inference đang trễ bao nhiêu frame
+        self.completed_frame_ids: Dict[str, int] = {}
+        self.processor_thread = threading.Thread(target=self._batch_processing_loop, name="BatchProcessor")
         self.processor_thread.daemon = True
 
+    def load_model(self):
+        """Nạp YOLOv5 (chặn cho tới khi xong)"""
+        if self.model_ready.is_set():
+            return
+        start_time = time.time()
+        if self.detector is not None:
+            self.model_version = getattr(self.detector, 'version', type(self.detector).__name__)
+            if self.detection_cache is not None:
+                self.detection_cache.set_model_version(self.model_version)
+            self.model_load_time = time.time() - start_time
+            self.model_ready.set()
+            self.logger.info(f"Using detector {self.model_version} instead of YOLOv5")
+            return
+        try:
+            _import_torch()
+            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            if self.device == 'cuda':
+                torch.cuda.empty_cache()  # Giải phóng bộ nhớ không còn dùng trong cache
+                torch.cuda.ipc_collect()  # Thu gom các vùng nhớ IPC bị rò rỉ
+            self.logger.info(f"Loading YOLOv5 model on {self.device}...")
+            model = torch.hub.load('ultralytics/yolov5', self.model_name, pretrained=True)
+            model.to(self.device)
+            model.eval()
+            self.model = model
+            self.model_version = self._model_fingerprint(model)
+            if self.detection_cache is not None:
+                self.detection_cache.set_model_version(self.model_version)
+            self.model_load_time = time.time() - start_time
+            self.model_ready.set()
+            self.logger.info(f"YOLOv5 model loaded in {self.model_load_time:.1f}s.")
+        except Exception as e:
+            self.logger.error(f"Error loading YOLOv5 model: {e}", exc_info=True)
+            self.model_failed.set()
+
+    def _model_fingerprint(self, model) -> str:
+        """Phiên bản model: tên cộng hash trọng số, đổi trọng số thì cache detection cũ tự mất hiệu lực"""
+        digest = hashlib.sha1(self.model_name.encode())
+        state_dict = model.state_dict() if hasattr(model, 'state_dict') else {}
+        for name, tensor in state_dict.items():
+            values = tensor.detach().float().cpu().numpy()
+            digest.update(name.encode())
+            digest.update(str(values.shape).encode())
+            digest.update(np.ascontiguousarray(values.ravel()[:256]).tobytes())
+            digest.update(np.float64(values.sum()).tobytes())
+        return f"{self.model_name}-{digest.hexdigest()[:16]}"
+
+    def load_model_async(self) -> threading.Thread:
+        """Bắt đầu nạp model trên một thread nền (gọi nhiều lần chỉ nạp một lần)"""
+        if self.model_loader_thread is None:
+            self.model_loader_thread = threading.Thread(target=self.load_model, name="ModelLoader", daemon=True)
+            self.model_loader_thread.start()
+        return self.model_loader_thread
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Chờ model nạp xong; trả về False nếu nạp lỗi hoặc hết thời gian chờ"""
+        self.load_model_async().join(timeout)
+        return self.model_ready.is_set()
+
     def start(self):
         self.running = True
+        self.load_model_async()
         self.processor_thread.start()
         self.logger.info(f"BatchProcessor started with batch_size={self.batch_size}")
 
@@ -43,11 +136,38 @@ class BatchProcessor:
             self.processor_thread.join(timeout=5.0)
         self.logger.info("BatchProcessor stopped")
 
-    def add_frame(self, camera_id: str, frame: np.ndarray, metadata: Dict):
+    def add_frame(self, camera_id: str, frame: np.ndarray, metadata: Dict) -> bool:
         try:
             self.input_queue.put((camera_id, frame, metadata), timeout=0.01)
+            return True
         except queue.Full:
             self.logger.warning("Batch input queue full, dropping frame")
+            self._count_drop(camera_id, "queue_full")
+            self._mark_completed(camera_id, metadata)
+            return False
+
+    def _count_drop(self, camera_id: str, reason: str):
+        with self._counters_lock:
+            self.dropped_frames[(camera_id, reason)] += 1
+
+    def dropped_snapshot(self) -> Dict[tuple, int]:
+        """Bản sao số frame bị bỏ theo (camera_id, lý do), đọc an toàn từ thread khác"""
+        with self._counters_lock:
+            return dict(self.dropped_frames)
+
+    def batch_size_snapshot(self) -> Dict[int, int]:
+        """Bản sao số batch theo kích thước, đọc an toàn từ thread khác"""
+        with self._counters_lock:
+            return dict(self.batch_size_counts)
+
+    def get_completed_frame_id(self, camera_id: str) -> Optional[int]:
+        """Trả về frame_id mới nhất của camera đã được xử lý xong (hoặc bị bỏ)"""
+        return self.completed_frame_ids.get(camera_id)
+
+    def _mark_completed(self, camera_id: str, metadata: Dict):
+        frame_id = metadata.get('frame_id')
+        if frame_id is not None and frame_id > self.completed_frame_ids.get(camera_id, -1):
+            self.completed_frame_ids[camera_id] = frame_id
 
     def get_results(self) -> Optional[BatchResult]:
         try:
@@ -60,24 +180,41 @@ class BatchProcessor:
         last_batch_time = time.time()
         while self.running:
             try:
-                while len(pending_frames) < self.batch_size:
+                while len(pending_frames) < self.batch_size or not self.model_ready.is_set():
                     try:
                         camera_id, frame, metadata = self.input_queue.get(timeout=0.01)
+                        if camera_id in pending_frames:
+                            # Frame mới thay thế frame cũ của cùng camera
+                            self._count_drop(camera_id, "superseded")
+                            self._mark_completed(camera_id, pending_frames[camera_id][1])
                         pending_frames[camera_id] = (frame, metadata)
                     except queue.Empty:
                         break
+                if self.model_failed.is_set():
+                    self.logger.error("Model failed to load, batch processing stopped")
+                    break
+                if not self.model_ready.is_set():
+                    # Trong lúc nạp model chỉ giữ frame mới nhất của mỗi camera
+                    time.sleep(0.01)
+                    continue
                 current_time = time.time()
                 should_process = (len(pending_frames) >= self.batch_size or (
                         len(pending_frames) > 0 and (current_time - last_batch_time) >= self.max_wait_time))
                 if should_process and pending_frames:
                     batch = self._create_batch(pending_frames)
-                    result = self._process_batch(batch)
+                    pending_frames.clear()
+                    last_batch_time = current_time
+                    try:
+                        result = self._process_batch(batch)
+                    finally:
+                        for camera_id, metadata in batch.camera_metadata.items():
+                            self._mark_completed(camera_id, metadata)
                     try:
                         self.output_queue.put(result, timeout=0.01)
                     except queue.Full:
                         self.logger.warning("Batch output queue full")
-                    pending_frames.clear()
-                    last_batch_time = current_time
+                        for camera_id in result.camera_results:
+                            self._count_drop(camera_id, "output_full")
                 else:
                     time.sleep(0.001)
             except Exception as e:
@@ -93,29 +230,105 @@ class BatchProcessor:
 
     def _process_batch(self, batch: FrameBatch) -> BatchResult:
         start_time = time.time()
-        batch_images = []
-        camera_order = []
-        for camera_id, frame in batch.camera_frames.items():
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            batch_images.append(rgb_frame)
-            camera_order.append(camera_id)
-        with torch.no_grad():
-            results = self.model(batch_images, size=640)
-        camera_results = {}
-        for i, camera_id in enumerate(camera_order):
-            detections = self._extract_detections(results.pred[i],
-                                                  batch.camera_metadata[camera_id].get('confidence_threshold', 0.5))
-            camera_results[camera_id] = detections
+        camera_order = list(batch.camera_frames.keys())
+        frame_ids = {camera_id: batch.camera_metadata[camera_id].get('frame_id') for camera_id in camera_order}
+        frame_timestamps = {camera_id: batch.camera_metadata[camera_id].get('timestamp') for camera_id in camera_order}
+        timings = {}
+        with tracer.span("batch", batch_id=batch.batch_id, size=len(camera_order)):
+            if tracer.enabled:
+                self._trace_queue_wait(batch, start_time, frame_ids)
+            detections = self.detect([batch.camera_frames[camera_id] for camera_id in camera_order],
+                                     [batch.camera_metadata[camera_id].get('confidence_threshold', 0.5)
+                                      for camera_id in camera_order],
+                                     [batch.camera_metadata[camera_id].get('cache_key') for camera_id in camera_order],
+                                     timings)
+        camera_results = dict(zip(camera_order, detections))
         processing_time = time.time() - start_time
-        self.batch_times.append(processing_time)
-        return BatchResult(batch.batch_id, camera_results, processing_time, time.time())
+        with self._counters_lock:
+            self.batch_size_counts[len(camera_order)] += 1
+        if self.latency is not None:
+            # Các giai đoạn chạy theo batch: mỗi frame trong batch chịu toàn bộ thời gian của giai đoạn
+            for camera_id in camera_order:
+                submitted = batch.camera_metadata[camera_id].get('timestamp')
+                if submitted is not None:
+                    self.latency.record(camera_id, "queue_wait", start_time - submitted)
+                for stage, seconds in timings.items():
+                    self.latency.record(camera_id, stage, seconds)
+        return BatchResult(batch.batch_id, camera_results, processing_time, time.time(), frame_ids, frame_timestamps)
+
+    @staticmethod
+    def _trace_queue_wait(batch: FrameBatch, start_time: float, frame_ids: Dict[str, int]):
+        """Span chờ trong hàng đợi của từng frame (trên track camera) và bước flow của frame đó"""
+        now = time.perf_counter()
+        for camera_id, frame_id in frame_ids.items():
+            submitted = batch.camera_metadata[camera_id].get('timestamp')
+            if submitted is not None:
+                tracer.complete("queue_wait", now - (start_time - submitted), now, camera_id, camera_only=True,
+                                frame_id=frame_id)
+            tracer.flow("t", f"{camera_id}/{frame_id}")
+
+    def detect(self, frames: List[np.ndarray], confidence_thresholds: List[float],
+               cache_keys: List[Optional[tuple]] = None, timings: Dict[str, float] = None) -> List[List[Dict]]:
+        """Chạy YOLO trên một danh sách frame BGR, trả về danh sách detection theo đúng thứ tự.
+
+        ``cache_keys`` (source_fingerprint, preprocess, frame_index) cho phép lấy kết quả từ
+        DetectionCache; chỉ các frame chưa có trong cache mới được đưa vào model. Nếu truyền ``timings``,
+        thời gian (giây) của các giai đoạn preprocess, inference và extraction được ghi vào đó.
+        """
+        if timings is None:
+            timings = {}
+        boxes: List[Optional[np.ndarray]] = [None] * len(frames)
+        keys = [None] * len(frames)
+        if self.detection_cache is not None and cache_keys:
+            keys = [(key[0], f"{key[1]}|{self.inference_size}", key[2]) if key else None for key in cache_keys]
+            boxes = self.detection_cache.get_many(keys)
+        missing = [i for i, cached in enumerate(boxes) if cached is None]
+        extraction_time = 0.0
+        if missing:
+            started = time.perf_counter()
+            if self.detector is not None:
+                preprocessed = started
+                predictions = self.detector([frames[i] for i in missing])
+                inferred = time.perf_counter()
+                for i, person_boxes in zip(missing, predictions):
+                    boxes[i] = np.asarray(person_boxes, dtype=np.float32).reshape(-1, 5)
+            else:
+                batch_images = [cv2.cvtColor(frames[i], cv2.COLOR_BGR2RGB) for i in missing]
+                preprocessed = time.perf_counter()
+                with torch.no_grad():
+                    results = self.model(batch_images, size=self.inference_size)
+                inferred = time.perf_counter()
+                for i, predictions in zip(missing, results.pred):
+                    boxes[i] = self._person_boxes(predictions)
+            extraction_time = time.perf_counter() - inferred
+            timings['preprocess'] = preprocessed - started
+            timings['inference'] = inferred - preprocessed
+            tracer.complete("preprocess", started, preprocessed, frames=len(missing))
+            tracer.complete("inference", preprocessed, inferred, frames=len(missing))
+            # Lấy box người từ kết quả model cho các frame không có trong cache; "extraction" bên dưới cho mọi frame
+            tracer.complete("extraction_missing", inferred, inferred + extraction_time, frames=len(missing))
+            if self.detection_cache is not None:
+                self.detection_cache.put_many([(keys[i], boxes[i]) for i in missing if keys[i] is not None])
+        started = time.perf_counter()
+        detections = [self._extract_detections(boxes[i], confidence_thresholds[i]) for i in range(len(frames))]
+        extracted = time.perf_counter()
+        timings['extraction'] = extraction_time + extracted - started
+        tracer.complete("extraction", started, extracted, frames=len(frames))
+        return detections
+
+    @staticmethod
+    def _person_boxes(predictions) -> np.ndarray:
+        """Giữ lại các box thuộc lớp người: mảng float32 Nx5 (x1, y1, x2, y2, confidence)"""
+        pred = predictions.cpu().numpy() if hasattr(predictions, 'cpu') else np.asarray(predictions)
+        pred = pred.reshape(-1, 6)
+        return np.ascontiguousarray(pred[pred[:, 5].astype(int) == 0, :5], dtype=np.float32)
 
-    def _extract_detections(self, predictions, confidence_threshold: float) -> List[Dict]:
+    def _extract_detections(self, boxes: np.ndarray, confidence_threshold: float) -> List[Dict]:
         detections = []
-        for *xyxy, conf, cls in predictions:
-            if int(cls) == 0 and conf > confidence_threshold:
+        for *xyxy, conf in boxes:
+            if conf > confidence_threshold:
                 x1, y1, x2, y2 = map(int, xyxy)
                 detections.append(
                     {'bbox': (x1, y1, x2, y2), 'center': ((x1 + x2) // 2, (y1 + y2) // 2), 'confidence': float(conf),
                      'area': (x2 - x1) * (y2 - y1), 'height_pixels': y2 - y1})
-        return detections
\ No newline at end of file
+        return detections
@@ -53,6 +53,34 @@ class BirdEyeViewTransform:
             self.target_corners = np.float32(target_corners)
         self.__hography_matrix, _ = cv2.findHomography(self.src_points, self.target_corners)
 
+    def rescale_source(self, factor_x, factor_y):
+        """
+        Adapt the homography to frames resized relative to the calibration frames.
+
+        Args:
+            factor_x (float): New frame width divided by the calibration frame width.
+            factor_y (float): New frame height divided by the calibration frame height.
+        """
+        scale_back = np.diag([1.0 / factor_x, 1.0 / factor_y, 1.0])
+        self.__hography_matrix = np.float32(self.get_hography_matrix() @ scale_back)
+        if self.src_points is not None and self.src_points.ndim == 2:
+            self.src_points = np.float32(self.src_points * [factor_x, factor_y])
+
+    def transform_points(self, points_px):
+        """
+        Project pixel points into the transformed (bird's-eye) plane.
+
+        Args:
+            points_px (array-like): N x 2 coordinates in pixel space.
+
+        Returns:
+            np.ndarray: N x 2 coordinates in the transformed image.
+        """
+        points = np.asarray(points_px, dtype='float32').reshape(1, -1, 2)
+        if points.shape[1] == 0:
+            return np.empty((0, 2), dtype='float32')
+        return cv2.perspectiveTransform(points, self.get_hography_matrix())[0]
+
     def calculate_distance(self, point1_px, point2_px):
         """
         Calculate the distance between two points in the transformed image.
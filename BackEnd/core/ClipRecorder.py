@@ -0,0 +1,198 @@
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+import BackEnd.config as config
+from BackEnd.common.DataClass import CameraConfig
+
+
+class ClipRecorder:
+    """Ghi clip ngắn quanh mỗi vi phạm thay vì ghi hình liên tục.
+
+    Mỗi camera có ``enable_recording`` giữ một ring buffer các frame đã nén JPEG trong
+    ``pre_event_seconds`` giây gần nhất (giới hạn thêm bởi ``max_buffer_bytes``). Khi có vi phạm, clip
+    gồm các frame trong buffer cộng với ``post_event_seconds`` giây tiếp theo; vi phạm mới xảy ra trước
+    khi clip được chốt (khoảng trước của nó chạm vào clip đang mở) sẽ kéo dài clip đó thay vì tạo clip
+    mới. Việc nén JPEG chạy trong một thread pool có giới hạn, việc ghi file mp4 chạy trên thread
+    ``ClipWriter``, nên thread xử lý kết quả chỉ phải sao chép frame.
+    """
+
+    def __init__(self, encoder_workers: int = config.clip_encoder_workers,
+                 max_pending: int = config.clip_max_pending, jpeg_quality: int = config.clip_jpeg_quality,
+                 max_width: int = config.clip_max_width, max_buffer_bytes: int = config.clip_max_buffer_bytes,
+                 max_clip_bytes: int = config.clip_max_clip_bytes):
+        self.max_pending = max_pending
+        self.jpeg_quality = jpeg_quality
+        self.max_width = max_width
+        self.max_buffer_bytes = max_buffer_bytes
+        self.max_clip_bytes = max_clip_bytes
+        self.logger = logging.getLogger("ClipRecorder")
+        self.encoder = ThreadPoolExecutor(max_workers=encoder_workers, thread_name_prefix="ClipEncoder")
+        self.write_queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._cameras: Dict[str, Dict] = {}
+        self.dropped_frames = 0
+        self.clips_written = 0
+        self.running = True
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="ClipWriter", daemon=True)
+        self.writer_thread.start()
+
+    def _camera_state(self, camera_config: CameraConfig) -> Dict:
+        state = self._cameras.get(camera_config.camera_id)
+        if state is None:
+            state = {'buffer': deque(), 'buffer_bytes': 0, 'clip': None, 'config': camera_config}
+            self._cameras[camera_config.camera_id] = state
+        state['config'] = camera_config
+        return state
+
+    def add_frame(self, camera_config: CameraConfig, timestamp: float, frame: np.ndarray):
+        """Đưa frame (đã vẽ kết quả) vào ring buffer của camera; bỏ frame nếu bộ nén đang quá tải"""
+        if not camera_config.enable_recording or not self.running:
+            if camera_config.camera_id in self._cameras:
+                self.close_camera(camera_config.camera_id)
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped_frames += 1
+                return
+            self._pending += 1
+        self.encoder.submit(self._encode, camera_config, timestamp, frame.copy())
+
+    def trigger(self, camera_config: CameraConfig, timestamp: float):
+        """Bắt đầu clip cho vi phạm tại ``timestamp`` hoặc kéo dài clip đang mở của camera"""
+        if not camera_config.enable_recording or not self.running:
+            return
+        with self._lock:
+            state = self._camera_state(camera_config)
+            clip = state['clip']
+            end_time = timestamp + camera_config.post_event_seconds
+            if clip is not None:
+                # Các frame giữa lúc clip cũ hết hạn và vi phạm mới nằm trong ring buffer
+                clip['frames'].extend(item for item in state['buffer'] if item[0] > clip['last_time'])
+                clip['end_time'] = max(clip['end_time'], end_time)
+                clip['events'] += 1
+            else:
+                start_time = timestamp - camera_config.pre_event_seconds
+                clip = {'start_time': start_time, 'end_time': end_time, 'events': 1,
+                        'frames': [item for item in state['buffer'] if item[0] >= start_time]}
+                state['clip'] = clip
+            clip['last_time'] = clip['frames'][-1][0] if clip['frames'] else timestamp
+            clip['bytes'] = sum(len(data) for _, data in clip['frames'])
+
+    def _encode(self, camera_config: CameraConfig, timestamp: float, frame: np.ndarray):
+        try:
+            height, width = frame.shape[:2]
+            if self.max_width and width > self.max_width:
+                frame = cv2.resize(frame, (self.max_width, int(round(height * self.max_width / width))),
+                                   interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if ok:
+                self._append(camera_config, (timestamp, encoded.tobytes()))
+        except Exception as e:
+            self.logger.error(f"Error encoding frame of {camera_config.camera_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _append(self, camera_config: CameraConfig, item: Tuple[float, bytes]):
+        timestamp, data = item
+        with self._lock:
+            state = self._camera_state(camera_config)
+            buffer = state['buffer']
+            buffer.append(item)
+            state['buffer_bytes'] += len(data)
+            horizon = timestamp - camera_config.pre_event_seconds
+            while buffer and (buffer[0][0] < horizon or state['buffer_bytes'] > self.max_buffer_bytes):
+                state['buffer_bytes'] -= len(buffer.popleft()[1])
+
+            clip = state['clip']
+            if clip is None:
+                return
+            if timestamp <= clip['end_time']:
+                clip['frames'].append(item)
+                clip['bytes'] += len(data)
+                clip['last_time'] = max(clip['last_time'], timestamp)
+                if clip['bytes'] > self.max_clip_bytes:
+                    self.logger.warning(f"Clip of {camera_config.camera_id} reached "
+                                        f"{self.max_clip_bytes / 1024 / 1024:.0f} MB, closing it early")
+                    self._finish_clip(camera_config.camera_id)
+            elif timestamp > clip['end_time'] + camera_config.pre_event_seconds:
+                # Đã qua khoảng mà một vi phạm mới còn có thể nối vào clip này
+                self._finish_clip(camera_config.camera_id)
+
+    def _finish_clip(self, camera_id: str):
+        state = self._cameras[camera_id]
+        clip, state['clip'] = state['clip'], None
+        if clip and clip['frames']:
+            recording_path = state['config'].recording_path or config.dir_recording
+            self.write_queue.put((camera_id, recording_path, clip))
+
+    def close_camera(self, camera_id: str):
+        """Chốt clip đang mở và giải phóng buffer của camera (khi camera dừng)"""
+        with self._lock:
+            if camera_id in self._cameras:
+                self._finish_clip(camera_id)
+                del self._cameras[camera_id]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Số byte JPEG đang giữ trong bộ nhớ (ring buffer và clip đang mở) của từng camera"""
+        with self._lock:
+            return {camera_id: state['buffer_bytes'] + (state['clip']['bytes'] if state['clip'] else 0)
+                    for camera_id, state in self._cameras.items()}
+
+    def _writer_loop(self):
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            try:
+                self._write_clip(*item)
+            except Exception as e:
+                self.logger.error(f"Error writing clip of {item[0]}: {e}", exc_info=True)
+
+    def _write_clip(self, camera_id: str, recording_path: str, clip: Dict):
+        frames: List[Tuple[float, bytes]] = sorted(clip['frames'], key=lambda item: item[0])
+        duration = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / duration if duration > 0 else 1.0
+        first = cv2.imdecode(np.frombuffer(frames[0][1], dtype=np.uint8), cv2.IMREAD_COLOR)
+        height, width = first.shape[:2]
+        os.makedirs(recording_path, exist_ok=True)
+        start = datetime.fromtimestamp(frames[0][0])
+        file_name = f"{camera_id}_{start:%Y%m%d-%H%M%S}_{int(frames[0][0] * 1000) % 1000:03d}.mp4"
+        path = os.path.join(recording_path, file_name)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        try:
+            for _, data in frames:
+                image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if image.shape[:2] != (height, width):
+                    image = cv2.resize(image, (width, height))
+                writer.write(image)
+        finally:
+            writer.release()
+        self.clips_written += 1
+        usage = self.memory_usage()
+        self.logger.info(f"Saved clip {path}: {len(frames)} frames, {duration:.1f}s, {clip['events']} events "
+                         f"(recording buffers {sum(usage.values()) / 1024 / 1024:.1f} MB for {len(usage)} cameras)")
+
+    def stop(self, timeout: float = 10.0):
+        """Chốt mọi clip đang mở, chờ ghi xong rồi dừng"""
+        if not self.running:
+            return
+        self.running = False
+        self.encoder.shutdown(wait=True)
+        with self._lock:
+            for camera_id in list(self._cameras):
+                self._finish_clip(camera_id)
+        self.write_queue.put(None)
+        self.writer_thread.join(timeout)
+        self.logger.info(f"Clip recorder stopped ({self.clips_written} clips written, "
+                         f"{self.dropped_frames} frames dropped)")
@@ -0,0 +1,62 @@
+import logging
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class ConfigWatcher(threading.Thread):
+    """Theo dõi thời điểm sửa đổi của các file cấu hình và gọi callback khi có file thay đổi.
+
+    Dùng polling ``os.stat`` (không cần thư viện ngoài, chạy được trên Windows/Linux/macOS).
+    Một file chỉ được báo thay đổi khi mtime/kích thước đã ổn định qua hai lần kiểm tra liên tiếp,
+    để không đọc phải file đang được trình soạn thảo ghi dở.
+    """
+
+    def __init__(self, paths: Iterable[str], on_change: Callable[[List[str]], None], interval: float = 1.0):
+        super().__init__(name="ConfigWatcher", daemon=True)
+        self.on_change = on_change
+        self.interval = interval
+        self.logger = logging.getLogger("ConfigWatcher")
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._signatures: Dict[str, Optional[tuple]] = {}
+        self._pending: Dict[str, Optional[tuple]] = {}
+        self.set_paths(paths)
+
+    @staticmethod
+    def _signature(path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def set_paths(self, paths: Iterable[str]):
+        """Thay danh sách file cần theo dõi; file mới được ghi nhận trạng thái hiện tại làm mốc"""
+        with self._lock:
+            self._signatures = {path: self._signatures.get(path, self._signature(path)) for path in paths}
+            self._pending = {path: sig for path, sig in self._pending.items() if path in self._signatures}
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            changed = []
+            with self._lock:
+                for path, known in self._signatures.items():
+                    current = self._signature(path)
+                    if current == known:
+                        self._pending.pop(path, None)
+                    elif self._pending.get(path) == current:
+                        self._signatures[path] = current
+                        self._pending.pop(path, None)
+                        changed.append(path)
+                    else:
+                        self._pending[path] = current
+            if changed:
+                self.logger.info(f"Config changed: {', '.join(changed)}")
+                try:
+                    self.on_change(changed)
+                except Exception as e:
+                    self.logger.error(f"Error applying config change: {e}", exc_info=True)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,144 @@
+import logging
+import shutil
+import subprocess
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+
+class FFmpegCapture:
+    """Đọc video qua ffmpeg, decode và thu nhỏ trong cùng một bước native.
+
+    ffmpeg được chạy như một tiến trình con với bộ lọc scale, xuất frame BGR thô ở độ phân giải
+    đích qua pipe. Các frame được đọc thẳng vào những buffer cấp phát sẵn nên Python không phải
+    cấp phát và copy ảnh độ phân giải gốc. Giao diện mô phỏng các hàm của ``cv2.VideoCapture``
+    mà ``ImprovedCameraWorker`` sử dụng (isOpened, grab, retrieve, read, get, set, release).
+
+    Lưu ý: mảng trả về bởi ``read()``/``retrieve()`` là một trong ``num_buffers`` buffer dùng
+    vòng tròn, nó sẽ bị ghi đè sau ``num_buffers`` lần retrieve tiếp theo.
+    """
+
+    def __init__(self, source: str, width: int, height: int, live: bool = False, num_buffers: int = 8,
+                 ffmpeg_path: str = "ffmpeg"):
+        self.source = source
+        self.width = int(width)
+        self.height = int(height)
+        self.live = live
+        self.ffmpeg_path = ffmpeg_path
+        self.logger = logging.getLogger("FFmpegCapture")
+        self.frame_size = self.width * self.height * 3
+        self._buffers = [np.empty((self.height, self.width, 3), dtype=np.uint8) for _ in range(num_buffers)]
+        self._index = 0
+        self._grabbed = False
+        self.position = 0
+        self.fps = self._probe_fps()
+        self.process: Optional[subprocess.Popen] = None
+        self._start()
+
+    @staticmethod
+    def is_available(ffmpeg_path: str = "ffmpeg") -> bool:
+        return shutil.which(ffmpeg_path) is not None
+
+    def _build_command(self):
+        command = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostdin"]
+        if self.live:
+            command += ["-fflags", "nobuffer", "-flags", "low_delay"]
+            if self.source.startswith("rtsp://"):
+                command += ["-rtsp_transport", "tcp"]
+        command += ["-i", self.source, "-an",
+                    "-vf", f"scale={self.width}:{self.height}:flags=area",
+                    "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        return command
+
+    def _start(self):
+        try:
+            self.process = subprocess.Popen(self._build_command(), stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL, bufsize=0)
+            self.position = 0
+        except OSError as e:
+            self.logger.error(f"Cannot start ffmpeg for {self.source}: {e}")
+            self.process = None
+
+    def _probe_fps(self) -> float:
+        """Đọc FPS của nguồn bằng ffprobe, trả về 0 nếu không xác định được"""
+        ffprobe_path = shutil.which("ffprobe")
+        if ffprobe_path is None:
+            return 0.0
+        try:
+            output = subprocess.run(
+                [ffprobe_path, "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=avg_frame_rate",
+                 "-of", "csv=p=0", self.source], capture_output=True, text=True, timeout=10).stdout.strip()
+            num, _, den = output.partition("/")
+            den = float(den) if den else 1.0
+            return float(num) / den if den else 0.0
+        except (subprocess.SubprocessError, ValueError, OSError):
+            return 0.0
+
+    def _read_into(self, buffer: np.ndarray) -> bool:
+        view = memoryview(buffer).cast("B")
+        received = 0
+        while received < self.frame_size:
+            n = self.process.stdout.readinto(view[received:])
+            if not n:
+                return False
+            received += n
+        return True
+
+    def isOpened(self) -> bool:
+        # Tiến trình có thể đã thoát nhưng pipe vẫn còn frame chưa đọc, nên chỉ coi là đóng sau EOF
+        return self.process is not None
+
+    def grab(self) -> bool:
+        """Nhận frame kế tiếp vào buffer hiện tại mà không chuyển buffer"""
+        if self.process is None:
+            return False
+        self._grabbed = self._read_into(self._buffers[self._index])
+        if self._grabbed:
+            self.position += 1
+        else:
+            self.release()
+        return self._grabbed
+
+    def retrieve(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self._grabbed:
+            return False, None
+        frame = self._buffers[self._index]
+        self._index = (self._index + 1) % len(self._buffers)
+        self._grabbed = False
+        return True, frame
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop_id: int) -> float:
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        return 0.0
+
+    def set(self, prop_id: int, value: float) -> bool:
+        # Pipe chỉ hỗ trợ tua về đầu (dùng khi lặp video)
+        if prop_id == cv2.CAP_PROP_POS_FRAMES and value == 0 and not self.live:
+            self.release()
+            self._start()
+            return self.isOpened()
+        return False
+
+    def release(self):
+        if self.process is None:
+            return
+        try:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.stdout.close()
+            self.process.wait(timeout=2.0)
+        except (OSError, subprocess.SubprocessError):
+            pass
+        self.process = None
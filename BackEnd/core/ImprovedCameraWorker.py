@@ -3,112 +3,327 @@ import time
 import cv2
 import numpy as np
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 from BackEnd.core.BatchProcessor import BatchProcessor
 from BackEnd.data.DatabaseManager import DatabaseManager
+from BackEnd.data.ColumnarLog import ColumnarLog
+from BackEnd.data.DetectionCache import DetectionCache
 from BackEnd.core.PersonTracker import PersonTracker
+from BackEnd.core.FFmpegCapture import FFmpegCapture
+from BackEnd.core.SnapshotWriter import SnapshotWriter
+from BackEnd.core.ClipRecorder import ClipRecorder
+from BackEnd.core.LatencyRecorder import LatencyRecorder
+from BackEnd.core.Tracer import tracer
 from BackEnd.common.DataClass import CameraConfig, DetectionResult
-from datetime import datetime
 import os
-import BackEnd.config as config
 
 
 class ImprovedCameraWorker(threading.Thread):
-    def __init__(self, config: CameraConfig, batch_processor: BatchProcessor, db_manager: DatabaseManager):
-        super().__init__()
+    # Số frame tối đa được phép "đang chờ" inference trước khi bắt đầu bỏ frame
+    max_inference_lag = 2
+    # Nếu không nhận được phản hồi từ detector quá lâu thì vẫn gửi frame để tránh treo
+    lag_feedback_timeout = 1.0
+    reconnect_delay = 5.0
+
+    def __init__(self, config: CameraConfig, batch_processor: BatchProcessor, db_manager: DatabaseManager,
+                 columnar_log: ColumnarLog = None, snapshot_writer: SnapshotWriter = None,
+                 clip_recorder: ClipRecorder = None, latency: LatencyRecorder = None, clock=time.time):
+        super().__init__(name=f"CameraWorker-{config.camera_id}")
         self.config = config
         self.batch_processor = batch_processor
         self.db_manager = db_manager  # Giữ lại để có thể ghi log nếu cần
+        self.columnar_log = columnar_log  # Tùy chọn: lưu toàn bộ detection/track để phân tích offline
+        self.snapshot_writer = snapshot_writer  # Lưu ảnh vi phạm ở background (None = không lưu ảnh)
+        self.clip_recorder = clip_recorder  # Ghi clip trước/sau vi phạm khi config.enable_recording
+        self.latency = latency  # Ghi thời gian đọc frame, tracking, đo khoảng cách và vẽ
+        self.clock = clock  # Thời điểm của frame đang xử lý (đồng hồ hệ thống, hoặc thời gian footage khi replay)
         self.running = False
-        self.tracker = PersonTracker(config.camera_id, config)
+        self.tracker = PersonTracker(config.camera_id, config, clock)
         self.logger = logging.getLogger(f"Camera-{config.camera_id}")
         self.cap = None
         self.frame_count = 0
+        self.skipped_frames = 0
+        self.processed_frames = 0
+        self.violation_count = 0
         self.latest_frame = None
         self.latest_frame_lock = threading.Lock()
         self.is_active = True
         self.is_video_file = isinstance(config.source, str) and not config.source.isdigit()
+        self.frame_interval = 1 / 30
+        self.next_frame_time = 0.0
+        self.last_submit_time = 0.0
+        self.first_frame_time = None
+        self.reopen_requested = False
+        # Cấu hình mới cho tracker và yêu cầu nạp lại BEV từ ConfigWatcher; chỉ được áp dụng ở đầu
+        # process_detections để tracker không bị đổi ngưỡng/homography giữa chừng một frame
+        self.pending_config = config
+        self.bev_reload_requested = False
+        # Vị trí frame trong file và dấu vân tay nội dung file, dùng làm khoá của DetectionCache
+        self.source_frame_index = 0
+        self.source_fingerprint = None
 
     def run(self):
         self.running = True
         self.logger.info(f"Starting camera {self.config.camera_id}")
         while self.running:
-            if self.cap is None or not self.cap.isOpened():
-                self._open_video_source()
-                if not self.cap or not self.cap.isOpened():
-                    self.logger.error(f"Cannot open camera source: {self.config.source}. Retrying in 5s.")
-                    self.is_active = False
-                    time.sleep(5)
-                    continue
-            self.is_active = True
-            ret, frame = self.cap.read()
-            if not ret:
-                if self.is_video_file and self.config.loop_video:
-                    self.logger.info(f"Restarting video file for {self.config.camera_id}.")
-                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    self.cap.release()
-                    continue
-                else:
-                    self.logger.info(f"End of video or stream error for {self.config.camera_id}.")
-                    self.is_active = False
-                    break
-            self.frame_count += 1
-            with self.latest_frame_lock:
-                self.latest_frame = frame.copy()
-            metadata = {'frame_id': self.frame_count, 'timestamp': time.time(),
-                        'confidence_threshold': self.config.confidence_threshold}
-            self.batch_processor.add_frame(self.config.camera_id, frame, metadata)
-            time.sleep(1 / 30)  # Giới hạn FPS
+            if not self._ensure_source_open():
+                time.sleep(self.reconnect_delay)
+                continue
+            if not self._capture_once():
+                break
+            delay = self._pace_delay()
+            if delay > 0:
+                time.sleep(delay)
         self.cleanup()
 
+    def apply_config(self, config: CameraConfig):
+        """Áp dụng cấu hình mới khi đang chạy; nguồn video được mở lại nếu thông số đọc thay đổi,
+        ngưỡng của tracker được áp dụng ở đầu frame kế tiếp trên thread xử lý kết quả"""
+        old = self.config
+        self.config = config
+        self.pending_config = config
+        if (old.source, old.capture_backend, old.decode_width, old.decode_height, old.frame_width,
+                old.frame_height) != (config.source, config.capture_backend, config.decode_width,
+                                      config.decode_height, config.frame_width, config.frame_height):
+            self.is_video_file = isinstance(config.source, str) and not config.source.isdigit()
+            # Việc đóng/mở capture phải diễn ra trên thread đọc frame
+            self.reopen_requested = True
+        self.logger.info(f"Applied new configuration for {config.camera_id}")
+
+    def _ensure_source_open(self) -> bool:
+        if self.reopen_requested:
+            self.reopen_requested = False
+            if self.cap is not None:
+                self.cap.release()
+            self.cap = None
+            if self.tracker.pixel_scale != (1.0, 1.0):
+                self.tracker.set_pixel_scale(1.0, 1.0)
+        if self.cap is None or not self.cap.isOpened():
+            self._open_video_source()
+            if not self.cap or not self.cap.isOpened():
+                self.logger.error(f"Cannot open camera source: {self.config.source}. "
+                                  f"Retrying in {self.reconnect_delay:.0f}s.")
+                self.is_active = False
+                return False
+        self.is_active = True
+        return True
+
+    def _capture_once(self) -> bool:
+        """Đọc (hoặc bỏ qua) một frame từ nguồn. Trả về False nếu worker cần dừng."""
+        if self._inference_lagging():
+            # Bỏ frame bằng grab(): chỉ tách gói dữ liệu, không decode ảnh
+            if not self.cap.grab():
+                return self._handle_end_of_source()
+            self.source_frame_index += 1
+            self.skipped_frames += 1
+            tracer.instant("skip_frame", self.config.camera_id)
+            return True
+        started = time.perf_counter()
+        ret, frame = self.cap.read()
+        if not ret:
+            return self._handle_end_of_source()
+        captured = time.perf_counter()
+        if self.latency is not None:
+            self.latency.record(self.config.camera_id, "capture", captured - started)
+        tracer.complete("capture", started, captured, self.config.camera_id)
+        self._submit_frame(frame, self.cache_key(frame))
+        self.source_frame_index += 1
+        return True
+
+    def _handle_end_of_source(self) -> bool:
+        """Xử lý khi hết video hoặc mất tín hiệu. Trả về False nếu worker cần dừng."""
+        if self.is_video_file and self.config.loop_video:
+            self.logger.info(f"Restarting video file for {self.config.camera_id}.")
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.cap.release()
+            return True
+        self.logger.info(f"End of video or stream error for {self.config.camera_id}.")
+        self.is_active = False
+        return False
+
+    def cache_key(self, frame: np.ndarray):
+        """Khoá DetectionCache của frame vừa đọc tại vị trí ``source_frame_index`` (None nếu không cache được)"""
+        if self.source_fingerprint is None:
+            return None
+        backend = "ffmpeg" if isinstance(self.cap, FFmpegCapture) else "opencv"
+        return self.source_fingerprint, f"{backend}:{frame.shape[1]}x{frame.shape[0]}", self.source_frame_index
+
+    def _submit_frame(self, frame: np.ndarray, cache_key: tuple = None):
+        self.frame_count += 1
+        with self.latest_frame_lock:
+            self.latest_frame = frame.copy()
+        metadata = {'frame_id': self.frame_count, 'timestamp': time.time(),
+                    'confidence_threshold': self.config.confidence_threshold, 'cache_key': cache_key}
+        with tracer.span("submit", self.config.camera_id, frame_id=self.frame_count):
+            tracer.flow("s", f"{self.config.camera_id}/{self.frame_count}")
+            self.batch_processor.add_frame(self.config.camera_id, frame, metadata)
+        self.last_submit_time = time.time()
+        if self.first_frame_time is None:
+            self.first_frame_time = self.last_submit_time
+
+    def _inference_lag(self) -> int:
+        """Số frame đã gửi nhưng detector chưa xử lý xong"""
+        completed = self.batch_processor.get_completed_frame_id(self.config.camera_id)
+        if completed is None:
+            return 0
+        return self.frame_count - completed
+
+    def _inference_lagging(self) -> bool:
+        if self._inference_lag() <= self.max_inference_lag:
+            return False
+        return time.time() - self.last_submit_time < self.lag_feedback_timeout
+
+    def _pace_delay(self) -> float:
+        """Thời gian cần chờ để giữ nhịp đọc theo FPS của nguồn.
+
+        Camera/stream trực tiếp tự chặn read()/grab() theo tốc độ của nguồn nên không cần chờ,
+        còn file video thì chờ tới mốc thời gian của frame kế tiếp.
+        """
+        if not self.is_video_file:
+            return 0.0
+        now = time.time()
+        self.next_frame_time = max(self.next_frame_time + self.frame_interval, now - self.frame_interval)
+        return self.next_frame_time - now
+
     def _open_video_source(self):
         try:
             source = self.config.source
             if isinstance(source, str) and source.isdigit(): source = int(source)
-            self.cap = cv2.VideoCapture(source)
+            if self._use_ffmpeg_backend():
+                self.cap = self._open_ffmpeg_source(source)
+            else:
+                self.cap = cv2.VideoCapture(source)
+                if self.cap.isOpened():
+                    self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config.frame_height)
+                    self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config.frame_width)
+                    if not self.is_video_file:
+                        # Giữ buffer nhỏ nhất để stream trực tiếp luôn trả về frame mới nhất
+                        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
             if self.cap.isOpened():
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config.frame_height)
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config.frame_width)
-                print(
-                    f"Opening source {self.config.source} with resolution {self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)}x{self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)}")
+                self.logger.info(f"Opening source {self.config.source} with resolution "
+                                 f"{self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)}x{self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)}")
                 fps = self.cap.get(cv2.CAP_PROP_FPS)
                 self.tracker.current_fps = max(fps, 1) if fps > 0 else 30
+                self.frame_interval = 1 / self.tracker.current_fps
+                self.next_frame_time = time.time()
+                self.source_frame_index = 0
+                self.source_fingerprint = self._source_fingerprint()
                 self.logger.info(f"Source {self.config.source} opened. FPS: {self.tracker.current_fps}")
         except Exception as e:
             self.logger.error(f"Error opening source {self.config.source}: {e}")
             self.cap = None
 
+    def _source_fingerprint(self):
+        if self.batch_processor.detection_cache is None or not self.is_video_file \
+                or not os.path.isfile(self.config.source):
+            return None
+        try:
+            return DetectionCache.source_fingerprint(self.config.source)
+        except OSError as e:
+            self.logger.warning(f"Cannot fingerprint {self.config.source}, detection cache disabled: {e}")
+            return None
+
+    def _use_ffmpeg_backend(self) -> bool:
+        if self.config.capture_backend != "ffmpeg":
+            return False
+        if not self.is_video_file:
+            self.logger.warning("ffmpeg backend does not support device indexes, falling back to OpenCV.")
+            return False
+        if not FFmpegCapture.is_available():
+            self.logger.warning("ffmpeg not found in PATH, falling back to OpenCV.")
+            return False
+        return True
+
+    def _decode_size(self):
+        """Độ phân giải decode của backend ffmpeg, mặc định rộng 640 và giữ tỉ lệ khung hình"""
+        width = self.config.decode_width or 640
+        height = self.config.decode_height or int(round(width * self.config.frame_height / self.config.frame_width))
+        return width, height + height % 2
+
+    def _open_ffmpeg_source(self, source: str) -> FFmpegCapture:
+        width, height = self._decode_size()
+        cap = FFmpegCapture(source, width, height, live=not os.path.isfile(source))
+        # Toạ độ BEV được hiệu chỉnh trên khung hình frame_width x frame_height
+        self.tracker.set_pixel_scale(width / self.config.frame_width, height / self.config.frame_height)
+        return cap
+
     def get_latest_frame(self):
         with self.latest_frame_lock:
             return self.latest_frame.copy() if self.latest_frame is not None else None
 
-    def process_detections(self, detections: List[Dict], frame: np.ndarray):
+    def request_bev_reload(self):
+        """Nạp lại file hiệu chỉnh BEV trước frame kế tiếp (gọi được từ thread bất kỳ)"""
+        self.bev_reload_requested = True
+
+    def _apply_pending_changes(self):
+        pending = self.pending_config
+        if pending is not self.tracker.config:
+            self.tracker.apply_config(pending)
+        if self.bev_reload_requested:
+            self.bev_reload_requested = False
+            self.tracker.reload_bev()
+
+    def process_detections(self, detections: List[Dict], frame: np.ndarray, display_width: Optional[int] = 0):
+        """Theo dõi, đo khoảng cách và vẽ kết quả cho một frame.
+
+        ``display_width`` là độ rộng khung hình giao diện cần: 0 giữ nguyên độ phân giải, None nghĩa là không
+        view nào cần frame này. Frame chỉ được vẽ ở độ phân giải gốc khi clip hoặc ảnh vi phạm cần đến nó;
+        còn lại kết quả được vẽ thẳng lên bản đã thu nhỏ, hoặc bỏ qua (``result.frame`` là None).
+        """
+        self._apply_pending_changes()
+        started = time.perf_counter()
         self.tracker.update_tracks(detections)
-        newly_warned_pairs = self.tracker.monitor_distances_and_draw(frame)
+        tracked = time.perf_counter()
+        newly_warned_pairs = self.tracker.monitor_distances()
+        recording = self.clip_recorder is not None and self.config.enable_recording
+        if recording or (newly_warned_pairs and self.snapshot_writer is not None):
+            self.tracker.draw(frame)
+            display_frame = frame
+        elif display_width is None:
+            display_frame = None
+        else:
+            height, width = frame.shape[:2]
+            if display_width and width > display_width:
+                scale = display_width / width
+                display_frame = cv2.resize(frame, (display_width, max(int(height * scale), 1)),
+                                           interpolation=cv2.INTER_AREA)
+                self.tracker.draw(display_frame, scale)
+            else:
+                display_frame = frame
+                self.tracker.draw(frame)
+        if self.latency is not None:
+            self.latency.record(self.config.camera_id, "tracking", tracked - started)
+            for stage, seconds in self.tracker.stage_times.items():
+                self.latency.record(self.config.camera_id, stage, seconds)
         result = DetectionResult(
             camera_id=self.config.camera_id,
             frame_id=self.frame_count,
-            timestamp=time.time(),
+            timestamp=self.clock(),
             detections=detections,
             close_pairs=newly_warned_pairs,
-            frame=frame
+            frame=display_frame
         )
-        file_name = datetime.now().strftime("%d-%m-%Y %H-%M-%S" + ".jpg")
+        if self.columnar_log is not None:
+            self.columnar_log.append(self.config.camera_id, self.frame_count, result.timestamp, detections,
+                                     self.tracker.snapshot_tracks())
+        if self.clip_recorder is not None:
+            self.clip_recorder.add_frame(self.config, result.timestamp, frame)
+            if newly_warned_pairs:
+                self.clip_recorder.trigger(self.config, result.timestamp)
+        self.processed_frames += 1
+        self.violation_count += len(newly_warned_pairs)
+        opened_episodes, closed_episodes = self.tracker.pop_episode_changes()
         # Lưu khung hình hiện tại (frame) vào biến image
         if newly_warned_pairs:
-            print(f"Camera {self.config.camera_id} detected {len(self.tracker.warned_pairs)} violations.")
-            for (id1, id2) in self.tracker.warned_pairs:
-                self.db_manager.log_event(self.config.camera_id, "violation", id1, id2, file_name)
-
-            save_dir = os.path.join(config.dir_capture)
-            if save_dir:
-                os.makedirs(save_dir, exist_ok=True)
-                save_path = os.path.join(save_dir, file_name)
-                try:
-                    cv2.imwrite(save_path, frame)
-                    self.logger.info(f"Saved violation frame to {save_path}")
-                except Exception as e:
-                    self.logger.error(f"Failed to save violation frame: {e}")
+            self.logger.debug(f"Camera {self.config.camera_id} detected {len(newly_warned_pairs)} new violations.")
+            file_name = None
+            if self.snapshot_writer is not None:
+                file_name = self.snapshot_writer.submit(self.config.camera_id, self.frame_count, frame)
+            for episode in opened_episodes:
+                episode.snapshot = file_name
+                self.db_manager.open_episode(episode)
+        for episode in closed_episodes:
+            self.db_manager.close_episode(episode)
 
         if self.frame_count % 300 == 0:
             stats = self.tracker.get_statistics()
@@ -116,7 +331,8 @@ class ImprovedCameraWorker(threading.Thread):
                 self.config.camera_id,
                 stats['total_tracks'],  # Tổng số lượng track theo dõi
                 stats['active_tracks'],  # Số lượng track tại khung hình hiện tại phát hiện được
-                stats['violations']  # Số lượng cặp đối tượng vi phạm khoảng cách
+                stats['violations'],  # Số lượng cặp đối tượng vi phạm khoảng cách
+                result.timestamp
             )
 
         return result
@@ -126,4 +342,9 @@ class ImprovedCameraWorker(threading.Thread):
 
     def cleanup(self):
         if self.cap: self.cap.release()
+        self.tracker.close_all_episodes()
+        for episode in self.tracker.pop_episode_changes()[1]:
+            self.db_manager.close_episode(episode)
+        if self.clip_recorder is not None:
+            self.clip_recorder.close_camera(self.config.camera_id)
         self.logger.info(f"Camera {self.config.camera_id} stopped.")
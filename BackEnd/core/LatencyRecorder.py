@@ -0,0 +1,121 @@
+import logging
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Các giai đoạn của một frame trên đường đi từ nguồn video tới giao diện
+STAGES = ("capture", "queue_wait", "preprocess", "inference", "extraction", "tracking", "distance", "render",
+          "snapshot", "gui_delivery", "end_to_end")
+
+# Histogram theo thang log: BUCKETS_PER_DECADE ô mỗi bậc 10, từ 10 µs tới 100 s (sai số tương đối ~6%)
+MIN_SECONDS = 1e-5
+BUCKETS_PER_DECADE = 20
+BUCKET_COUNT = 7 * BUCKETS_PER_DECADE + 1
+
+
+class LatencyRecorder:
+    """Histogram thời gian xử lý theo camera và theo giai đoạn, chi phí ghi rất nhỏ.
+
+    ``record`` chỉ tính chỉ số ô trong histogram log và tăng bộ đếm, nên có thể gọi trên mọi frame
+    ở hot path. ``snapshot`` trả về count, mean, max, p50/p95/p99 của từng cặp (camera, giai đoạn);
+    ``start_reporting`` chạy một thread ghi snapshot vào bảng ``performance`` mỗi ``interval`` giây
+    rồi đặt lại histogram, nên mỗi dòng trong database mô tả đúng một khoảng thời gian.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("LatencyRecorder")
+        self._lock = threading.Lock()
+        # (camera_id, stage) -> [counts, tổng thời gian, lớn nhất]
+        self._histograms: Dict[Tuple[str, str], list] = {}
+        self._window_start = time.time()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.enabled = True
+
+    def record(self, camera_id: str, stage: str, seconds: float):
+        if not self.enabled:
+            return
+        if seconds > MIN_SECONDS:
+            index = min(int((math.log10(seconds) + 5) * BUCKETS_PER_DECADE), BUCKET_COUNT - 1)
+        else:
+            index = 0
+        key = (camera_id, stage)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * BUCKET_COUNT, 0.0, 0.0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            if seconds > histogram[2]:
+                histogram[2] = seconds
+
+    @staticmethod
+    def _bucket_value(index: int) -> float:
+        """Giá trị đại diện (trung điểm theo thang log) của một ô"""
+        return 10 ** ((index + 0.5) / BUCKETS_PER_DECADE - 5)
+
+    @classmethod
+    def _percentiles(cls, counts: List[int], total: int, quantiles=(0.5, 0.95, 0.99)) -> List[float]:
+        results = []
+        cumulative = 0
+        index = 0
+        for q in quantiles:
+            target = q * total
+            while index < len(counts) and cumulative + counts[index] < target:
+                cumulative += counts[index]
+                index += 1
+            results.append(cls._bucket_value(min(index, len(counts) - 1)))
+        return results
+
+    def snapshot(self, reset: bool = False) -> List[Dict]:
+        """Thống kê (giây) của từng cặp camera/giai đoạn kể từ lần đặt lại gần nhất"""
+        with self._lock:
+            histograms = self._histograms
+            window_start = self._window_start
+            if reset:
+                self._histograms = {}
+                self._window_start = time.time()
+            else:
+                histograms = {key: [list(h[0]), h[1], h[2]] for key, h in histograms.items()}
+        rows = []
+        for (camera_id, stage), (counts, total_seconds, max_seconds) in sorted(histograms.items()):
+            count = sum(counts)
+            if count == 0:
+                continue
+            p50, p95, p99 = self._percentiles(counts, count)
+            # Percentile không vượt quá giá trị lớn nhất thực tế
+            rows.append({'camera_id': camera_id, 'stage': stage, 'count': count, 'mean': total_seconds / count,
+                         'max': max_seconds, 'p50': min(p50, max_seconds), 'p95': min(p95, max_seconds),
+                         'p99': min(p99, max_seconds), 'window': time.time() - window_start})
+        return rows
+
+    def start_reporting(self, db_manager, interval: float = 60.0):
+        """Ghi snapshot vào database định kỳ trên một thread riêng"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._report_loop, args=(db_manager, interval),
+                                        name="LatencyReporter", daemon=True)
+        self._thread.start()
+
+    def _report_loop(self, db_manager, interval: float):
+        while not self._stop_event.wait(interval):
+            self._report(db_manager)
+        self._report(db_manager)
+
+    def _report(self, db_manager):
+        try:
+            rows = self.snapshot(reset=True)
+            if rows:
+                db_manager.log_latency(rows)
+                slowest = max(rows, key=lambda row: row['p95'])
+                self.logger.debug(f"Latency snapshot: {len(rows)} series, slowest p95 {slowest['stage']} of "
+                                  f"{slowest['camera_id']} {slowest['p95'] * 1000:.1f} ms")
+        except Exception as e:
+            self.logger.error(f"Error writing latency snapshot: {e}", exc_info=True)
+
+    def stop(self):
+        """Dừng thread ghi (ghi nốt snapshot cuối cùng)"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
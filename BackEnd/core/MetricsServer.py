@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+# Ranh giới các bucket của histogram kích thước batch
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+
+def _labels(**labels) -> str:
+    escaped = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}" if escaped else ""
+
+
+class MetricsServer:
+    """HTTP endpoint ``/metrics`` theo định dạng text của Prometheus cho một MultiCameraSurveillanceSystem.
+
+    Mặc định chỉ lắng nghe trên 127.0.0.1. Số liệu được đọc trực tiếp từ các bộ đếm sẵn có của
+    camera worker, BatchProcessor, LatencyRecorder và DatabaseManager tại thời điểm scrape, nên không
+    tốn chi phí gì trên hot path. FPS được tính từ chênh lệch bộ đếm giữa hai lần scrape liên tiếp.
+    """
+
+    def __init__(self, system, host: str = "127.0.0.1", port: int = 9108):
+        self.system = system
+        self.host = host
+        self.port = port
+        self.logger = logging.getLogger("MetricsServer")
+        self._lock = threading.Lock()
+        self._last_counts: Dict[str, Tuple[float, int, int]] = {}  # camera_id -> (thời điểm, captured, processed)
+        self._rates: Dict[str, Tuple[float, float]] = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = server.render().encode("utf-8")
+                except Exception as e:
+                    server.logger.error(f"Error rendering metrics: {e}", exc_info=True)
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="MetricsServer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        self.logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _camera_rates(self, camera_id: str, captured: int, processed: int) -> Tuple[float, float]:
+        now = time.time()
+        with self._lock:
+            last = self._last_counts.get(camera_id)
+            if last is None or captured < last[1]:
+                self._last_counts[camera_id] = (now, captured, processed)
+            elif now - last[0] >= 1.0:
+                elapsed = now - last[0]
+                self._rates[camera_id] = ((captured - last[1]) / elapsed, (processed - last[2]) / elapsed)
+                self._last_counts[camera_id] = (now, captured, processed)
+            return self._rates.get(camera_id, (0.0, 0.0))
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_labels(**labels)} {value}")
+
+        workers = dict(self.system.camera_workers)
+        batch_processor = self.system.batch_processor
+        cameras = sorted(workers)
+        captured = {cid: workers[cid].frame_count + workers[cid].skipped_frames for cid in cameras}
+        processed = {cid: workers[cid].processed_frames for cid in cameras}
+        rates = {cid: self._camera_rates(cid, captured[cid], processed[cid]) for cid in cameras}
+
+        metric("surveillance_camera_up", "gauge", "1 if the camera source is open",
+               [("", {'camera': cid}, int(workers[cid].is_active)) for cid in cameras])
+        metric("surveillance_frames_captured_total", "counter", "Frames read from the source (decoded or skipped)",
+               [("", {'camera': cid}, captured[cid]) for cid in cameras])
+        metric("surveillance_frames_processed_total", "counter", "Frames that went through detection and tracking",
+               [("", {'camera': cid}, processed[cid]) for cid in cameras])
+        metric("surveillance_capture_fps", "gauge", "Capture rate since the previous scrape",
+               [("", {'camera': cid}, f"{rates[cid][0]:.3f}") for cid in cameras])
+        metric("surveillance_processed_fps", "gauge", "Processing rate since the previous scrape",
+               [("", {'camera': cid}, f"{rates[cid][1]:.3f}") for cid in cameras])
+
+        dropped = [("", {'camera': cid, 'reason': "inference_lag"}, workers[cid].skipped_frames) for cid in cameras]
+        dropped += [("", {'camera': cid, 'reason': reason}, count)
+                    for (cid, reason), count in sorted(batch_processor.dropped_snapshot().items())]
+        metric("surveillance_frames_dropped_total", "counter", "Frames dropped before detection, by reason", dropped)
+
+        metric("surveillance_batch_queue_depth", "gauge", "Items waiting in the BatchProcessor queues",
+               [("", {'queue': "input"}, batch_processor.input_queue.qsize()),
+                ("", {'queue': "output"}, batch_processor.output_queue.qsize())])
+        metric("surveillance_batch_queue_capacity", "gauge", "Capacity of the BatchProcessor queues",
+               [("", {'queue': "input"}, batch_processor.input_queue.maxsize),
+                ("", {'queue': "output"}, batch_processor.output_queue.maxsize)])
+
+        size_counts = batch_processor.batch_size_snapshot()
+        buckets = []
+        for bound in BATCH_SIZE_BUCKETS:
+            cumulative = sum(count for size, count in size_counts.items() if size <= bound)
+            buckets.append(("_bucket", {'le': bound}, cumulative))
+        total = sum(size_counts.values())
+        buckets.append(("_bucket", {'le': "+Inf"}, total))
+        buckets.append(("_sum", {}, sum(size * count for size, count in size_counts.items())))
+        buckets.append(("_count", {}, total))
+        metric("surveillance_batch_size", "histogram", "Number of frames per inference batch", buckets)
+
+        latency = [("", {'camera': row['camera_id'], 'stage': row['stage'], 'quantile': q}, f"{row[key]:.6f}")
+                   for row in self.system.latency.snapshot()
+                   for q, key in (("0.5", 'p50'), ("0.95", 'p95'), ("0.99", 'p99'))]
+        metric("surveillance_stage_latency_seconds", "gauge",
+               "Per-stage latency quantiles over the current LatencyRecorder window", latency)
+
+        metric("surveillance_active_tracks", "gauge", "People tracked in the latest processed frame",
+               [("", {'camera': cid}, workers[cid].tracker.active_track_count) for cid in cameras])
+        metric("surveillance_open_violations", "gauge", "Violation episodes currently open",
+               [("", {'camera': cid}, len(workers[cid].tracker.open_episodes)) for cid in cameras])
+        metric("surveillance_violations_total", "counter", "Violations raised",
+               [("", {'camera': cid}, workers[cid].violation_count) for cid in cameras])
+
+        db_manager = self.system.db_manager
+        metric("surveillance_db_write_queue_depth", "gauge", "Statements waiting for the database writer",
+               [("", {}, db_manager.write_queue.qsize())])
+        metric("surveillance_db_dropped_writes_total", "counter", "Database writes dropped because the queue was full",
+               [("", {}, db_manager.dropped_writes)])
+        return "\n".join(lines) + "\n"
@@ -4,7 +4,7 @@ import logging
 from collections import defaultdict, deque
 from scipy.optimize import linear_sum_assignment
 from BackEnd.core.BirdEyeViewTransform import BirdEyeViewTransform
-from BackEnd.common.DataClass import CameraConfig
+from BackEnd.common.DataClass import CameraConfig, ViolationEpisode
 
 from BackEnd.config import dir_bevConfig
 from BackEnd.data import DatabaseManager
@@ -32,24 +32,101 @@ class Track:
 
 class PersonTracker:
 
-    def __init__(self, camera_id: str, config: CameraConfig):
+    def __init__(self, camera_id: str, config: CameraConfig, clock=time.time):
         self.camera_id = camera_id
         self.config = config
+        # Nguồn thời gian cho episode; phân tích lại video dùng thời gian của footage thay cho đồng hồ hệ thống
+        self.clock = clock
         self.tracks = {}
         self.next_id = 1
         self.max_disappeared = 30
         self.max_distance = 150  # Tăng nhẹ để ổn định hơn
         self.SOCIAL_DISTANCE_THRESHOLD = config.social_distance_threshold
         self.WARNING_DURATION = config.warning_duration
+        self.bev_config_path = self.bev_config_path_for(config)
         self.bev_distance = BirdEyeViewTransform()
-        self.bev_distance.load_config_BEV(dir_bevConfig + f"config_BEV_{camera_id}.json")
+        self.bev_distance.load_config_BEV(self.bev_config_path)
+        self.pixel_scale = (1.0, 1.0)
         self.frame_count = 0
         self.current_fps = 30
         self.distance_history = defaultdict(lambda: deque(maxlen=int(self.current_fps * self.WARNING_DURATION * 1.5)))
         self.warned_pairs = set()
+        # Mỗi cặp vi phạm là một "episode": mở khi bắt đầu cảnh báo, đóng khi hai người rời xa nhau
+        self.open_episodes = {}
+        self.opened_episodes = []
+        self.closed_episodes = []
         self.colors = [tuple(np.random.randint(64, 255, 3).tolist()) for _ in range(100)]
         self.logger = logging.getLogger(f"Tracker-{camera_id}")
         self.acreage = config.acreage
+        # Thời gian (giây) đo khoảng cách và vẽ kết quả của lần gọi monitor_distances/draw gần nhất
+        self.stage_times = {}
+        # Cặp đang ở gần nhau của lần đo gần nhất, dùng để vẽ: ((id1, id2), distance)
+        self.close_pairs_info = []
+        self.active_track_count = 0
+
+    @staticmethod
+    def bev_config_path_for(config: CameraConfig) -> str:
+        """File hiệu chỉnh BEV của camera: ``config.bev_config`` hoặc file mặc định theo camera_id"""
+        return config.bev_config or dir_bevConfig + f"config_BEV_{config.camera_id}.json"
+
+    def set_pixel_scale(self, factor_x: float, factor_y: float):
+        """Khai báo khung hình đã bị thu nhỏ so với độ phân giải lúc hiệu chỉnh BEV"""
+        old_x, old_y = self.pixel_scale
+        self.bev_distance.rescale_source(factor_x / old_x, factor_y / old_y)
+        self.max_distance = self.max_distance * factor_x / old_x
+        self.pixel_scale = (factor_x, factor_y)
+
+    def reload_bev(self):
+        """Nạp lại homography BEV từ file mà không làm mất trạng thái tracking"""
+        bev_distance = BirdEyeViewTransform()
+        bev_distance.load_config_BEV(self.bev_config_path)
+        if self.pixel_scale != (1.0, 1.0):
+            bev_distance.rescale_source(*self.pixel_scale)
+        self.bev_distance = bev_distance
+        self.logger.info(f"Reloaded BEV calibration from {self.bev_config_path}")
+
+    def apply_config(self, config: CameraConfig):
+        """Cập nhật ngưỡng từ cấu hình mới, giữ nguyên các track đang theo dõi.
+
+        Phải gọi trên thread đang xử lý detection (giữa hai frame), xem ``ImprovedCameraWorker.pending_config``.
+        """
+        self.config = config
+        self.SOCIAL_DISTANCE_THRESHOLD = config.social_distance_threshold
+        self.acreage = config.acreage
+        bev_config_path = self.bev_config_path_for(config)
+        if bev_config_path != self.bev_config_path:
+            self.bev_config_path = bev_config_path
+            self.reload_bev()
+        if config.warning_duration != self.WARNING_DURATION:
+            self.WARNING_DURATION = config.warning_duration
+            maxlen = int(self.current_fps * self.WARNING_DURATION * 1.5)
+            for pair_key, history in list(self.distance_history.items()):
+                self.distance_history[pair_key] = deque(history, maxlen=maxlen)
+
+    def _open_episode(self, pair_key, distance, close_time):
+        episode = ViolationEpisode(self.camera_id, pair_key[0], pair_key[1], self.clock() - close_time, distance)
+        self.open_episodes[pair_key] = episode
+        self.opened_episodes.append(episode)
+        return episode
+
+    def _close_episode(self, pair_key, end_time=None):
+        episode = self.open_episodes.pop(pair_key, None)
+        if episode is not None:
+            episode.end_time = end_time or self.clock()
+            self.closed_episodes.append(episode)
+
+    def close_all_episodes(self):
+        """Đóng mọi episode đang mở (khi camera dừng)"""
+        end_time = self.clock()
+        for pair_key in list(self.open_episodes):
+            self._close_episode(pair_key, end_time)
+        self.warned_pairs.clear()
+
+    def pop_episode_changes(self):
+        """Trả về (episode mới mở, episode vừa đóng) kể từ lần gọi trước"""
+        opened, closed = self.opened_episodes, self.closed_episodes
+        self.opened_episodes, self.closed_episodes = [], []
+        return opened, closed
 
     def calculate_real_distance(self, center1, center2, height1, height2):
         xy_leg1 = (center1[0], center1[1] + height1 / 2)
@@ -65,6 +142,13 @@ class PersonTracker:
             'violations': len(self.warned_pairs)
         }
 
+    def snapshot_tracks(self):
+        """Trạng thái các track hiện tại: (id, x1, y1, x2, y2, confidence, disappeared, bev_x, bev_y)"""
+        tracks = list(self.tracks.values())
+        legs = [(t.center[0], t.center[1] + t.height_pixels / 2) for t in tracks]
+        bev = self.bev_distance.transform_points(legs)
+        return [(t.id, *t.bbox, t.confidence, t.disappeared, float(x), float(y)) for t, (x, y) in zip(tracks, bev)]
+
     def update_tracks(self, detections):
         active_track_ids = list(self.tracks.keys())
         if not detections:
@@ -100,18 +184,18 @@ class PersonTracker:
         self.tracks = {tid: t for tid, t in self.tracks.items() if t.disappeared <= self.max_disappeared}
 
     def monitor_distances_and_draw(self, frame):
+        newly_warned_pairs_data = self.monitor_distances()
+        self.draw(frame)
+        return newly_warned_pairs_data
+
+    def monitor_distances(self):
+        """Đo khoảng cách giữa các track đang hiện diện, cập nhật cảnh báo và episode; không vẽ lên frame"""
+        started = time.perf_counter()
         active_tracks = {tid: t for tid, t in self.tracks.items() if t.disappeared == 0}
+        self.active_track_count = len(active_tracks)
         close_pairs_info = []
         newly_warned_pairs_data = []
 
-        # Draw tracks first
-        for tid, track in active_tracks.items():
-            x1, y1, x2, y2 = track.bbox
-            color = self.colors[tid % len(self.colors)]
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            label = f'ID: {tid}'
-            cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-        # Monitor and draw violation lines
         active_track_list = list(active_tracks.items())
         for i in range(len(active_track_list)):
             for j in range(i + 1, len(active_track_list)):
@@ -128,22 +212,60 @@ class PersonTracker:
                         close_time = close_frames / self.current_fps
                         if close_time >= self.WARNING_DURATION and pair_key not in self.warned_pairs:
                             self.warned_pairs.add(pair_key)
+                            episode = self._open_episode(pair_key, distance, close_time)
                             quantity_per_acre = len(active_tracks) / self.acreage if self.acreage > 0 else 0
-                            newly_warned_pairs_data.append((id1, id2, distance, close_time, quantity_per_acre))
+                            newly_warned_pairs_data.append((id1, id2, distance, close_time, quantity_per_acre,
+                                                            episode.start_time))
+                    episode = self.open_episodes.get(pair_key)
+                    if episode is not None and distance < episode.min_distance:
+                        episode.min_distance = distance
 
                 else:
                     self.warned_pairs.discard(pair_key)
+                    self._close_episode(pair_key)
+        # Cặp có track đã bị xoá sẽ không bao giờ được đo lại, đóng episode của chúng
+        for pair_key in [k for k in self.open_episodes if k[0] not in self.tracks or k[1] not in self.tracks]:
+            self.warned_pairs.discard(pair_key)
+            self._close_episode(pair_key)
+
+        self.close_pairs_info = close_pairs_info
+        self.stage_times = {'distance': time.perf_counter() - started}
+        return newly_warned_pairs_data
+
+    def draw(self, frame, scale: float = 1.0):
+        """Vẽ track và cặp vi phạm của lần đo gần nhất lên ``frame``.
 
-        for (id1, id2), distance in close_pairs_info:
+        ``scale`` là tỉ lệ giữa ``frame`` và khung hình gốc, dùng khi vẽ trực tiếp lên frame đã thu nhỏ.
+        """
+        started = time.perf_counter()
+        font_scale = max(scale, 0.5)
+        thickness = 2 if scale >= 0.5 else 1
+
+        def point(x, y):
+            return int(x * scale), int(y * scale)
+
+        # Draw tracks first
+        for tid, track in self.tracks.items():
+            if track.disappeared:
+                continue
+            x1, y1, x2, y2 = track.bbox
+            color = self.colors[tid % len(self.colors)]
+            cv2.rectangle(frame, point(x1, y1), point(x2, y2), color, thickness)
+            label = f'ID: {tid}'
+            cv2.putText(frame, label, point(x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7 * font_scale, color,
+                        thickness)
+        # Draw violation lines
+        for (id1, id2), distance in self.close_pairs_info:
             track1, track2 = self.tracks[id1], self.tracks[id2]
-            leg1 = (track1.center[0], track1.center[1] + track1.height_pixels // 2)
-            leg2 = (track2.center[0], track2.center[1] + track2.height_pixels // 2)
+            leg1 = point(track1.center[0], track1.center[1] + track1.height_pixels // 2)
+            leg2 = point(track2.center[0], track2.center[1] + track2.height_pixels // 2)
             # cv2.line(frame, track1.center, track2.center, (0, 0, 255), 2)
-            cv2.circle(frame, leg1, 5, (0, 0, 255), -1)
-            cv2.circle(frame, leg2, 5, (0, 0, 255), -1)
-            cv2.line(frame, leg1, leg2, (0, 0, 255), 2)
+            cv2.circle(frame, leg1, max(int(5 * scale), 2), (0, 0, 255), -1)
+            cv2.circle(frame, leg2, max(int(5 * scale), 2), (0, 0, 255), -1)
+            cv2.line(frame, leg1, leg2, (0, 0, 255), thickness)
             # mid_point = ((track1.center[0] + track2.center[0]) // 2, (track1.center[1] + track2.center[1]) // 2)
             mid_point = ((leg1[0] + leg2[0]) // 2, (leg1[1] + leg2[1]) // 2)
-            cv2.putText(frame, f'{distance:.1f}m', mid_point, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+            cv2.putText(frame, f'{distance:.1f}m', mid_point, cv2.FONT_HERSHEY_SIMPLEX, 0.6 * font_scale,
+                        (0, 0, 255), thickness)
 
-        return newly_warned_pairs_data
+        self.stage_times['render'] = time.perf_counter() - started
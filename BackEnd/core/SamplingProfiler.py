@@ -0,0 +1,134 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional, Sequence
+
+from BackEnd.config import dir_profile, profile_duration, profile_interval
+
+# Tiền tố tên các thread của pipeline được lấy mẫu mặc định
+PIPELINE_THREADS = ("CameraWorker-", "BatchProcessor", "ResultProcessor", "AsyncIngestion", "Decode",
+                    "FrameRenderer")
+CAMERA_WORKER_PREFIX = "CameraWorker-"
+
+
+def _frame_camera(frame) -> Optional[str]:
+    """Camera mà frame này đang xử lý: tham số ``camera_id`` hoặc ``self`` gắn với một camera (tracker, worker).
+
+    Biến ``camera_id`` của vòng lặp không được dùng vì vẫn giữ giá trị cũ khi thread đang chờ.
+    """
+    code = frame.f_code
+    arguments = code.co_varnames[:code.co_argcount]
+    if "camera_id" not in arguments and arguments[:1] != ("self",):
+        return None
+    f_locals = frame.f_locals
+    if "camera_id" in arguments:
+        camera_id = f_locals.get("camera_id")
+        if isinstance(camera_id, str):
+            return camera_id
+    owner = f_locals.get("self")
+    camera_id = getattr(owner, "camera_id", None) or getattr(getattr(owner, "config", None), "camera_id", None)
+    return camera_id if isinstance(camera_id, str) else None
+
+
+class SamplingProfiler:
+    """Profiler lấy mẫu stack của các thread pipeline trong tiến trình đang chạy.
+
+    Khi bật (``start``), một thread nền đọc ``sys._current_frames()`` mỗi ``interval`` giây trong
+    ``duration`` giây rồi ghi file dạng "collapsed stacks" (mỗi dòng ``thread;camera;hàm;...;hàm số_mẫu``),
+    mở được bằng flamegraph.pl, speedscope hoặc inferno. Mỗi stack bắt đầu bằng tên thread và camera đang
+    được xử lý (lấy từ tên thread của camera worker hoặc từ các hàm đang chạy cho một camera). Khi không bật thì
+    không có thread nào chạy và hot path không bị đo gì.
+    """
+
+    def __init__(self, interval: float = profile_interval, threads: Sequence[str] = PIPELINE_THREADS,
+                 output_dir: str = dir_profile):
+        self.interval = interval
+        self.threads = tuple(threads)
+        self.output_dir = output_dir
+        self.logger = logging.getLogger("SamplingProfiler")
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_output: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float = profile_duration, path: str = None) -> bool:
+        """Bắt đầu lấy mẫu trong ``duration`` giây; trả về False nếu đang có một lần profile khác"""
+        with self._lock:
+            if self.running:
+                self.logger.warning("Profiler is already running")
+                return False
+            if path is None:
+                path = os.path.join(self.output_dir, time.strftime("profile_%Y%m%d-%H%M%S.collapsed"))
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration, path), name="SamplingProfiler",
+                                            daemon=True)
+            self._thread.start()
+        self.logger.info(f"Profiling pipeline threads for {duration:.0f}s every {self.interval * 1000:.0f} ms")
+        return True
+
+    def stop(self):
+        """Kết thúc sớm lần profile đang chạy (vẫn ghi file)"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout=5.0)
+
+    def _run(self, duration: float, path: str):
+        stacks = Counter()
+        names = {}
+        samples = 0
+        deadline = time.perf_counter() + duration
+        next_sample = time.perf_counter()
+        while not self._stop_event.is_set() and next_sample < deadline:
+            if samples % 100 == 0:
+                # Danh sách thread chỉ cần làm mới thỉnh thoảng (camera có thể được thêm/bớt)
+                names = {thread.ident: thread.name for thread in threading.enumerate()
+                         if thread.name.startswith(self.threads)}
+            self._sample(names, stacks)
+            samples += 1
+            next_sample += self.interval
+            delay = next_sample - time.perf_counter()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                next_sample = time.perf_counter()  # Không bù các mẫu bị trễ
+        try:
+            self._write(path, stacks)
+            self.last_output = path
+            self.logger.info(f"Wrote {samples} samples ({sum(stacks.values())} stacks) to {path}")
+        except OSError as e:
+            self.logger.error(f"Cannot write profile {path}: {e}")
+
+    @staticmethod
+    def _sample(names, stacks: Counter):
+        for thread_id, frame in sys._current_frames().items():
+            thread_name = names.get(thread_id)
+            if thread_name is None:
+                continue
+            camera_id = thread_name[len(CAMERA_WORKER_PREFIX):] if thread_name.startswith(CAMERA_WORKER_PREFIX) \
+                else None
+            functions = []
+            while frame is not None:
+                code = frame.f_code
+                if camera_id is None:
+                    camera_id = _frame_camera(frame)
+                functions.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            functions.reverse()
+            stacks[(thread_name, camera_id or "-", *functions)] += 1
+
+    @staticmethod
+    def _write(path: str, stacks: Counter):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(";".join(part.replace(";", ":") for part in stack) + f" {count}\n")
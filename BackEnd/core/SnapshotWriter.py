@@ -0,0 +1,99 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+import BackEnd.config as config
+from BackEnd.core.LatencyRecorder import LatencyRecorder
+
+
+class SnapshotWriter:
+    """Lưu ảnh vi phạm ở background để thread xử lý kết quả không phải chờ encode JPEG và ghi đĩa.
+
+    ``submit`` chỉ sao chép frame rồi đưa vào một thread pool có giới hạn (``max_workers`` thread,
+    tối đa ``max_pending`` ảnh đang chờ; vượt quá thì ảnh bị bỏ và được đếm). Mỗi camera lưu tối đa
+    một ảnh mỗi ``min_interval`` giây, các vi phạm trong khoảng đó dùng lại ảnh gần nhất. Tên file
+    ``{camera_id}_{frame_id}_{epoch_ms}.jpg`` không trùng nhau giữa các camera.
+    """
+
+    def __init__(self, save_dir: str = config.dir_capture, max_workers: int = config.snapshot_workers,
+                 max_pending: int = config.snapshot_max_pending, jpeg_quality: int = config.snapshot_jpeg_quality,
+                 max_width: int = config.snapshot_max_width, min_interval: float = config.snapshot_min_interval,
+                 latency: LatencyRecorder = None):
+        self.save_dir = save_dir
+        self.max_pending = max_pending
+        self.jpeg_quality = jpeg_quality
+        self.max_width = max_width
+        self.min_interval = min_interval
+        self.latency = latency
+        self.logger = logging.getLogger("SnapshotWriter")
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="Snapshot")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_saved: Dict[str, tuple] = {}  # camera_id -> (thời điểm, tên file)
+        self.written = 0
+        self.dropped = 0
+        self.throttled = 0
+        self.running = True
+        os.makedirs(save_dir, exist_ok=True)
+
+    def submit(self, camera_id: str, frame_id: int, frame: np.ndarray) -> Optional[str]:
+        """Xếp lịch lưu ảnh; trả về tên file (tương đối với ``save_dir``) hoặc None nếu không lưu"""
+        now = time.time()
+        with self._lock:
+            if not self.running:
+                return None
+            last = self._last_saved.get(camera_id)
+            if last is not None and now - last[0] < self.min_interval:
+                self.throttled += 1
+                return last[1]
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                if self.dropped % 100 == 1:
+                    self.logger.warning(f"Snapshot queue full, dropped {self.dropped} snapshots so far")
+                return None
+            self._pending += 1
+            file_name = f"{camera_id}_{frame_id}_{int(now * 1000)}.jpg"
+            self._last_saved[camera_id] = (now, file_name)
+        self.executor.submit(self._write, camera_id, file_name, frame.copy())
+        return file_name
+
+    def _write(self, camera_id: str, file_name: str, frame: np.ndarray):
+        started = time.perf_counter()
+        try:
+            height, width = frame.shape[:2]
+            if self.max_width and width > self.max_width:
+                scale = self.max_width / width
+                frame = cv2.resize(frame, (self.max_width, int(round(height * scale))), interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise RuntimeError("JPEG encoding failed")
+            save_path = os.path.join(self.save_dir, file_name)
+            tmp_path = save_path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(encoded.tobytes())
+            os.replace(tmp_path, save_path)
+            self.written += 1
+            if self.latency is not None:
+                self.latency.record(camera_id, "snapshot", time.perf_counter() - started)
+            self.logger.info(f"Saved violation frame to {save_path}")
+        except Exception as e:
+            self.logger.error(f"Failed to save violation frame {file_name}: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stop(self):
+        """Ghi nốt các ảnh đang chờ rồi dừng thread pool"""
+        with self._lock:
+            if not self.running:
+                return
+            self.running = False
+        self.executor.shutdown(wait=True)
+        self.logger.info(f"Snapshot writer stopped ({self.written} written, {self.throttled} throttled, "
+                         f"{self.dropped} dropped)")
@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from BackEnd.config import dir_trace, trace_max_events
+
+# Chrome trace: "process" 1 chứa một track cho mỗi thread, "process" 2 một track cho mỗi camera
+THREADS_PID = 1
+CAMERAS_PID = 2
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "camera_id", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, camera_id: Optional[str], args: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.camera_id = camera_id
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.complete(self.name, self.start, time.perf_counter(), self.camera_id, **self.args)
+        return False
+
+
+class Tracer:
+    """Ghi timeline của pipeline (span theo frame/batch) và xuất ra Chrome trace / Perfetto JSON.
+
+    Tắt mặc định; khi tắt, ``span`` trả về một context manager rỗng dùng chung nên chi phí chỉ là một
+    lần kiểm tra cờ. Có thể bật/tắt lúc đang chạy (``start``/``stop``). Sự kiện nằm trong một deque có
+    giới hạn ``max_events``, sự kiện cũ nhất bị đẩy ra khi đầy. Khi xuất, mỗi thread là một track;
+    sự kiện gắn camera được chép thêm sang track của camera đó, và các sự kiện flow nối một frame từ
+    camera worker qua BatchProcessor tới thread xử lý kết quả.
+    """
+
+    def __init__(self, max_events: int = trace_max_events):
+        self.enabled = False
+        self.logger = logging.getLogger("Tracer")
+        self._events = deque(maxlen=max_events)
+        self._thread_names: Dict[int, str] = {}
+        # Bảo vệ _events và _thread_names: nhiều thread cùng ghi, export đọc từ thread khác
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self.started_at: Optional[float] = None
+
+    def start(self, clear: bool = True):
+        if clear:
+            with self._lock:
+                self._events.clear()
+        self.started_at = time.time()
+        self.enabled = True
+        self.logger.info(f"Tracing started (buffer {self._events.maxlen} events)")
+
+    def stop(self):
+        self.enabled = False
+        self.logger.info(f"Tracing stopped ({len(self._events)} events buffered)")
+
+    def toggle(self, directory: str = dir_trace) -> Optional[str]:
+        """Bật nếu đang tắt; nếu đang bật thì tắt và xuất buffer vào ``directory``, trả về đường dẫn file"""
+        if not self.enabled:
+            self.start()
+            return None
+        self.stop()
+        path = os.path.join(directory, time.strftime("trace_%Y%m%d-%H%M%S.json"))
+        self.export(path)
+        return path
+
+    def _record(self, phase: str, name: str, start: float, duration: float, camera_id: Optional[str], args: Dict,
+                on_thread: bool = True):
+        tid = threading.get_ident() if on_thread else None
+        with self._lock:
+            if tid is not None and tid not in self._thread_names:
+                self._thread_names[tid] = threading.current_thread().name
+            self._events.append((phase, name, start, duration, tid, camera_id, args))
+
+    def span(self, name: str, camera_id: str = None, **args):
+        """Context manager đo một đoạn code; ``camera_id`` đưa span lên track của camera"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, camera_id, args)
+
+    def complete(self, name: str, start: float, end: float, camera_id: str = None, camera_only: bool = False,
+                 **args):
+        """Ghi một đoạn đã đo sẵn (mốc ``time.perf_counter``); ``camera_only`` để không hiện trên track thread"""
+        if self.enabled:
+            self._record("X", name, start, end - start, camera_id, args, on_thread=not camera_only)
+
+    def instant(self, name: str, camera_id: str = None, **args):
+        if self.enabled:
+            self._record("i", name, time.perf_counter(), 0.0, camera_id, args)
+
+    def flow(self, phase: str, flow_id: str, name: str = "frame"):
+        """Sự kiện flow ("s" bắt đầu, "t" bước, "f" kết thúc) gắn vào span đang mở trên thread hiện tại"""
+        if self.enabled:
+            self._record(phase, name, time.perf_counter(), 0.0, None, {'id': flow_id})
+
+    def export(self, path: str) -> int:
+        """Ghi các sự kiện đang có trong buffer ra file JSON, trả về số sự kiện"""
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        cameras = sorted({event[5] for event in events if event[5] is not None})
+        camera_tids = {camera_id: i + 1 for i, camera_id in enumerate(cameras)}
+        trace = [{'ph': "M", 'name': "process_name", 'pid': THREADS_PID, 'args': {'name': "Threads"}},
+                 {'ph': "M", 'name': "process_name", 'pid': CAMERAS_PID, 'args': {'name': "Cameras"}}]
+        trace += [{'ph': "M", 'name': "thread_name", 'pid': THREADS_PID, 'tid': tid, 'args': {'name': name}}
+                  for tid, name in thread_names.items()]
+        trace += [{'ph': "M", 'name': "thread_name", 'pid': CAMERAS_PID, 'tid': tid, 'args': {'name': camera_id}}
+                  for camera_id, tid in camera_tids.items()]
+
+        def us(seconds: float) -> float:
+            return round((seconds - self._origin) * 1e6, 3)
+
+        for phase, name, start, duration, tid, camera_id, args in events:
+            if phase in ("s", "t", "f"):
+                event = {'ph': phase, 'name': name, 'cat': "flow", 'id': args['id'], 'ts': us(start),
+                         'pid': THREADS_PID, 'tid': tid}
+                if phase != "s":
+                    event['bp'] = "e"
+                trace.append(event)
+                continue
+            base = {'ph': phase, 'name': name, 'ts': us(start), 'args': dict(args)}
+            if phase == "X":
+                base['dur'] = round(duration * 1e6, 3)
+            else:
+                base['s'] = "t"
+            if camera_id is not None:
+                base['args']['camera'] = camera_id
+            if tid is not None:
+                trace.append(dict(base, pid=THREADS_PID, tid=tid))
+            if camera_id is not None:
+                trace.append(dict(base, pid=CAMERAS_PID, tid=camera_tids[camera_id]))
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': "ms"}, f)
+        self.logger.info(f"Wrote {len(events)} trace events to {path}")
+        return len(events)
+
+
+# Tracer dùng chung cho cả tiến trình (giống logging), tắt cho tới khi được bật
+tracer = Tracer()
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Schema các loại bản ghi: mỗi cột được lưu thành một file .npy riêng trong từng chunk
+SCHEMA = {
+    'frames': [('frame_id', np.int64), ('timestamp', np.float64), ('detections', np.int32),
+               ('tracks', np.int32)],
+    'detections': [('frame_id', np.int64), ('timestamp', np.float64), ('x1', np.int32), ('y1', np.int32),
+                   ('x2', np.int32), ('y2', np.int32), ('confidence', np.float32)],
+    'tracks': [('frame_id', np.int64), ('timestamp', np.float64), ('track_id', np.int32), ('x1', np.int32),
+               ('y1', np.int32), ('x2', np.int32), ('y2', np.int32), ('confidence', np.float32),
+               ('disappeared', np.int16), ('bev_x', np.float32), ('bev_y', np.float32)],
+}
+INDEX_FILE = "index.jsonl"
+
+
+class ColumnarLog:
+    """Ghi toàn bộ detection và trạng thái track của từng frame thành các chunk dạng cột.
+
+    Bố cục trên đĩa: ``{root}/{camera_id}/{kind}/{seq:08d}/{column}.npy`` với ``kind`` là
+    ``frames``, ``detections`` hoặc ``tracks`` (xem ``SCHEMA``), cùng file ``index.jsonl`` ghi số dòng
+    và khoảng thời gian của từng chunk để ColumnarLogReader bỏ qua chunk nằm ngoài khoảng cần đọc.
+    Thread xử lý kết quả chỉ đưa dữ liệu vào một hàng đợi có giới hạn; một thread riêng chuyển sang
+    mảng numpy và ghi chunk khi đủ ``chunk_rows`` dòng hoặc sau ``flush_interval`` giây.
+    """
+
+    def __init__(self, root_dir: str, chunk_rows: int = 65536, flush_interval: float = 10.0,
+                 max_queue_size: int = 2000, max_buffered_rows: int = 1_000_000):
+        self.root_dir = root_dir
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.max_buffered_rows = max_buffered_rows
+        self.logger = logging.getLogger("ColumnarLog")
+        self.dropped_frames = 0
+        self.written_chunks = 0
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        # (camera_id, kind) -> danh sách các dòng chưa ghi
+        self._buffers: Dict[Tuple[str, str], List[tuple]] = defaultdict(list)
+        self._buffer_started: Dict[Tuple[str, str], float] = {}
+        self._buffered_rows = 0
+        self._next_seq: Dict[Tuple[str, str], int] = {}
+        self.running = True
+        os.makedirs(root_dir, exist_ok=True)
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="ColumnarLogWriter", daemon=True)
+        self.writer_thread.start()
+
+    def append(self, camera_id: str, frame_id: int, timestamp: float, detections: List[Dict], tracks: List[tuple]):
+        """Đưa kết quả của một frame vào hàng đợi; frame bị bỏ (và được đếm) nếu hàng đợi đầy"""
+        if not self.running:
+            return
+        try:
+            self.queue.put_nowait((camera_id, frame_id, timestamp, detections, tracks))
+        except queue.Full:
+            self.dropped_frames += 1
+            if self.dropped_frames % 1000 == 1:
+                self.logger.warning(f"Columnar log queue full, dropped {self.dropped_frames} frames so far")
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Chờ tới khi mọi frame đã đưa vào được ghi xuống đĩa"""
+        if not self.writer_thread.is_alive():
+            return False
+        done = threading.Event()
+        self.queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 10.0):
+        if not self.running:
+            return
+        self.running = False
+        self.queue.put(threading.Event())
+        self.writer_thread.join(timeout)
+        self.logger.info(f"Columnar log stopped ({self.written_chunks} chunks written, "
+                         f"{self.dropped_frames} frames dropped)")
+
+    def _writer_loop(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                item = None
+            try:
+                if isinstance(item, tuple):
+                    self._buffer_frame(*item)
+                if isinstance(item, threading.Event):
+                    self._flush_buffers(lambda key: True)
+                    item.set()
+                    if not self.running:
+                        break
+                    continue
+                now = time.time()
+                if self._buffered_rows > self.max_buffered_rows:
+                    self._flush_buffers(lambda key: True)
+                else:
+                    self._flush_buffers(lambda key: len(self._buffers[key]) >= self.chunk_rows
+                                        or now - self._buffer_started[key] >= self.flush_interval)
+            except Exception as e:
+                self.logger.error(f"Error writing columnar log: {e}", exc_info=True)
+
+    def _buffer_frame(self, camera_id: str, frame_id: int, timestamp: float, detections: List[Dict],
+                      tracks: List[tuple]):
+        self._add_rows(camera_id, 'frames', [(frame_id, timestamp, len(detections), len(tracks))])
+        if detections:
+            self._add_rows(camera_id, 'detections',
+                           [(frame_id, timestamp, *det['bbox'], det['confidence']) for det in detections])
+        if tracks:
+            self._add_rows(camera_id, 'tracks', [(frame_id, timestamp, *track) for track in tracks])
+
+    def _add_rows(self, camera_id: str, kind: str, rows: List[tuple]):
+        key = (camera_id, kind)
+        if not self._buffers[key]:
+            self._buffer_started[key] = time.time()
+        self._buffers[key].extend(rows)
+        self._buffered_rows += len(rows)
+
+    def _flush_buffers(self, should_flush):
+        for key in [key for key, rows in self._buffers.items() if rows and should_flush(key)]:
+            rows = self._buffers.pop(key)
+            self._buffer_started.pop(key, None)
+            self._buffered_rows -= len(rows)
+            self._write_chunk(key[0], key[1], rows)
+
+    def _kind_dir(self, camera_id: str, kind: str) -> str:
+        return os.path.join(self.root_dir, camera_id, kind)
+
+    def _allocate_seq(self, camera_id: str, kind: str) -> int:
+        key = (camera_id, kind)
+        if key not in self._next_seq:
+            existing = [int(name) for name in os.listdir(self._kind_dir(camera_id, kind)) if name.isdigit()]
+            self._next_seq[key] = max(existing, default=-1) + 1
+        seq = self._next_seq[key]
+        self._next_seq[key] = seq + 1
+        return seq
+
+    def _write_chunk(self, camera_id: str, kind: str, rows: List[tuple]):
+        kind_dir = self._kind_dir(camera_id, kind)
+        os.makedirs(kind_dir, exist_ok=True)
+        seq = self._allocate_seq(camera_id, kind)
+        name = f"{seq:08d}"
+        tmp_dir = os.path.join(kind_dir, f".{name}.tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        columns = list(zip(*rows))
+        timestamps = None
+        frame_ids = None
+        for (column, dtype), values in zip(SCHEMA[kind], columns):
+            array = np.asarray(values, dtype=dtype)
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), array)
+            if column == 'timestamp':
+                timestamps = array
+            elif column == 'frame_id':
+                frame_ids = array
+        # Đổi tên thư mục sau khi ghi xong để reader không bao giờ thấy chunk ghi dở
+        os.replace(tmp_dir, os.path.join(kind_dir, name))
+        entry = {'chunk': name, 'rows': len(rows),
+                 'start_time': float(timestamps.min()), 'end_time': float(timestamps.max()),
+                 'first_frame': int(frame_ids.min()), 'last_frame': int(frame_ids.max())}
+        with open(os.path.join(kind_dir, INDEX_FILE), 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+        self.written_chunks += 1
@@ -0,0 +1,80 @@
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from BackEnd.data.ColumnarLog import INDEX_FILE, SCHEMA
+
+
+class ColumnarLogReader:
+    """Đọc dữ liệu do ColumnarLog ghi ra để phân tích offline.
+
+    Chỉ những chunk có khoảng thời gian giao với khoảng cần đọc mới được mở, và các cột được mở bằng
+    ``np.load(mmap_mode='r')`` nên chỉ phần dữ liệu thực sự dùng tới mới được đọc từ đĩa.
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+
+    def cameras(self) -> List[str]:
+        if not os.path.isdir(self.root_dir):
+            return []
+        return sorted(name for name in os.listdir(self.root_dir)
+                      if os.path.isdir(os.path.join(self.root_dir, name)))
+
+    @staticmethod
+    def _columns(kind: str, columns: Optional[List[str]]) -> List[str]:
+        if kind not in SCHEMA:
+            raise ValueError(f"Unknown record kind '{kind}', expected one of {sorted(SCHEMA)}")
+        return columns or [name for name, _ in SCHEMA[kind]]
+
+    def chunks(self, camera_id: str, kind: str, start_time: float = None, end_time: float = None) -> List[Dict]:
+        """Các dòng trong index của những chunk giao với [start_time, end_time]"""
+        index_path = os.path.join(self.root_dir, camera_id, kind, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return []
+        selected = []
+        with open(index_path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if start_time is not None and entry['end_time'] < start_time:
+                    continue
+                if end_time is not None and entry['start_time'] > end_time:
+                    continue
+                selected.append(entry)
+        return selected
+
+    def iter_chunks(self, camera_id: str, kind: str, start_time: float = None, end_time: float = None,
+                    columns: Optional[List[str]] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """Lần lượt trả về các cột (memory-mapped, đã cắt theo khoảng thời gian) của từng chunk"""
+        names = self._columns(kind, columns)
+        for entry in self.chunks(camera_id, kind, start_time, end_time):
+            chunk_dir = os.path.join(self.root_dir, camera_id, kind, entry['chunk'])
+            selection = slice(None)
+            inside = ((start_time is None or entry['start_time'] >= start_time)
+                      and (end_time is None or entry['end_time'] <= end_time))
+            if not inside:
+                timestamps = np.load(os.path.join(chunk_dir, "timestamp.npy"), mmap_mode='r')
+                mask = np.ones(len(timestamps), dtype=bool)
+                if start_time is not None:
+                    mask &= timestamps >= start_time
+                if end_time is not None:
+                    mask &= timestamps <= end_time
+                selection = np.flatnonzero(mask)
+            yield {name: np.load(os.path.join(chunk_dir, f"{name}.npy"), mmap_mode='r')[selection]
+                   for name in names}
+
+    def scan(self, camera_id: str, kind: str, start_time: float = None, end_time: float = None,
+             columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Đọc các cột của một camera trong khoảng thời gian và nối thành mảng liền"""
+        names = self._columns(kind, columns)
+        parts = {name: [] for name in names}
+        for chunk in self.iter_chunks(camera_id, kind, start_time, end_time, names):
+            for name in names:
+                parts[name].append(chunk[name])
+        dtypes = dict(SCHEMA[kind])
+        return {name: np.concatenate(arrays) if arrays else np.empty(0, dtype=dtypes[name])
+                for name, arrays in parts.items()}
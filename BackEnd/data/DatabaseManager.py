@@ -1,17 +1,211 @@
+import atexit
+import logging
+import queue
 import sqlite3
+import threading
 import time
+from typing import Dict, List, Optional, Tuple
+
+from BackEnd.common.DataClass import ViolationEpisode
+
+ROLLUP_BUCKET_SECONDS = 3600
+DAILY_BUCKET_SECONDS = 86400
+
+# Các bước nâng cấp schema, áp dụng theo thứ tự dựa trên PRAGMA user_version.
+# Version 1 là các bảng gốc được tạo trong init_database.
+SCHEMA_MIGRATIONS = [
+    (2, "indexes and hourly rollups", [
+        "CREATE INDEX IF NOT EXISTS idx_events_camera_time ON events (camera_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_statistics_camera_time ON statistics (camera_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_episodes_camera_start ON violation_episodes (camera_id, start_time)",
+        "CREATE INDEX IF NOT EXISTS idx_episodes_start ON violation_episodes (start_time)",
+        "CREATE INDEX IF NOT EXISTS idx_performance_time ON performance (timestamp)",
+        '''
+        CREATE TABLE IF NOT EXISTS violation_rollup_hourly
+        (
+            camera_id      TEXT NOT NULL,
+            bucket_start   REAL NOT NULL,
+            episodes       INTEGER NOT NULL DEFAULT 0,
+            total_duration REAL NOT NULL DEFAULT 0,
+            min_distance   REAL,
+            PRIMARY KEY (camera_id, bucket_start)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS occupancy_rollup_hourly
+        (
+            camera_id      TEXT NOT NULL,
+            bucket_start   REAL NOT NULL,
+            samples        INTEGER NOT NULL DEFAULT 0,
+            sum_active     INTEGER NOT NULL DEFAULT 0,
+            max_active     INTEGER NOT NULL DEFAULT 0,
+            sum_total      INTEGER NOT NULL DEFAULT 0,
+            max_violations INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (camera_id, bucket_start)
+        ) WITHOUT ROWID
+        ''',
+        # Rollup được cập nhật tăng dần bằng trigger ngay trong transaction ghi dữ liệu gốc
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_episodes_rollup_insert AFTER INSERT ON violation_episodes
+        BEGIN
+            INSERT INTO violation_rollup_hourly (camera_id, bucket_start, episodes, min_distance)
+            VALUES (NEW.camera_id, CAST(NEW.start_time / {ROLLUP_BUCKET_SECONDS} AS INTEGER) * {ROLLUP_BUCKET_SECONDS},
+                    1, NEW.min_distance)
+            ON CONFLICT (camera_id, bucket_start) DO UPDATE
+                SET episodes     = episodes + 1,
+                    min_distance = MIN(COALESCE(min_distance, excluded.min_distance), excluded.min_distance);
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_episodes_rollup_close AFTER UPDATE OF end_time ON violation_episodes
+        WHEN OLD.end_time IS NULL AND NEW.end_time IS NOT NULL
+        BEGIN
+            UPDATE violation_rollup_hourly
+            SET total_duration = total_duration + COALESCE(NEW.duration, 0),
+                min_distance   = MIN(COALESCE(min_distance, NEW.min_distance), NEW.min_distance)
+            WHERE camera_id = NEW.camera_id
+              AND bucket_start = CAST(NEW.start_time / {ROLLUP_BUCKET_SECONDS} AS INTEGER) * {ROLLUP_BUCKET_SECONDS};
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_statistics_rollup_insert AFTER INSERT ON statistics
+        BEGIN
+            INSERT INTO occupancy_rollup_hourly (camera_id, bucket_start, samples, sum_active, max_active, sum_total,
+                                                 max_violations)
+            VALUES (NEW.camera_id, CAST(NEW.timestamp / {ROLLUP_BUCKET_SECONDS} AS INTEGER) * {ROLLUP_BUCKET_SECONDS},
+                    1, NEW.active_persons, NEW.active_persons, NEW.total_persons, NEW.violations)
+            ON CONFLICT (camera_id, bucket_start) DO UPDATE
+                SET samples        = samples + 1,
+                    sum_active     = sum_active + excluded.sum_active,
+                    max_active     = MAX(max_active, excluded.max_active),
+                    sum_total      = sum_total + excluded.sum_total,
+                    max_violations = MAX(max_violations, excluded.max_violations);
+        END
+        ''',
+        # Tính rollup cho dữ liệu đã có trước khi nâng cấp
+        f'''
+        INSERT OR REPLACE INTO violation_rollup_hourly (camera_id, bucket_start, episodes, total_duration, min_distance)
+        SELECT camera_id, CAST(start_time / {ROLLUP_BUCKET_SECONDS} AS INTEGER) * {ROLLUP_BUCKET_SECONDS},
+               COUNT(*), COALESCE(SUM(duration), 0), MIN(min_distance)
+        FROM violation_episodes
+        GROUP BY 1, 2
+        ''',
+        f'''
+        INSERT OR REPLACE INTO occupancy_rollup_hourly (camera_id, bucket_start, samples, sum_active, max_active,
+                                                        sum_total, max_violations)
+        SELECT camera_id, CAST(timestamp / {ROLLUP_BUCKET_SECONDS} AS INTEGER) * {ROLLUP_BUCKET_SECONDS},
+               COUNT(*), SUM(active_persons), MAX(active_persons), SUM(total_persons), MAX(violations)
+        FROM statistics
+        GROUP BY 1, 2
+        ''',
+    ]),
+    (3, "daily rollups for downsampled history", [
+        '''
+        CREATE TABLE IF NOT EXISTS violation_rollup_daily
+        (
+            camera_id      TEXT NOT NULL,
+            bucket_start   REAL NOT NULL,
+            episodes       INTEGER NOT NULL DEFAULT 0,
+            total_duration REAL NOT NULL DEFAULT 0,
+            min_distance   REAL,
+            PRIMARY KEY (camera_id, bucket_start)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS occupancy_rollup_daily
+        (
+            camera_id      TEXT NOT NULL,
+            bucket_start   REAL NOT NULL,
+            samples        INTEGER NOT NULL DEFAULT 0,
+            sum_active     INTEGER NOT NULL DEFAULT 0,
+            max_active     INTEGER NOT NULL DEFAULT 0,
+            sum_total      INTEGER NOT NULL DEFAULT 0,
+            max_violations INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (camera_id, bucket_start)
+        ) WITHOUT ROWID
+        ''',
+    ]),
+    # Mỗi dòng performance là thống kê thời gian của một giai đoạn trên một camera trong một khoảng
+    # (xem LatencyRecorder); processing_time là thời gian trung bình, fps là số frame mỗi giây
+    (4, "per-camera stage latency percentiles", [
+        "ALTER TABLE performance ADD COLUMN camera_id TEXT",
+        "ALTER TABLE performance ADD COLUMN stage TEXT",
+        "ALTER TABLE performance ADD COLUMN count INTEGER",
+        "ALTER TABLE performance ADD COLUMN p50 REAL",
+        "ALTER TABLE performance ADD COLUMN p95 REAL",
+        "ALTER TABLE performance ADD COLUMN p99 REAL",
+        "CREATE INDEX IF NOT EXISTS idx_performance_camera_stage ON performance (camera_id, stage, timestamp)",
+    ]),
+]
 
 
 class DatabaseManager:
-    """Quản lý database để lưu trữ kết quả"""
+    """Quản lý database để lưu trữ kết quả
 
-    def __init__(self, db_path: str = "surveillance.db"):
+    Các hàm log_* không ghi trực tiếp mà đưa câu lệnh vào một hàng đợi có giới hạn. Một thread ghi
+    riêng giữ một kết nối SQLite duy nhất (chế độ WAL) và ghi theo lô bằng ``executemany`` khi đủ
+    ``flush_size`` dòng hoặc sau ``flush_interval`` giây, nên thread xử lý kết quả không bao giờ phải
+    chờ fsync.
+    """
+
+    def __init__(self, db_path: str = "surveillance.db", max_queue_size: int = 10000, flush_size: int = 256,
+                 flush_interval: float = 0.5):
         self.db_path = db_path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger("DatabaseManager")
+        self.dropped_writes = 0
+        self._readers = threading.local()
         self.init_database()
+        self.write_queue = queue.Queue(maxsize=max_queue_size)
+        self.running = True
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="DatabaseWriter", daemon=True)
+        self.writer_thread.start()
+        atexit.register(self.stop)
+
+    @staticmethod
+    def enable_incremental_vacuum(db_path: str) -> bool:
+        """Chuyển database cũ sang auto_vacuum=INCREMENTAL bằng một lần VACUUM toàn bộ.
+
+        Có thể mất vài phút với database lớn và khoá toàn bộ file, chỉ chạy khi hệ thống đang dừng.
+        Trả về False nếu database đã ở chế độ INCREMENTAL.
+        """
+        logger = logging.getLogger("DatabaseManager")
+        conn = sqlite3.connect(db_path)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                logger.info(f"{db_path} already uses incremental auto_vacuum")
+                return False
+            size = conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+            logger.info(f"Vacuuming {db_path} ({size / 1024 / 1024:.1f} MB) to enable incremental auto_vacuum...")
+            start = time.time()
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            size = conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+            logger.info(f"Vacuumed {db_path} in {time.time() - start:.1f}s ({size / 1024 / 1024:.1f} MB)")
+            return True
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10.0)
+        conn.execute("PRAGMA synchronous=NORMAL")  # An toàn với WAL, chỉ fsync khi checkpoint
+        return conn
 
     def init_database(self):
         """Khởi tạo database"""
         conn = sqlite3.connect(self.db_path)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Cần auto_vacuum=INCREMENTAL để RetentionManager trả lại dung lượng theo từng phần nhỏ
+            if conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+                # Database mới: đặt chế độ trước khi tạo bảng là đủ
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            else:
+                # Database cũ phải VACUUM toàn bộ để đổi chế độ, quá lâu để làm lúc khởi động
+                self.logger.warning(f"{self.db_path} does not use incremental auto_vacuum, retention cannot reclaim "
+                                    f"disk space; run 'python main.py --vacuum-db {self.db_path}' while the system "
+                                    f"is stopped to convert it")
+        conn.execute("PRAGMA journal_mode=WAL")
         cursor = conn.cursor()
 
         # Bảng events
@@ -80,46 +274,317 @@ class DatabaseManager:
                        )
                        ''')
 
+        # Bảng violation_episodes: mỗi lần hai người ở quá gần nhau là một dòng,
+        # ghi khi episode bắt đầu và cập nhật một lần khi kết thúc
+        cursor.execute('''
+                       CREATE TABLE IF NOT EXISTS violation_episodes
+                       (
+                           id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                           camera_id    TEXT,
+                           person_id1   INTEGER,
+                           person_id2   INTEGER,
+                           start_time   REAL,
+                           end_time     REAL,
+                           min_distance REAL,
+                           duration     REAL,
+                           snapshot     TEXT
+                       )
+                       ''')
+        cursor.execute('''
+                       CREATE UNIQUE INDEX IF NOT EXISTS idx_episodes_pair
+                           ON violation_episodes (camera_id, person_id1, person_id2, start_time)
+                       ''')
+
         conn.commit()
+        self._migrate(conn)
         conn.close()
 
+    def _migrate(self, conn: sqlite3.Connection):
+        """Áp dụng các bước trong SCHEMA_MIGRATIONS mà database chưa có"""
+        version = max(conn.execute("PRAGMA user_version").fetchone()[0], 1)
+        for target, description, statements in SCHEMA_MIGRATIONS:
+            if target <= version:
+                continue
+            self.logger.info(f"Migrating database schema to version {target}: {description}")
+            try:
+                conn.execute("BEGIN")
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            version = target
+        if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+
+    def _enqueue(self, sql: str, params: tuple):
+        if not self.running:
+            self.logger.warning("Database writer stopped, dropping write")
+            return
+        try:
+            # Không chờ chỗ trống: hàm này được gọi từ pipeline, đầy hàng đợi thì bỏ bản ghi và đếm lại
+            self.write_queue.put_nowait((sql, params))
+        except queue.Full:
+            self.dropped_writes += 1
+            self.logger.warning("Database write queue full, dropping write")
+
     def log_event(self, camera_id: str, event_type: str, person_id1: int,
                   person_id2: int = None, description: str = ""):
         """Ghi lại sự kiện"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self._enqueue('''
+                      INSERT INTO events (camera_id, event_type, timestamp, person_id1, person_id2,
+                                          description)
+                      VALUES (?, ?, ?, ?, ?, ?)
+                      ''', (camera_id, event_type, time.time(), person_id1, person_id2, description))
 
-        cursor.execute('''
-                       INSERT INTO events (camera_id, event_type, timestamp, person_id1, person_id2,
-                                           description)
-                       VALUES (?, ?, ?, ?, ?, ?)
-                       ''', (camera_id, event_type, time.time(), person_id1, person_id2, description))
+    def log_statistics(self, camera_id: str, total_persons: int, active_persons: int, violations: int,
+                       timestamp: float = None):
+        """Ghi lại thống kê (mặc định tại thời điểm hiện tại)"""
+        self._enqueue('''
+                      INSERT INTO statistics (camera_id, timestamp, total_persons, active_persons, violations)
+                      VALUES (?, ?, ?, ?, ?)
+                      ''', (camera_id, timestamp or time.time(), total_persons, active_persons, violations))
 
-        conn.commit()
-        conn.close()
+    def log_performance(self, batch_size: int, processing_time: float, fps: float):
+        """Ghi lại performance"""
+        self._enqueue('''
+                      INSERT INTO performance (timestamp, batch_size, processing_time, fps)
+                      VALUES (?, ?, ?, ?)
+                      ''', (time.time(), batch_size, processing_time, fps))
 
-    def log_statistics(self, camera_id: str, total_persons: int, active_persons: int, violations: int):
-        """Ghi lại thống kê"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def log_latency(self, rows: List[Dict]):
+        """Ghi snapshot của LatencyRecorder (mỗi cặp camera/giai đoạn một dòng)"""
+        now = time.time()
+        for row in rows:
+            self._enqueue('''
+                          INSERT INTO performance (timestamp, camera_id, stage, count, processing_time, p50, p95,
+                                                   p99, fps)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                          ''', (now, row['camera_id'], row['stage'], row['count'], row['mean'], row['p50'],
+                                row['p95'], row['p99'], row['count'] / row['window'] if row['window'] > 0 else None))
 
-        cursor.execute('''
-                       INSERT INTO statistics (camera_id, timestamp, total_persons, active_persons, violations)
-                       VALUES (?, ?, ?, ?, ?)
-                       ''', (camera_id, time.time(), total_persons, active_persons, violations))
+    def open_episode(self, episode: ViolationEpisode):
+        """Ghi một episode vi phạm vừa bắt đầu.
 
-        conn.commit()
+        Phân tích lại cùng một video (replay) cho đúng các khoá cũ: dòng đã có được cập nhật thay vì báo lỗi,
+        và vì không phải INSERT/đóng lần đầu nên rollup không bị đếm hai lần.
+        """
+        self._enqueue('''
+                      INSERT INTO violation_episodes (camera_id, person_id1, person_id2, start_time, min_distance,
+                                                      snapshot)
+                      VALUES (?, ?, ?, ?, ?, ?)
+                      ON CONFLICT (camera_id, person_id1, person_id2, start_time) DO UPDATE
+                          SET min_distance = excluded.min_distance,
+                              snapshot     = COALESCE(excluded.snapshot, snapshot)
+                      ''', (episode.camera_id, episode.person_id1, episode.person_id2, episode.start_time,
+                            episode.min_distance, episode.snapshot))
+
+    def close_episode(self, episode: ViolationEpisode):
+        """Cập nhật thời điểm kết thúc, khoảng cách nhỏ nhất và thời lượng của episode"""
+        self._enqueue('''
+                      UPDATE violation_episodes
+                      SET end_time = ?, min_distance = ?, duration = ?
+                      WHERE camera_id = ? AND person_id1 = ? AND person_id2 = ? AND start_time = ?
+                      ''', (episode.end_time, episode.min_distance, episode.duration, episode.camera_id,
+                            episode.person_id1, episode.person_id2, episode.start_time))
+
+    def _read_connection(self) -> sqlite3.Connection:
+        """Kết nối chỉ đọc dùng lại theo từng thread (WAL cho phép đọc song song với thread ghi)"""
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0)
+            conn.row_factory = sqlite3.Row
+            self._readers.conn = conn
+        return conn
+
+    @staticmethod
+    def _time_filter(column: str, camera_id: Optional[str], start_time: Optional[float],
+                     end_time: Optional[float]) -> Tuple[str, list]:
+        clauses, params = [], []
+        if camera_id is not None:
+            clauses.append("camera_id = ?")
+            params.append(camera_id)
+        if start_time is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(start_time)
+        if end_time is not None:
+            clauses.append(f"{column} < ?")
+            params.append(end_time)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query_violations(self, camera_id: str = None, start_time: float = None, end_time: float = None,
+                         limit: int = 100, before: Tuple[float, int] = None) -> List[Dict]:
+        """Liệt kê các episode vi phạm, mới nhất trước.
+
+        Phân trang theo keyset: truyền ``before=(start_time, id)`` của dòng cuối trang trước để lấy trang
+        tiếp theo, nên mỗi trang chỉ là một lần duyệt index dù bảng có hàng triệu dòng.
+        """
+        where, params = self._time_filter("start_time", camera_id, start_time, end_time)
+        if before is not None:
+            where += (" AND " if where else " WHERE ") + "(start_time < ? OR (start_time = ? AND id < ?))"
+            params += [before[0], before[0], before[1]]
+        rows = self._read_connection().execute(f'''
+            SELECT id, camera_id, person_id1, person_id2, start_time, end_time, min_distance, duration, snapshot
+            FROM violation_episodes{where}
+            ORDER BY start_time DESC, id DESC
+            LIMIT ?
+            ''', params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def _rollup_source(self, table: str, columns: str, bucket: str) -> str:
+        """Bảng (hoặc truy vấn con) rollup theo giờ hoặc theo ngày.
+
+        Dữ liệu theo ngày gồm bảng ``*_daily`` (lịch sử đã được RetentionManager gộp) cộng với
+        các dòng theo giờ còn lại được gộp theo ngày khi truy vấn.
+        """
+        if bucket == "hour":
+            return f"{table}_hourly"
+        if bucket != "day":
+            raise ValueError(f"Unsupported bucket '{bucket}', expected 'hour' or 'day'")
+        return f"""(SELECT camera_id, bucket_start, {columns} FROM {table}_daily
+                    UNION ALL
+                    SELECT camera_id, CAST(bucket_start / {DAILY_BUCKET_SECONDS} AS INTEGER) * {DAILY_BUCKET_SECONDS},
+                           {columns}
+                    FROM {table}_hourly)"""
+
+    def query_violation_counts(self, camera_id: str = None, start_time: float = None,
+                               end_time: float = None, bucket: str = "hour") -> List[Dict]:
+        """Số episode vi phạm, tổng thời lượng và khoảng cách nhỏ nhất theo giờ hoặc ngày (từ bảng rollup)"""
+        source = self._rollup_source("violation_rollup", "episodes, total_duration, min_distance", bucket)
+        where, params = self._time_filter("bucket_start", camera_id, start_time, end_time)
+        rows = self._read_connection().execute(f'''
+            SELECT camera_id, bucket_start, SUM(episodes) AS episodes, SUM(total_duration) AS total_duration,
+                   MIN(min_distance) AS min_distance
+            FROM {source}{where}
+            GROUP BY camera_id, bucket_start
+            ORDER BY bucket_start, camera_id
+            ''', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def query_occupancy(self, camera_id: str = None, start_time: float = None,
+                        end_time: float = None, bucket: str = "hour") -> List[Dict]:
+        """Số người trung bình/lớn nhất theo giờ hoặc ngày (từ bảng rollup)"""
+        source = self._rollup_source("occupancy_rollup",
+                                     "samples, sum_active, max_active, sum_total, max_violations", bucket)
+        where, params = self._time_filter("bucket_start", camera_id, start_time, end_time)
+        rows = self._read_connection().execute(f'''
+            SELECT camera_id, bucket_start, SUM(samples) AS samples,
+                   CAST(SUM(sum_active) AS REAL) / SUM(samples) AS avg_active, MAX(max_active) AS max_active,
+                   CAST(SUM(sum_total) AS REAL) / SUM(samples) AS avg_total, MAX(max_violations) AS max_violations
+            FROM {source}{where}
+            GROUP BY camera_id, bucket_start
+            ORDER BY bucket_start, camera_id
+            ''', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def query_latency(self, camera_id: str = None, stage: str = None, start_time: float = None,
+                      end_time: float = None) -> List[Dict]:
+        """Các snapshot thời gian xử lý (giây) đã ghi, cũ nhất trước"""
+        where, params = self._time_filter("timestamp", camera_id, start_time, end_time)
+        where += (" AND " if where else " WHERE ") + "stage IS NOT NULL"
+        if stage is not None:
+            where += " AND stage = ?"
+            params.append(stage)
+        rows = self._read_connection().execute(f'''
+            SELECT timestamp, camera_id, stage, count, processing_time AS mean, p50, p95, p99, fps
+            FROM performance{where}
+            ORDER BY timestamp, camera_id, stage
+            ''', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Chờ tới khi mọi lệnh ghi đã đưa vào hàng đợi được commit"""
+        if not self.writer_thread.is_alive():
+            return False
+        done = threading.Event()
+        try:
+            self.write_queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _writer_loop(self):
+        conn = self._connect()
+        pending: List[Tuple[str, tuple]] = []
+        deadline = time.time() + self.flush_interval
+        while True:
+            try:
+                item = self.write_queue.get(timeout=max(deadline - time.time(), 0.001))
+            except queue.Empty:
+                item = None
+            if isinstance(item, tuple):
+                pending.append(item)
+                if len(pending) < self.flush_size and time.time() < deadline:
+                    continue
+            # Đủ lô, hết thời gian chờ hoặc có yêu cầu flush (threading.Event)
+            if pending:
+                self._write_batch(conn, pending)
+                pending = []
+            deadline = time.time() + self.flush_interval
+            if isinstance(item, threading.Event):
+                item.set()
+            if not self.running and (isinstance(item, threading.Event) or item is None):
+                break
+        # Lệnh ghi đã qua kiểm tra running trong _enqueue nhưng vào hàng đợi sau tín hiệu dừng
+        leftover = []
+        while True:
+            try:
+                item = self.write_queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, tuple):
+                leftover.append(item)
+            else:
+                item.set()
+        if leftover:
+            self._write_batch(conn, leftover)
         conn.close()
 
-    def log_performance(self, batch_size: int, processing_time: float, fps: float):
-        """Ghi lại performance"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _write_batch(self, conn: sqlite3.Connection, items: List[Tuple[str, tuple]]):
+        """Ghi một lô trong một transaction, gom các câu lệnh giống nhau liên tiếp vào executemany"""
+        try:
+            start = 0
+            while start < len(items):
+                sql = items[start][0]
+                end = start
+                while end < len(items) and items[end][0] == sql:
+                    end += 1
+                conn.executemany(sql, [params for _, params in items[start:end]])
+                start = end
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            self.logger.warning(f"Error writing {len(items)} rows to database, retrying row by row: {e}")
+            self._write_rows(conn, items)
 
-        cursor.execute('''
-                       INSERT INTO performance (timestamp, batch_size, processing_time, fps)
-                       VALUES (?, ?, ?, ?)
-                       ''', (time.time(), batch_size, processing_time, fps))
+    def _write_rows(self, conn: sqlite3.Connection, items: List[Tuple[str, tuple]]):
+        """Ghi lại từng dòng của một lô bị lỗi, chỉ bỏ (và đếm vào dropped_writes) những dòng không ghi được"""
+        failed = 0
+        try:
+            for sql, params in items:
+                try:
+                    conn.execute(sql, params)
+                except sqlite3.Error as e:
+                    failed += 1
+                    self.logger.error(f"Dropping database write {sql.split()[0]} {params}: {e}")
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            failed = len(items)
+            self.logger.error(f"Error writing {len(items)} rows to database: {e}", exc_info=True)
+        self.dropped_writes += failed
 
-        conn.commit()
-        conn.close()
\ No newline at end of file
+    def stop(self, timeout: float = 5.0):
+        """Ghi nốt dữ liệu còn trong hàng đợi rồi đóng kết nối"""
+        if not self.running:
+            return
+        self.running = False
+        try:
+            self.write_queue.put(threading.Event(), timeout=timeout)
+        except queue.Full:
+            pass  # Thread ghi vẫn tự dừng khi đã ghi hết hàng đợi
+        self.writer_thread.join(timeout)
+        self.logger.info("Database writer stopped")
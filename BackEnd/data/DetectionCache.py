@@ -0,0 +1,192 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# (source_fingerprint, preprocess, frame_index)
+CacheKey = Tuple[str, str, int]
+
+# Chi phí ước lượng của mỗi dòng (khoá, index) ngoài dữ liệu box, tính vào giới hạn dung lượng
+ROW_OVERHEAD = 32
+
+_fingerprints: Dict[tuple, str] = {}
+
+
+class DetectionCache:
+    """Cache detection của YOLO trên đĩa cho nguồn là file video (lặp lại hoặc phân tích lại).
+
+    Khoá gồm dấu vân tay nội dung file, thông số tiền xử lý (backend, kích thước frame, kích thước
+    inference), phiên bản model và chỉ số frame trong file. Mỗi frame lưu các box người dưới dạng
+    mảng float32 Nx5 (x1, y1, x2, y2, confidence) trong một BLOB của SQLite, chưa lọc theo ngưỡng
+    confidence của camera. Dung lượng bị giới hạn bởi ``max_bytes``, vượt quá thì xoá các frame lâu
+    không dùng nhất (LRU); khi phiên bản model thay đổi, toàn bộ dữ liệu của model cũ bị xoá.
+    """
+
+    def __init__(self, db_path: str = "detection_cache.db", max_bytes: int = 256 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.model_version: Optional[str] = None
+        self.logger = logging.getLogger("DetectionCache")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._streams: Dict[Tuple[str, str], int] = {}
+        self._touched: Dict[Tuple[int, int], int] = {}
+        self.conn = sqlite3.connect(db_path, timeout=10.0, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS streams
+            (
+                stream_id     INTEGER PRIMARY KEY,
+                source        TEXT NOT NULL,
+                preprocess    TEXT NOT NULL,
+                model_version TEXT NOT NULL,
+                UNIQUE (source, preprocess, model_version)
+            );
+            CREATE TABLE IF NOT EXISTS detections
+            (
+                stream_id   INTEGER NOT NULL,
+                frame_index INTEGER NOT NULL,
+                boxes       BLOB NOT NULL,
+                last_used   INTEGER NOT NULL,
+                PRIMARY KEY (stream_id, frame_index)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_detections_last_used ON detections (last_used);
+        ''')
+        self.total_bytes = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        return self.conn.execute(f"SELECT COALESCE(SUM(length(boxes) + {ROW_OVERHEAD}), 0) "
+                                 f"FROM detections").fetchone()[0]
+
+    @staticmethod
+    def source_fingerprint(path: str, sample_bytes: int = 1024 * 1024) -> str:
+        """Dấu vân tay nội dung file: kích thước cùng hash của đoạn đầu, giữa và cuối file"""
+        stat = os.stat(path)
+        cache_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if cache_key not in _fingerprints:
+            digest = hashlib.sha1(str(stat.st_size).encode())
+            with open(path, 'rb') as f:
+                for offset in (0, max(stat.st_size // 2 - sample_bytes // 2, 0), max(stat.st_size - sample_bytes, 0)):
+                    f.seek(offset)
+                    digest.update(f.read(sample_bytes))
+            _fingerprints[cache_key] = digest.hexdigest()
+        return _fingerprints[cache_key]
+
+    def set_model_version(self, model_version: str):
+        """Khai báo phiên bản model hiện tại và xoá dữ liệu của các model khác"""
+        with self._lock:
+            self.model_version = model_version
+            self._streams.clear()
+            stale = [row[0] for row in self.conn.execute(
+                "SELECT stream_id FROM streams WHERE model_version != ?", (model_version,))]
+            if stale:
+                placeholders = ",".join("?" * len(stale))
+                self.conn.execute(f"DELETE FROM detections WHERE stream_id IN ({placeholders})", stale)
+                self.conn.execute(f"DELETE FROM streams WHERE stream_id IN ({placeholders})", stale)
+                self.conn.commit()
+                self.total_bytes = self._stored_bytes()
+                self.logger.info(f"Model changed to {model_version}, invalidated {len(stale)} cached streams")
+
+    def _stream_id(self, source: str, preprocess: str, create: bool) -> Optional[int]:
+        stream = (source, preprocess)
+        if stream not in self._streams:
+            row = self.conn.execute("SELECT stream_id FROM streams WHERE source = ? AND preprocess = ? "
+                                    "AND model_version = ?", (source, preprocess, self.model_version)).fetchone()
+            if row is None:
+                if not create:
+                    return None
+                row = (self.conn.execute("INSERT INTO streams (source, preprocess, model_version) VALUES (?, ?, ?)",
+                                         (source, preprocess, self.model_version)).lastrowid,)
+            self._streams[stream] = row[0]
+        return self._streams[stream]
+
+    def get_many(self, keys: List[Optional[CacheKey]]) -> List[Optional[np.ndarray]]:
+        """Tra cache cho từng khoá (None = không dùng cache); trả về mảng Nx5 hoặc None nếu chưa có"""
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        if self.model_version is None:
+            return results
+        now = int(time.time())
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key is None:
+                    continue
+                stream_id = self._stream_id(key[0], key[1], create=False)
+                row = None
+                if stream_id is not None:
+                    row = self.conn.execute("SELECT boxes FROM detections WHERE stream_id = ? AND frame_index = ?",
+                                            (stream_id, key[2])).fetchone()
+                if row is None:
+                    self.misses += 1
+                    continue
+                self.hits += 1
+                self._touched[(stream_id, key[2])] = now
+                results[i] = np.frombuffer(row[0], dtype=np.float32).reshape(-1, 5)
+        return results
+
+    def put_many(self, items: List[Tuple[CacheKey, np.ndarray]]):
+        """Lưu kết quả của các frame vừa chạy inference, rồi xoá bớt nếu vượt ``max_bytes``"""
+        if self.model_version is None or not items:
+            return
+        now = int(time.time())
+        with self._lock:
+            try:
+                rows = []
+                for (source, preprocess, frame_index), boxes in items:
+                    blob = np.ascontiguousarray(boxes, dtype=np.float32).tobytes()
+                    rows.append((self._stream_id(source, preprocess, create=True), frame_index, blob, now))
+                    self.total_bytes += len(blob) + ROW_OVERHEAD
+                self.conn.executemany("INSERT OR REPLACE INTO detections (stream_id, frame_index, boxes, last_used) "
+                                      "VALUES (?, ?, ?, ?)", rows)
+                self._flush_touched()
+                if self.total_bytes > self.max_bytes:
+                    self._evict()
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                self._streams.clear()
+                self.logger.error(f"Error writing detection cache: {e}", exc_info=True)
+
+    def _flush_touched(self):
+        # Thời điểm dùng gần nhất được cập nhật theo lô thay vì ghi ngay mỗi lần trúng cache
+        if self._touched:
+            self.conn.executemany("UPDATE detections SET last_used = ? WHERE stream_id = ? AND frame_index = ?",
+                                  [(used, stream_id, frame_index)
+                                   for (stream_id, frame_index), used in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self):
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        while self.total_bytes > target:
+            victims = self.conn.execute(f"SELECT stream_id, frame_index, length(boxes) + {ROW_OVERHEAD} "
+                                        f"FROM detections ORDER BY last_used LIMIT 1000").fetchall()
+            if not victims:
+                self.total_bytes = 0
+                break
+            selected = []
+            for stream_id, frame_index, size in victims:
+                if self.total_bytes <= target:
+                    break
+                selected.append((stream_id, frame_index))
+                self.total_bytes -= size
+            self.conn.executemany("DELETE FROM detections WHERE stream_id = ? AND frame_index = ?", selected)
+            evicted += len(selected)
+        self.logger.info(f"Evicted {evicted} cached frames, cache size {self.total_bytes / 1024 / 1024:.1f} MB")
+
+    def flush(self):
+        with self._lock:
+            self._flush_touched()
+            self.conn.commit()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self.conn.close()
+        self.logger.info(f"Detection cache closed ({self.hits} hits, {self.misses} misses)")
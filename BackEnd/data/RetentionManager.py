@@ -0,0 +1,183 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from BackEnd.common.DataClass import RetentionPolicy
+from BackEnd.data.DatabaseManager import DAILY_BUCKET_SECONDS
+
+# Bảng dữ liệu gốc -> (cột thời gian, tên trường số ngày trong RetentionPolicy)
+RAW_TABLES = {
+    'statistics': ('timestamp', 'statistics_days'),
+    'events': ('timestamp', 'events_days'),
+    'violation_episodes': ('start_time', 'episodes_days'),
+    'performance': ('timestamp', 'performance_days'),
+}
+
+# Gộp một lát rollup theo giờ vào bảng theo ngày (cộng dồn nếu ngày đó đã có dòng)
+DOWNSAMPLE_SQL = {
+    'occupancy_rollup': f'''
+        INSERT INTO occupancy_rollup_daily (camera_id, bucket_start, samples, sum_active, max_active, sum_total,
+                                            max_violations)
+        SELECT camera_id, CAST(bucket_start / {DAILY_BUCKET_SECONDS} AS INTEGER) * {DAILY_BUCKET_SECONDS},
+               SUM(samples), SUM(sum_active), MAX(max_active), SUM(sum_total), MAX(max_violations)
+        FROM (SELECT * FROM occupancy_rollup_hourly WHERE bucket_start < ? ORDER BY bucket_start, camera_id LIMIT ?)
+        WHERE true
+        GROUP BY 1, 2
+        ON CONFLICT (camera_id, bucket_start) DO UPDATE
+            SET samples        = samples + excluded.samples,
+                sum_active     = sum_active + excluded.sum_active,
+                max_active     = MAX(max_active, excluded.max_active),
+                sum_total      = sum_total + excluded.sum_total,
+                max_violations = MAX(max_violations, excluded.max_violations)
+        ''',
+    'violation_rollup': f'''
+        INSERT INTO violation_rollup_daily (camera_id, bucket_start, episodes, total_duration, min_distance)
+        SELECT camera_id, CAST(bucket_start / {DAILY_BUCKET_SECONDS} AS INTEGER) * {DAILY_BUCKET_SECONDS},
+               SUM(episodes), SUM(total_duration), MIN(min_distance)
+        FROM (SELECT * FROM violation_rollup_hourly WHERE bucket_start < ? ORDER BY bucket_start, camera_id LIMIT ?)
+        WHERE true
+        GROUP BY 1, 2
+        ON CONFLICT (camera_id, bucket_start) DO UPDATE
+            SET episodes       = episodes + excluded.episodes,
+                total_duration = total_duration + excluded.total_duration,
+                min_distance   = COALESCE(MIN(min_distance, excluded.min_distance), min_distance,
+                                          excluded.min_distance)
+        ''',
+}
+
+
+class RetentionManager(threading.Thread):
+    """Dọn dữ liệu cũ để database không phình mãi trên các máy chạy nhiều tháng.
+
+    Mỗi lượt chạy: gộp rollup theo giờ quá hạn vào bảng theo ngày, xóa dữ liệu gốc quá hạn, rồi
+    ``PRAGMA incremental_vacuum`` để trả trang trống về cho hệ điều hành. Mọi việc được chia thành
+    các transaction nhỏ (``slice_rows`` dòng / ``vacuum_pages`` trang) trên kết nối riêng, nghỉ
+    ``slice_pause`` giữa các lát, nên thread ghi của DatabaseManager chỉ phải chờ vài mili giây.
+    """
+
+    def __init__(self, db_path: str, policy: RetentionPolicy = None):
+        super().__init__(name="RetentionManager", daemon=True)
+        self.db_path = db_path
+        self.policy = policy or RetentionPolicy()
+        self.logger = logging.getLogger("RetentionManager")
+        self.last_report: Optional[Dict] = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        if self._stop_event.wait(self.policy.initial_delay):
+            return
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                self.logger.error(f"Error applying retention policy: {e}", exc_info=True)
+            if self._stop_event.wait(self.policy.interval):
+                break
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run_once(self, now: float = None) -> Dict:
+        """Áp dụng chính sách một lần và trả về báo cáo số dòng đã xóa/gộp và dung lượng thu hồi"""
+        now = time.time() if now is None else now
+        start = time.time()
+        conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+        try:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+            report = {'downsampled': {}, 'deleted': {}}
+
+            hourly_cutoff = self._cutoff(now, self.policy.hourly_rollup_days)
+            if hourly_cutoff is not None:
+                # Chỉ gộp những ngày đã trọn vẹn để mỗi ngày nằm gọn trong bảng daily
+                hourly_cutoff = (hourly_cutoff // DAILY_BUCKET_SECONDS) * DAILY_BUCKET_SECONDS
+                for table in DOWNSAMPLE_SQL:
+                    report['downsampled'][f"{table}_hourly"] = self._downsample(conn, table, hourly_cutoff)
+
+            daily_cutoff = self._cutoff(now, self.policy.daily_rollup_days)
+            if daily_cutoff is not None:
+                for table in DOWNSAMPLE_SQL:
+                    report['deleted'][f"{table}_daily"] = self._delete_slices(
+                        conn, f"{table}_daily", "bucket_start", daily_cutoff,
+                        key="camera_id, bucket_start")
+
+            for table, (column, field) in RAW_TABLES.items():
+                cutoff = self._cutoff(now, getattr(self.policy, field))
+                if cutoff is not None:
+                    report['deleted'][table] = self._delete_slices(conn, table, column, cutoff)
+
+            freed_pages = self._incremental_vacuum(conn)
+            pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        finally:
+            conn.close()
+
+        report['freed_pages'] = freed_pages
+        report['reclaimed_bytes'] = max(pages_before - pages_after, 0) * page_size
+        report['database_bytes'] = pages_after * page_size
+        report['elapsed'] = time.time() - start
+        self.last_report = report
+        self.logger.info(f"Retention: deleted {sum(report['deleted'].values())} rows, downsampled "
+                         f"{sum(report['downsampled'].values())} hourly rollups, reclaimed "
+                         f"{report['reclaimed_bytes'] / 1024 / 1024:.1f} MB "
+                         f"(database {report['database_bytes'] / 1024 / 1024:.1f} MB) in {report['elapsed']:.1f}s")
+        return report
+
+    @staticmethod
+    def _cutoff(now: float, days: Optional[float]) -> Optional[float]:
+        return None if days is None else now - days * DAILY_BUCKET_SECONDS
+
+    def _pause(self) -> bool:
+        """Nghỉ giữa hai lát; trả về True nếu đang dừng thread"""
+        return self._stop_event.wait(self.policy.slice_pause)
+
+    def _downsample(self, conn: sqlite3.Connection, table: str, cutoff: float) -> int:
+        hourly = f"{table}_hourly"
+        moved = 0
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(DOWNSAMPLE_SQL[table], (cutoff, self.policy.slice_rows))
+                deleted = conn.execute(f'''
+                    DELETE FROM {hourly}
+                    WHERE (camera_id, bucket_start) IN (SELECT camera_id, bucket_start FROM {hourly}
+                                                       WHERE bucket_start < ?
+                                                       ORDER BY bucket_start, camera_id LIMIT ?)
+                    ''', (cutoff, self.policy.slice_rows)).rowcount
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            moved += deleted
+            if deleted < self.policy.slice_rows or self._pause():
+                return moved
+
+    def _delete_slices(self, conn: sqlite3.Connection, table: str, column: str, cutoff: float,
+                       key: str = "rowid") -> int:
+        deleted = 0
+        while True:
+            count = conn.execute(f'''
+                DELETE FROM {table}
+                WHERE ({key}) IN (SELECT {key} FROM {table} WHERE {column} < ? LIMIT ?)
+                ''', (cutoff, self.policy.slice_rows)).rowcount
+            deleted += count
+            if count < self.policy.slice_rows or self._pause():
+                return deleted
+
+    def _incremental_vacuum(self, conn: sqlite3.Connection) -> int:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self.logger.warning("Database is not in incremental auto_vacuum mode, skipping vacuum "
+                                "(convert it with 'python main.py --vacuum-db')")
+            return 0
+        freed = 0
+        while True:
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free_pages == 0:
+                return freed
+            conn.execute(f"PRAGMA incremental_vacuum({self.policy.vacuum_pages})").fetchall()
+            released = free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            freed += released
+            if released <= 0 or self._pause():
+                return freed
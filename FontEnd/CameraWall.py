@@ -0,0 +1,175 @@
+from typing import Dict, List, Optional, Tuple
+
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtWidgets import QGridLayout, QHBoxLayout, QLabel, QPushButton, QSizePolicy, QVBoxLayout, QWidget
+
+from FontEnd.FrameRenderer import FrameRenderer
+
+THUMBNAIL_FPS = 5  # Tốc độ khung hình của ô thu nhỏ
+WIDTH_STEP = 64  # Làm tròn chiều rộng yêu cầu để thay đổi kích thước nhỏ không phải đổi profile
+
+
+class CameraTile(QWidget):
+    """Một ô camera: ảnh và dòng chú thích (tên camera, FPS); bấm vào ảnh để chọn camera"""
+    clicked = pyqtSignal(str)
+
+    def __init__(self, font_size: int):
+        super().__init__()
+        self.camera_id: Optional[str] = None
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        self.image = QLabel()
+        self.image.setAlignment(Qt.AlignCenter)
+        self.image.setStyleSheet(f"background-color: black; color: white; font-size: {font_size}px;")
+        # Ignored: ảnh lớn không làm ô giãn ra, ô luôn lấp đầy phần không gian được cấp
+        self.image.setSizePolicy(QSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored))
+        self.image.setMinimumSize(80, 45)
+        self.caption = QLabel()
+        self.caption.setStyleSheet("color: gray; font-size: 11px;")
+        layout.addWidget(self.image)
+        layout.addWidget(self.caption)
+
+    def assign(self, camera_id: Optional[str], placeholder: str = ""):
+        self.camera_id = camera_id
+        self.image.clear()
+        self.image.setText(placeholder)
+        self.caption.setText(camera_id or "")
+
+    def mousePressEvent(self, event):
+        if self.camera_id is not None:
+            self.clicked.emit(self.camera_id)
+        super().mousePressEvent(event)
+
+
+class CameraWall(QWidget):
+    """Tường camera dạng một ô lớn (camera đang chọn) cộng với các trang ô thu nhỏ.
+
+    Số widget cố định (một ô lớn và ``columns * rows`` ô nhỏ) dù có bao nhiêu camera; chuyển trang chỉ
+    gán lại camera cho các ô. Mỗi nhịp vẽ, ``refresh`` báo cho backend nhu cầu của từng camera qua
+    ``system.set_display_profile``: camera đang chọn nhận frame đầy đủ, camera ở trang hiện tại nhận frame
+    thu nhỏ theo kích thước ô với ``THUMBNAIL_FPS``, các camera còn lại không được gửi frame.
+    """
+
+    def __init__(self, system, renderer: FrameRenderer, columns: int = 4, rows: int = 3):
+        super().__init__()
+        self.system = system
+        self.renderer = renderer
+        self.page_size = columns * rows
+        self.camera_ids: List[str] = []
+        self.focused: Optional[str] = None
+        self.page = 0
+        self._profiles: Dict[str, Tuple[int, Optional[float]]] = {}
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.focus_tile = CameraTile(font_size=18)
+        layout.addWidget(self.focus_tile, 3)
+
+        thumbnails = QWidget()
+        grid = QGridLayout(thumbnails)
+        grid.setContentsMargins(0, 0, 0, 0)
+        grid.setSpacing(5)
+        self.thumbnail_tiles: List[CameraTile] = []
+        for i in range(self.page_size):
+            tile = CameraTile(font_size=11)
+            tile.clicked.connect(self.focus_camera)
+            grid.addWidget(tile, *divmod(i, columns))
+            self.thumbnail_tiles.append(tile)
+        layout.addWidget(thumbnails, 2)
+
+        navigation = QHBoxLayout()
+        self.prev_button = QPushButton("◀ Trang trước")
+        self.next_button = QPushButton("Trang sau ▶")
+        self.page_label = QLabel()
+        self.page_label.setAlignment(Qt.AlignCenter)
+        self.prev_button.clicked.connect(lambda: self.show_page(self.page - 1))
+        self.next_button.clicked.connect(lambda: self.show_page(self.page + 1))
+        navigation.addWidget(self.prev_button)
+        navigation.addWidget(self.page_label, 1)
+        navigation.addWidget(self.next_button)
+        layout.addLayout(navigation)
+
+        self.set_cameras(sorted(system.cameras.keys()))
+
+    @property
+    def page_count(self) -> int:
+        return max((len(self.camera_ids) + self.page_size - 1) // self.page_size, 1)
+
+    def set_cameras(self, camera_ids: List[str]):
+        self.camera_ids = list(camera_ids)
+        if self.focused not in self.camera_ids:
+            self.focused = self.camera_ids[0] if self.camera_ids else None
+        self.focus_tile.assign(self.focused, f"Đang chờ tín hiệu từ {self.focused}..." if self.focused
+                               else "Không có camera nào được cấu hình trong 'cameras.json'.")
+        self.show_page(self.page)
+
+    def add_camera(self, camera_id: str):
+        if camera_id not in self.camera_ids:
+            self.set_cameras(sorted(self.camera_ids + [camera_id]))
+
+    def remove_camera(self, camera_id: str):
+        if camera_id in self.camera_ids:
+            self._profiles.pop(camera_id, None)
+            self.set_cameras([cid for cid in self.camera_ids if cid != camera_id])
+
+    def focus_camera(self, camera_id: str):
+        if camera_id == self.focused:
+            return
+        self.focused = camera_id
+        self.focus_tile.assign(camera_id, f"Đang chờ tín hiệu từ {camera_id}...")
+        self.show_page(self.page)
+
+    def show_page(self, page: int):
+        self.page = min(max(page, 0), self.page_count - 1)
+        start = self.page * self.page_size
+        page_ids = self.camera_ids[start:start + self.page_size]
+        for i, tile in enumerate(self.thumbnail_tiles):
+            camera_id = page_ids[i] if i < len(page_ids) else None
+            placeholder = "Đang phóng to" if camera_id == self.focused else "" if camera_id is None else "..."
+            tile.assign(camera_id, placeholder)
+        self.page_label.setText(f"Trang {self.page + 1}/{self.page_count} ({len(self.camera_ids)} camera)")
+        self.prev_button.setEnabled(self.page > 0)
+        self.next_button.setEnabled(self.page < self.page_count - 1)
+
+    def _visible_tiles(self) -> Dict[str, CameraTile]:
+        tiles = {tile.camera_id: tile for tile in self.thumbnail_tiles
+                 if tile.camera_id is not None and tile.camera_id != self.focused}
+        if self.focused is not None:
+            tiles[self.focused] = self.focus_tile
+        return tiles
+
+    def refresh(self, minimized: bool = False):
+        """Cập nhật nhu cầu hiển thị cho backend/renderer và vẽ các ảnh đã sẵn sàng (gọi mỗi nhịp vẽ)"""
+        tiles = {} if minimized else self._visible_tiles()
+        for camera_id in self.camera_ids:
+            tile = tiles.get(camera_id)
+            visible = tile is not None and tile.isVisible() and not tile.image.visibleRegion().isEmpty()
+            if not visible:
+                self.renderer.set_view(camera_id, 0, 0, False)
+                self._set_profile(camera_id, 0, 0)
+                continue
+            width, height = tile.image.width(), tile.image.height()
+            self.renderer.set_view(camera_id, width, height, True)
+            if tile is self.focus_tile:
+                self._set_profile(camera_id, 0, None)
+            else:
+                self._set_profile(camera_id, (width + WIDTH_STEP - 1) // WIDTH_STEP * WIDTH_STEP, THUMBNAIL_FPS)
+
+        for camera_id, image in self.renderer.take_rendered():
+            tile = tiles.get(camera_id)
+            if tile is not None:
+                tile.image.setPixmap(QPixmap.fromImage(image))
+
+    def _set_profile(self, camera_id: str, max_width: int, max_fps: Optional[float]):
+        if self._profiles.get(camera_id) != (max_width, max_fps):
+            self._profiles[camera_id] = (max_width, max_fps)
+            self.system.set_display_profile(camera_id, max_width, max_fps)
+
+    def update_fps(self):
+        for tile in [self.focus_tile] + self.thumbnail_tiles:
+            if tile.camera_id is not None:
+                received_fps, display_fps = self.renderer.fps(tile.camera_id)
+                tile.caption.setText(f"{tile.camera_id} | Nhận: {received_fps:.1f} FPS | "
+                                     f"Hiển thị: {display_fps:.1f} FPS")
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImage
+
+from BackEnd.core.LatencyRecorder import LatencyRecorder
+from BackEnd.core.Tracer import tracer
+
+
+class FrameRenderer:
+    """Chuẩn bị ảnh hiển thị cho giao diện ngoài GUI thread.
+
+    ``submit`` (được gọi trên thread xử lý kết quả) chỉ giữ frame mới nhất của mỗi camera, frame cũ
+    chưa kịp vẽ bị thay thế. Thread ``FrameRenderer`` thu nhỏ frame về đúng kích thước ô hiển thị
+    của camera và chuyển thành ``QImage``; camera đang bị ẩn thì bỏ qua. GUI chỉ lấy ảnh đã sẵn sàng
+    bằng ``take_rendered`` theo một QTimer cố định, nên hàng đợi sự kiện của Qt không bao giờ bị dồn.
+    Thời gian từ lúc backend phát frame tới lúc GUI lấy ảnh được ghi vào ``latency`` (giai đoạn
+    ``gui_delivery``).
+    """
+
+    def __init__(self, latency: LatencyRecorder = None):
+        self.logger = logging.getLogger("FrameRenderer")
+        self.latency = latency
+        self._condition = threading.Condition()
+        # camera_id -> (frame hoặc ảnh, thời điểm backend phát frame)
+        self._latest: Dict[str, Tuple[np.ndarray, float]] = {}
+        self._rendered: Dict[str, Tuple[QImage, float]] = {}
+        self._views: Dict[str, Tuple[int, int, bool]] = {}  # camera_id -> (rộng, cao, đang hiển thị)
+        self._processed_times: Dict[str, deque] = {}
+        self._displayed_times: Dict[str, deque] = {}
+        self.running = True
+        self.thread = threading.Thread(target=self._render_loop, name="FrameRenderer", daemon=True)
+        self.thread.start()
+
+    def submit(self, camera_id: str, frame: np.ndarray):
+        """Nhận frame đã xử lý từ backend (subscriber của FRAME_READY)"""
+        now = time.time()
+        with self._condition:
+            self._latest[camera_id] = (frame, now)
+            self._processed_times.setdefault(camera_id, deque(maxlen=120)).append(now)
+            self._condition.notify()
+
+    def set_view(self, camera_id: str, width: int, height: int, visible: bool):
+        """Khai báo kích thước ô hiển thị hiện tại của camera và camera có đang được nhìn thấy không"""
+        with self._condition:
+            self._views[camera_id] = (width, height, visible)
+
+    def remove_camera(self, camera_id: str):
+        with self._condition:
+            for store in (self._latest, self._rendered, self._views, self._processed_times, self._displayed_times):
+                store.pop(camera_id, None)
+
+    def take_rendered(self) -> List[Tuple[str, QImage]]:
+        """Lấy các ảnh đã thu nhỏ xong kể từ lần gọi trước (gọi trên GUI thread)"""
+        now = time.time()
+        with self._condition:
+            rendered, self._rendered = self._rendered, {}
+            for camera_id in rendered:
+                self._displayed_times.setdefault(camera_id, deque(maxlen=120)).append(now)
+        if self.latency is not None:
+            for camera_id, (_, submitted) in rendered.items():
+                self.latency.record(camera_id, "gui_delivery", now - submitted)
+        return [(camera_id, image) for camera_id, (image, _) in rendered.items()]
+
+    @staticmethod
+    def _rate(times: Optional[deque], window: float = 2.0) -> float:
+        if not times:
+            return 0.0
+        now = time.time()
+        recent = [t for t in times if now - t <= window]
+        return len(recent) / window
+
+    def fps(self, camera_id: str) -> Tuple[float, float]:
+        """(FPS nhận từ backend, FPS hiển thị) của camera trong 2 giây gần nhất"""
+        with self._condition:
+            return (self._rate(self._processed_times.get(camera_id)),
+                    self._rate(self._displayed_times.get(camera_id)))
+
+    def _render_loop(self):
+        while self.running:
+            with self._condition:
+                if not self._latest:
+                    self._condition.wait(0.1)
+                pending, self._latest = self._latest, {}
+                views = dict(self._views)
+            for camera_id, (frame, submitted) in pending.items():
+                width, height, visible = views.get(camera_id, (0, 0, False))
+                if not visible or width <= 0 or height <= 0:
+                    continue
+                try:
+                    with tracer.span("render_frame", camera_id):
+                        image = self._render(frame, width, height)
+                except Exception as e:
+                    self.logger.error(f"Error rendering frame of {camera_id}: {e}")
+                    continue
+                with self._condition:
+                    self._rendered[camera_id] = (image, submitted)
+
+    @staticmethod
+    def _render(frame: np.ndarray, width: int, height: int) -> QImage:
+        """Thu nhỏ frame BGR vừa khít (giữ tỉ lệ) vào ô width x height và chuyển thành QImage"""
+        h, w = frame.shape[:2]
+        scale = min(width / w, height / h)
+        if abs(scale - 1.0) > 0.01:
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+            frame = cv2.resize(frame, (max(int(w * scale), 1), max(int(h * scale), 1)), interpolation=interpolation)
+        frame = np.ascontiguousarray(frame)
+        h, w, ch = frame.shape
+        # copy() để QImage có bộ nhớ riêng, không phụ thuộc vào mảng numpy
+        return QImage(frame.data, w, h, ch * w, QImage.Format_BGR888).copy()
+
+    def stop(self):
+        self.running = False
+        with self._condition:
+            self._condition.notify()
+        self.thread.join(timeout=1.0)
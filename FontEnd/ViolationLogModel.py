@@ -0,0 +1,131 @@
+import time
+from collections import deque
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QColor
+
+from BackEnd.data.DatabaseManager import DatabaseManager
+
+COLUMNS = ["Thời gian", "Camera", "ID 1", "ID 2", "Khoảng cách (m)", "TGTX", "Mật độ"]
+LIVE_BACKGROUND = QColor(255, 100, 100, 100)
+
+
+class ViolationLogModel(QAbstractTableModel):
+    """Nhật ký vi phạm cho QTableView với số dòng trong bộ nhớ có giới hạn.
+
+    Cảnh báo mới được gom lại và chèn lên đầu một lần mỗi nhịp vẽ (``flush_pending``). Cuộn xuống cuối
+    bảng sẽ nạp lịch sử cũ hơn từ bảng ``violation_episodes`` theo từng trang (``fetchMore``, phân trang
+    keyset theo ``start_time``); episode đang hiển thị dưới dạng cảnh báo trực tiếp không bị nạp lại. Tổng số
+    dòng không vượt quá ``max_rows``: cảnh báo mới đẩy các dòng cũ nhất ở cuối ra (có thể nạp lại sau), còn
+    trang lịch sử mới nạp đẩy các dòng mới nhất ở đầu ra, như một cửa sổ trượt trên toàn bộ lịch sử.
+    """
+
+    def __init__(self, db_manager: Optional[DatabaseManager] = None, max_rows: int = 2000, page_size: int = 200,
+                 parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.max_rows = max_rows
+        self.page_size = page_size
+        # Mỗi dòng: (các giá trị hiển thị, (start_time, id), khoá episode nếu là cảnh báo trực tiếp hoặc None)
+        self.rows: deque = deque()
+        self.pending: List[tuple] = []
+        # Khoá (camera_id, id nhỏ, id lớn, start_time) của các cảnh báo trực tiếp đang hiển thị
+        self.live_keys = set()
+        self.history_exhausted = db_manager is None
+        # (start_time, id) của dòng lịch sử cuối cùng đã đọc; None = bắt đầu từ episode mới nhất
+        self.cursor: Optional[Tuple[float, int]] = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        values, _, live_key = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return values[index.column()]
+        if role == Qt.BackgroundRole and live_key is not None:
+            return LIVE_BACKGROUND
+        return None
+
+    def add_violation(self, camera_id, id1, id2, distance, timestamp, timeclose=1, quantity_per_acre=123,
+                      start_time=None):
+        """Ghi nhận một cảnh báo; chỉ được hiển thị ở lần ``flush_pending`` kế tiếp"""
+        if start_time is None:
+            start_time = time.time() - timeclose
+        values = (timestamp, camera_id, str(id1), str(id2), f"{distance:.2f}", f"{timeclose:.2f}s",
+                  f"{quantity_per_acre:.2f}")
+        self.pending.append((values, (start_time, 0), (camera_id, min(id1, id2), max(id1, id2), start_time)))
+
+    def flush_pending(self):
+        """Chèn mọi cảnh báo đang chờ trong một lần và bỏ bớt dòng cũ nếu vượt giới hạn"""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending[-self.max_rows:], []
+        self.beginInsertRows(QModelIndex(), 0, len(pending) - 1)
+        self.rows.extendleft(pending)  # extendleft đảo thứ tự nên cảnh báo mới nhất nằm trên cùng
+        self.live_keys.update(live_key for _, _, live_key in pending)
+        self.endInsertRows()
+        self._trim()
+
+    def _trim(self):
+        excess = len(self.rows) - self.max_rows
+        if excess <= 0:
+            return
+        self.beginRemoveRows(QModelIndex(), len(self.rows) - excess, len(self.rows) - 1)
+        for _ in range(excess):
+            self.live_keys.discard(self.rows.pop()[2])
+        self.endRemoveRows()
+        # Các dòng vừa bỏ vẫn còn trong database, có thể nạp lại khi cuộn xuống
+        self.cursor = self.rows[-1][1] if self.rows else None
+        self.history_exhausted = self.db_manager is None
+
+    def _evict_newest(self, count: int):
+        """Bỏ ``count`` dòng mới nhất ở đầu bảng để nhường chỗ cho trang lịch sử cũ hơn"""
+        if count <= 0:
+            return
+        self.beginRemoveRows(QModelIndex(), 0, count - 1)
+        for _ in range(count):
+            self.live_keys.discard(self.rows.popleft()[2])
+        self.endRemoveRows()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.history_exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        page = self.db_manager.query_violations(limit=self.page_size, before=self.cursor)
+        if len(page) < self.page_size:
+            self.history_exhausted = True
+        if not page:
+            return
+        self.cursor = (page[-1]['start_time'], page[-1]['id'])
+        rows = [self._history_row(row) for row in page
+                if (row['camera_id'], row['person_id1'], row['person_id2'], row['start_time']) not in self.live_keys]
+        if not rows:
+            return
+        rows = rows[:self.max_rows]
+        self._evict_newest(len(self.rows) + len(rows) - self.max_rows)
+        start = len(self.rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+
+    @staticmethod
+    def _history_row(row) -> tuple:
+        duration = f"{row['duration']:.2f}s" if row['end_time'] is not None else "-"
+        distance = f"{row['min_distance']:.2f}" if row['min_distance'] is not None else "-"
+        values = (datetime.fromtimestamp(row['start_time']).strftime("%d/%m %H:%M:%S"), row['camera_id'],
+                  str(row['person_id1']), str(row['person_id2']), distance, duration, "-")
+        return values, (row['start_time'], row['id']), None
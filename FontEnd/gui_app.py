@@ -5,13 +5,43 @@ import os
 import json
 import cv2
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel,
-                             QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
-                             QGridLayout, QHeaderView, QMessageBox, QSizePolicy)  # Thêm QSizePolicy
-from PyQt5.QtGui import QImage, QPixmap, QColor
-from PyQt5.QtCore import Qt, QThread
+                             QVBoxLayout, QHBoxLayout, QTableView, QAbstractItemView,
+                             QHeaderView, QMessageBox, QShortcut)
+from PyQt5.QtCore import Qt, QThread, QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QKeySequence
 
 # Import lớp hệ thống từ file backend
 from BackEnd.MultiCameraSurveillanceSystem import MultiCameraSurveillanceSystem
+from BackEnd.config import profile_duration
+from BackEnd.core.Tracer import tracer
+from BackEnd.common.EventBus import (FRAME_READY, VIOLATION_DETECTED, SYSTEM_STOPPED, SYSTEM_ERROR, CAMERA_ADDED,
+                                     CAMERA_REMOVED)
+from FontEnd.CameraWall import CameraWall
+from FontEnd.FrameRenderer import FrameRenderer
+from FontEnd.ViolationLogModel import ViolationLogModel
+
+DISPLAY_FPS = 30  # Tần số vẽ lại các ô camera
+
+
+class SystemSignalBridge(QObject):
+    """
+    Chuyển các sự kiện từ EventBus của backend thành tín hiệu Qt.
+    Sự kiện được phát trên thread của backend; pyqtSignal sẽ đưa chúng về GUI thread một cách an toàn.
+    Frame không đi qua đây mà qua FrameRenderer để không làm dồn hàng đợi sự kiện của Qt.
+    """
+    violation_detected = pyqtSignal(str, int, int, float, str, float, float, float)
+    system_stopped = pyqtSignal()
+    system_error = pyqtSignal(str)
+    camera_added = pyqtSignal(str)
+    camera_removed = pyqtSignal(str)
+
+    def __init__(self, system: MultiCameraSurveillanceSystem):
+        super().__init__()
+        system.events.subscribe(VIOLATION_DETECTED, self.violation_detected.emit)
+        system.events.subscribe(SYSTEM_STOPPED, self.system_stopped.emit)
+        system.events.subscribe(SYSTEM_ERROR, self.system_error.emit)
+        system.events.subscribe(CAMERA_ADDED, lambda camera_id, config: self.camera_added.emit(camera_id))
+        system.events.subscribe(CAMERA_REMOVED, self.camera_removed.emit)
 
 
 class SystemThread(QThread):
@@ -34,19 +64,33 @@ class SystemThread(QThread):
 
 
 class SurveillanceGUI(QMainWindow):
-    def __init__(self, config_file="cameras.json"):
+    def __init__(self, config_file="cameras.json", metrics_port=None, trace_file=None, alert_audio=False,
+                 detection_cache_path=None):
         super().__init__()
+        self.trace_file = trace_file  # Tracing bật từ lúc khởi động và được xuất ra file này khi thoát
+        if trace_file:
+            tracer.start()
 
         # Tạo hệ thống backend
-        self.system = MultiCameraSurveillanceSystem(config_file=config_file, batch_size=4)
+        self.system = MultiCameraSurveillanceSystem(config_file=config_file, batch_size=4, alert_audio=alert_audio,
+                                                    metrics_port=metrics_port,
+                                                    detection_cache_path=detection_cache_path)
+        self.bridge = SystemSignalBridge(self.system)
+        self.renderer = FrameRenderer(self.system.latency)
+        self.system.events.subscribe(FRAME_READY, self.renderer.submit)
 
         # Di chuyển hệ thống sang một luồng riêng
         self.system_thread = SystemThread(self.system)
 
-        self.camera_labels = {}
         self.initUI()
         self.connect_signals()
 
+        # Vẽ lại theo nhịp cố định thay vì mỗi khi có frame mới
+        self.refresh_ticks = 0
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh_camera_feeds)
+        self.refresh_timer.start(1000 // DISPLAY_FPS)
+
         # Bắt đầu luồng hệ thống
         self.system_thread.start()
 
@@ -58,102 +102,74 @@ class SurveillanceGUI(QMainWindow):
         self.setCentralWidget(central_widget)
         main_layout = QHBoxLayout(central_widget)
 
-        # --- BÊN TRÁI: KHUNG CAMERA ---
-        self.camera_container = QWidget()  # Đổi thành thuộc tính của self
-        self.camera_grid_layout = QGridLayout(self.camera_container)
-        self.camera_grid_layout.setContentsMargins(0, 0, 0, 0)  # Xóa khoảng trống
-        self.camera_grid_layout.setSpacing(5)  # Thêm một chút khoảng cách giữa các camera
-
-        num_cameras = len(self.system.cameras)
-        if num_cameras == 0:
-            no_cam_label = QLabel("Không có camera nào được cấu hình trong 'cameras.json'.")
-            no_cam_label.setAlignment(Qt.AlignCenter)
-            no_cam_label.setStyleSheet("font-size: 20px; color: red;")
-            self.camera_grid_layout.addWidget(no_cam_label, 0, 0)
-        else:
-            grid_cols = 2 if num_cameras > 2 else num_cameras if num_cameras > 0 else 1
-            sorted_camera_ids = sorted(self.system.cameras.keys())
-            for i, camera_id in enumerate(sorted_camera_ids):
-                row, col = divmod(i, grid_cols)
-
-                # *** SỬA LỖI: Tạo một container cho mỗi camera ***
-                cam_widget = QWidget()
-                cam_layout = QVBoxLayout(cam_widget)
-                cam_layout.setContentsMargins(0, 0, 0, 0)
-
-                cam_label = QLabel(f"Đang chờ tín hiệu từ {camera_id}...")
-                cam_label.setAlignment(Qt.AlignCenter)
-                cam_label.setStyleSheet("background-color: black; color: white; font-size: 18px;")
-
-                # *** SỬA LỖI: Thiết lập SizePolicy ***
-                # Expanding: cho phép widget giãn ra để lấp đầy không gian.
-                # Ignored: bỏ qua kích thước gợi ý (size hint) và lấp đầy không gian được cấp.
-                size_policy = QSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-                cam_label.setSizePolicy(size_policy)
-
-                cam_layout.addWidget(cam_label)
-                self.camera_labels[camera_id] = cam_label
-                self.camera_grid_layout.addWidget(cam_widget, row, col)
-
-        main_layout.addWidget(self.camera_container, 3)  # Chiếm 3/4 không gian
+        # --- BÊN TRÁI: TƯỜNG CAMERA (ô lớn + các trang ô thu nhỏ) ---
+        self.camera_wall = CameraWall(self.system, self.renderer)
+        main_layout.addWidget(self.camera_wall, 3)  # Chiếm 3/4 không gian
 
         # --- BÊN PHẢI: BẢNG ĐIỀU KHIỂN VÀ LOG ---
         right_panel = QWidget()
         right_layout = QVBoxLayout(right_panel)
 
         right_layout.addWidget(QLabel("<h2>Nhật ký Tiếp xúc</h2>"))
-        self.log_table = QTableWidget()
-        self.log_table.setColumnCount(7)
-        self.log_table.setHorizontalHeaderLabels(
-            ["Thời gian", "Camera", "ID 1", "ID 2", "Khoảng cách (m)", "TGTX", "Mật độ"])
-        self.log_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        # Model giữ tối đa một số dòng cố định; lịch sử cũ hơn được nạp từ database khi cuộn xuống
+        self.log_model = ViolationLogModel(self.system.db_manager, parent=self)
+        self.log_table = QTableView()
+        self.log_table.setModel(self.log_model)
+        # Kích thước cột cố định theo nội dung mẫu, ResizeToContents sẽ phải đo lại mọi dòng mỗi lần chèn
+        self.log_table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
         self.log_table.horizontalHeader().setSectionResizeMode(5, QHeaderView.Stretch)
-        self.log_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.log_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.log_table.verticalHeader().setVisible(False)
+        self.log_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
 
         right_layout.addWidget(self.log_table)
         main_layout.addWidget(right_panel, 1)  # Chiếm 1/4 không gian
 
+        # Ctrl+T bật/tắt tracing; mỗi lần tắt xuất một file trong thư mục traces
+        QShortcut(QKeySequence("Ctrl+T"), self, activated=self.toggle_trace)
+        # Ctrl+P lấy mẫu stack các thread pipeline trong profile_duration giây (thư mục profiles)
+        QShortcut(QKeySequence("Ctrl+P"), self, activated=self.start_profile)
+
     def connect_signals(self):
-        self.system.new_frame_ready.connect(self.update_camera_feed)
-        self.system.violation_detected.connect(self.add_violation_log)
+        self.bridge.violation_detected.connect(self.log_model.add_violation)
         self.system_thread.finished.connect(self.on_system_thread_finished)
-        self.system.system_stopped.connect(self.system_thread.quit)
-
-    def update_camera_feed(self, camera_id, frame):
-        if camera_id in self.camera_labels:
-            label_to_update = self.camera_labels[camera_id]
-            try:
-                h, w, ch = frame.shape
-                # *** SỬA LỖI: Thay đổi cách tính toán và co giãn pixmap ***
-                # 1. Chuyển đổi frame sang QImage
-                qt_image = QImage(frame.data, w, h, ch * w, QImage.Format_BGR888)
-
-                # 2. Tạo QPixmap từ QImage
-                pixmap = QPixmap.fromImage(qt_image)
-
-                # 3. Co giãn pixmap để vừa với kích thước của QLabel, *giữ nguyên tỷ lệ khung hình*
-                #    Đây là phần quan trọng nhất. Nó đảm bảo ảnh không bị méo và vừa với không gian đã được cấp.
-                scaled_pixmap = pixmap.scaled(label_to_update.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-
-                # 4. Đặt pixmap đã co giãn vào label
-                label_to_update.setPixmap(scaled_pixmap)
-
-            except Exception as e:
-                print(f"Error updating feed for {camera_id}: {e}")
-
-    def add_violation_log(self, camera_id, id1, id2, distance, timestamp, timeclose=1, quantity_per_acre=123):
-        row_position = 0
-        self.log_table.insertRow(row_position)
-        self.log_table.setItem(row_position, 0, QTableWidgetItem(timestamp))
-        self.log_table.setItem(row_position, 1, QTableWidgetItem(camera_id))
-        self.log_table.setItem(row_position, 2, QTableWidgetItem(str(id1)))
-        self.log_table.setItem(row_position, 3, QTableWidgetItem(str(id2)))
-        self.log_table.setItem(row_position, 4, QTableWidgetItem(f"{distance:.2f}"))
-        self.log_table.setItem(row_position, 5, QTableWidgetItem(f"{timeclose:.2f}s"))
-        self.log_table.setItem(row_position, 6, QTableWidgetItem(f"{quantity_per_acre:.2f}"))
-
-        for i in range(7):
-            self.log_table.item(row_position, i).setBackground(QColor(255, 100, 100, 100))
+        self.bridge.system_stopped.connect(self.system_thread.quit)
+        self.bridge.system_error.connect(self.on_system_error)
+        self.bridge.camera_added.connect(self.camera_wall.add_camera)
+        self.bridge.camera_removed.connect(self.on_camera_removed)
+
+    def refresh_camera_feeds(self):
+        """Cập nhật nhu cầu hiển thị của các ô camera và vẽ các ảnh đã sẵn sàng"""
+        with tracer.span("gui_refresh"):
+            self.camera_wall.refresh(self.isMinimized())
+            # Các cảnh báo đến trong nhịp vừa rồi được chèn vào bảng trong một lần
+            self.log_model.flush_pending()
+
+        self.refresh_ticks += 1
+        if self.refresh_ticks % DISPLAY_FPS == 0:
+            self.camera_wall.update_fps()
+
+    def toggle_trace(self):
+        path = tracer.toggle()
+        if path is None:
+            self.statusBar().showMessage("Đang ghi trace... (Ctrl+T để dừng và lưu)")
+        else:
+            self.statusBar().showMessage(f"Đã lưu trace: {path}", 10000)
+
+    def start_profile(self):
+        if self.system.profiler.start():
+            self.statusBar().showMessage(f"Đang profile các thread xử lý trong {profile_duration:.0f} giây...",
+                                         int(profile_duration * 1000))
+        else:
+            self.statusBar().showMessage("Profiler đang chạy", 3000)
+
+    def on_camera_removed(self, camera_id):
+        self.camera_wall.remove_camera(camera_id)
+        self.renderer.remove_camera(camera_id)
+
+    def on_system_error(self, message):
+        self.statusBar().showMessage(f"Lỗi hệ thống: {message}")
+        QMessageBox.critical(self, "Lỗi", f"{message}. Hệ thống không thể xử lý camera.")
 
     def on_system_thread_finished(self):
         QMessageBox.information(self, "Thông báo", "Hệ thống xử lý đã dừng.")
@@ -164,8 +180,13 @@ class SurveillanceGUI(QMainWindow):
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
             print("Closing application...")
+            self.refresh_timer.stop()
+            self.renderer.stop()
             self.system_thread.stop()
             self.system_thread.wait(5000)
+            if self.trace_file:
+                tracer.stop()
+                tracer.export(self.trace_file)
             event.accept()
         else:
             event.ignore()
@@ -204,9 +225,11 @@ def create_default_config():
             json.dump(config, f, indent=4)
 
 
-def main():
+def main(config_file="config/cameras.json", metrics_port=None, trace_file=None, alert_audio=False,
+         detection_cache_path=None):
     # create_default_config()
     app = QApplication(sys.argv)
-    main_window = SurveillanceGUI(config_file="config/cameras.json")
+    main_window = SurveillanceGUI(config_file=config_file, metrics_port=metrics_port, trace_file=trace_file,
+                                  alert_audio=alert_audio, detection_cache_path=detection_cache_path)
     main_window.show()
     sys.exit(app.exec_())
@@ -0,0 +1,69 @@
+import json
+import os
+import platform
+import sys
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+def environment() -> Dict:
+    """Thông tin máy và thư viện đi kèm kết quả, để biết hai lần đo có so sánh được với nhau không"""
+    import cv2
+    return {'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"), 'python': platform.python_version(),
+            'numpy': np.__version__, 'opencv': cv2.__version__, 'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(), 'cpu_count': os.cpu_count()}
+
+
+def summarize(samples: Sequence[float]) -> Dict:
+    """Thống kê (mili giây) của một danh sách thời gian đo bằng giây"""
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    return {'samples': len(values), 'mean_ms': float(values.mean()), 'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)), 'max_ms': float(values.max())}
+
+
+def save(path: str, report: Dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def compare(results: List[Dict], baseline: Dict, key_fields: Sequence[str], metric: str = 'p50_ms',
+            tolerance: float = 0.25, higher_is_better: bool = False) -> List[Dict]:
+    """So sánh từng dòng kết quả với dòng cùng khoá trong baseline.
+
+    Trả về các dòng có ``ratio`` = giá trị mới / baseline; ``regression`` khi ratio vượt 1 + ``tolerance``
+    (hoặc thấp hơn 1 - ``tolerance`` nếu ``higher_is_better``). Dòng không có trong baseline có ratio None.
+    """
+    previous = {tuple(row.get(field) for field in key_fields): row for row in baseline.get('results', [])}
+    rows = []
+    for row in results:
+        old = previous.get(tuple(row.get(field) for field in key_fields))
+        ratio = None
+        if old is not None and old.get(metric) and row.get(metric) is not None:
+            ratio = row[metric] / old[metric]
+        if ratio is None:
+            regression = False
+        elif higher_is_better:
+            regression = ratio < 1 - tolerance
+        else:
+            regression = ratio > 1 + tolerance
+        rows.append({**{field: row.get(field) for field in key_fields}, 'baseline': old.get(metric) if old else None,
+                     'current': row.get(metric), 'ratio': ratio, 'regression': regression})
+    return rows
+
+
+def print_table(rows: List[Dict], columns: Sequence[str], file=sys.stdout):
+    def fmt(value):
+        if isinstance(value, float):
+            return f"{value:.3f}"
+        return "-" if value is None else str(value)
+
+    cells = [[fmt(row.get(column)) for column in columns] for row in rows]
+    widths = [max([len(column)] + [len(line[i]) for line in cells]) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)), file=file)
+    for line in cells:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)), file=file)
@@ -0,0 +1,84 @@
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+
+class SyntheticCrowd:
+    """Đám đông giả lập đi lại trong khung hình, tái lập được theo ``seed``.
+
+    Mỗi người là một điểm chân trên mặt đất (phần dưới ``horizon`` của khung hình) đi thẳng với tốc độ
+    ngẫu nhiên và dội lại ở mép ảnh; chiều cao bbox tăng theo toạ độ y để giống phối cảnh camera thật.
+    ``step`` trả về box dạng (x1, y1, x2, y2, confidence) như đầu ra của YOLO, ``to_detections`` chuyển
+    sang đúng định dạng detection mà BatchProcessor đưa cho PersonTracker. ``write_video`` ghi đám đông
+    thành file video (người là khối sáng trên nền tối) cho benchmark toàn pipeline.
+    """
+
+    def __init__(self, people: int, frame_width: int = 1280, frame_height: int = 720, seed: int = 0,
+                 miss_rate: float = 0.02, jitter: float = 1.0, horizon: float = 0.35):
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.miss_rate = miss_rate  # Tỉ lệ người bị detector bỏ sót trong mỗi frame
+        self.jitter = jitter  # Nhiễu vị trí box (pixel)
+        self.top = horizon * frame_height
+        self.rng = np.random.default_rng(seed)
+        self.feet = self.rng.uniform([0, self.top], [frame_width, frame_height], size=(people, 2))
+        speed = self.rng.uniform(0.5, 3.0, people)
+        angle = self.rng.uniform(0, 2 * np.pi, people)
+        self.velocity = np.stack([np.cos(angle) * speed, np.sin(angle) * speed], axis=1)
+        self.confidence = self.rng.uniform(0.5, 0.95, people).astype(np.float32)
+
+    def __len__(self):
+        return len(self.feet)
+
+    def _move(self):
+        self.feet += self.velocity
+        low = np.array([0, self.top])
+        high = np.array([self.frame_width - 1, self.frame_height - 1])
+        outside = (self.feet < low) | (self.feet > high)
+        self.velocity[outside] *= -1
+        np.clip(self.feet, low, high, out=self.feet)
+
+    def step(self) -> np.ndarray:
+        """Di chuyển đám đông một frame, trả về mảng N x 5 (x1, y1, x2, y2, confidence)"""
+        self._move()
+        feet = self.feet + self.rng.normal(0, self.jitter, self.feet.shape) if self.jitter else self.feet
+        heights = 60 + 0.35 * (feet[:, 1] - self.top)
+        widths = heights * 0.4
+        boxes = np.empty((len(feet), 5), dtype=np.float32)
+        boxes[:, 0] = feet[:, 0] - widths / 2
+        boxes[:, 1] = feet[:, 1] - heights
+        boxes[:, 2] = feet[:, 0] + widths / 2
+        boxes[:, 3] = feet[:, 1]
+        boxes[:, 4] = self.confidence
+        if self.miss_rate:
+            boxes = boxes[self.rng.random(len(boxes)) >= self.miss_rate]
+        return boxes
+
+    def render(self, boxes: np.ndarray) -> np.ndarray:
+        frame = np.empty((self.frame_height, self.frame_width, 3), dtype=np.uint8)
+        frame[:] = np.linspace(20, 70, self.frame_height, dtype=np.uint8)[:, None, None]
+        for x1, y1, x2, y2, _ in boxes:
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (220, 220, 220), -1)
+        return frame
+
+    def write_video(self, path: str, fps: float, frames: int):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (self.frame_width, self.frame_height))
+        if not writer.isOpened():
+            raise IOError(f"Cannot write video {path}")
+        try:
+            for _ in range(frames):
+                writer.write(self.render(self.step()))
+        finally:
+            writer.release()
+
+    @staticmethod
+    def to_detections(boxes: np.ndarray) -> List[Dict]:
+        """Cùng định dạng với BatchProcessor._extract_detections"""
+        detections = []
+        for *xyxy, conf in boxes:
+            x1, y1, x2, y2 = map(int, xyxy)
+            detections.append(
+                {'bbox': (x1, y1, x2, y2), 'center': ((x1 + x2) // 2, (y1 + y2) // 2), 'confidence': float(conf),
+                 'area': (x2 - x1) * (y2 - y1), 'height_pixels': y2 - y1})
+        return detections
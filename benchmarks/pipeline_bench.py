@@ -0,0 +1,212 @@
+"""Benchmark tải toàn pipeline (MultiCameraSurveillanceSystem headless) với video giả lập và StubDetector.
+
+Không cần model YOLO, GPU hay mạng. Quét số camera, batch size và FPS của nguồn; mỗi cấu hình chạy hệ thống
+thật (camera worker, BatchProcessor, thread xử lý kết quả, database) và đo latency end-to-end, tỉ lệ frame
+bị bỏ và điểm bão hoà. Chạy từ thư mục gốc của project:
+
+    python -m benchmarks.pipeline_bench --cameras 1 2 4 8 --batch-sizes 4 8 --fps 15 30
+    python -m benchmarks.pipeline_bench --save-baseline
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from BackEnd.MultiCameraSurveillanceSystem import MultiCameraSurveillanceSystem
+from BackEnd.common.DataClass import RetentionPolicy
+from benchmarks import BenchmarkReport
+from benchmarks.StubDetector import StubDetector
+from benchmarks.SyntheticCrowd import SyntheticCrowd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KEY_FIELDS = ("cameras", "batch_size", "fps")
+
+
+def make_video(workdir: str, fps: float, args) -> str:
+    """File video giả lập dùng chung cho mọi camera có cùng FPS (camera lặp lại video)"""
+    path = os.path.join(workdir, f"crowd_{args.people}p_{fps:g}fps.mp4")
+    if not os.path.exists(path):
+        crowd = SyntheticCrowd(args.people, args.width, args.height, seed=args.seed, miss_rate=0, jitter=0)
+        crowd.write_video(path, fps, int(fps * args.video_seconds))
+    return path
+
+
+def write_camera_config(workdir: str, cameras: int, video: str, args) -> str:
+    # Ngưỡng khoảng cách 0: vẫn đo mọi cặp nhưng không sinh vi phạm, không ghi ảnh vào thư mục capture
+    config = {'cameras': [{'camera_id': f"BENCH{i + 1:03d}", 'source': video, 'position': "benchmark",
+                           'enable_recording': False, 'social_distance_threshold': 0.0, 'loop_video': True,
+                           'frame_width': args.width, 'frame_height': args.height, 'bev_config': args.bev_config}
+                          for i in range(cameras)]}
+    path = os.path.join(workdir, "cameras.json")
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+    return path
+
+
+def counters(system) -> dict:
+    workers = dict(system.camera_workers)
+    dropped = Counter({reason: 0 for reason in ("inference_lag", "queue_full", "superseded", "output_full")})
+    for worker in workers.values():
+        dropped["inference_lag"] += worker.skipped_frames
+    for (_, reason), count in system.batch_processor.dropped_snapshot().items():
+        dropped[reason] += count
+    return {'captured': sum(w.frame_count + w.skipped_frames for w in workers.values()),
+            'processed': sum(w.processed_frames for w in workers.values()),
+            'batches': Counter(system.batch_processor.batch_size_snapshot()), 'dropped': dropped}
+
+
+def stage_summary(rows, stage: str) -> dict:
+    """p50 trung vị giữa các camera, p95/p99 của camera chậm nhất (mili giây)"""
+    rows = [row for row in rows if row['stage'] == stage]
+    if not rows:
+        return {f"{stage}_p50_ms": None, f"{stage}_p95_ms": None, f"{stage}_p99_ms": None}
+    return {f"{stage}_p50_ms": float(np.median([row['p50'] for row in rows])) * 1000,
+            f"{stage}_p95_ms": max(row['p95'] for row in rows) * 1000,
+            f"{stage}_p99_ms": max(row['p99'] for row in rows) * 1000}
+
+
+def run_case(cameras: int, batch_size: int, fps: float, workdir: str, args) -> dict:
+    config_file = write_camera_config(workdir, cameras, make_video(workdir, fps, args), args)
+    detector = StubDetector(args.detector_latency / 1000, args.per_frame_latency / 1000)
+    system = MultiCameraSurveillanceSystem(config_file=config_file, batch_size=batch_size, ingestion=args.ingestion,
+                                           watch_config=False, retention=RetentionPolicy(enabled=False),
+                                           detection_cache_path=None, db_path=os.path.join(workdir, "bench.db"),
+                                           detector=detector)
+    system.start()
+    try:
+        time.sleep(args.warmup)
+        # Tắt thread ghi percentile định kỳ để histogram bao trọn khoảng đo
+        system.latency.stop()
+        system.latency.snapshot(reset=True)
+        before = counters(system)
+        started = time.time()
+        time.sleep(args.duration)
+        elapsed = time.time() - started
+        after = counters(system)
+        latency = system.latency.snapshot()
+    finally:
+        system.stop()
+
+    captured = after['captured'] - before['captured']
+    processed = after['processed'] - before['processed']
+    batches = after['batches'] - before['batches']
+    dropped = {reason: after['dropped'][reason] - before['dropped'][reason] for reason in after['dropped']}
+    batch_count = sum(batches.values())
+    row = {'offered_fps': cameras * fps, 'capture_fps': captured / elapsed, 'processed_fps': processed / elapsed,
+           'drop_rate': 1 - processed / captured if captured else None,
+           'dropped': dropped, 'batches': batch_count,
+           'mean_batch_size': sum(size * count for size, count in batches.items()) / batch_count if batch_count else None}
+    row.update(stage_summary(latency, "end_to_end"))
+    row.update(stage_summary(latency, "queue_wait"))
+    row.update(stage_summary(latency, "inference"))
+    return row
+
+
+def saturation(results, args):
+    """Với mỗi (batch_size, fps): số camera lớn nhất còn theo kịp và số camera bắt đầu bão hoà.
+
+    Bão hoà khi xử lý được ít hơn (1 - max_drop) tải đưa vào hoặc p95 end-to-end vượt max_latency.
+    """
+    series = {}
+    for row in results:
+        series.setdefault((row['batch_size'], row['fps']), []).append(row)
+    points = []
+    for (batch_size, fps), rows in sorted(series.items()):
+        sustained, saturated_at = None, None
+        for row in sorted(rows, key=lambda r: r['cameras']):
+            p95 = row['end_to_end_p95_ms']
+            if row['processed_fps'] < (1 - args.max_drop) * row['offered_fps'] or p95 is None \
+                    or p95 > args.max_latency:
+                saturated_at = row['cameras']
+                break
+            sustained = row['cameras']
+        points.append({'batch_size': batch_size, 'fps': fps, 'max_cameras': sustained, 'saturated_at': saturated_at})
+    return points
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tải toàn pipeline với detector giả lập")
+    parser.add_argument("--cameras", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="số camera")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--fps", type=float, nargs="+", default=[15, 30], help="FPS của nguồn video")
+    parser.add_argument("--duration", type=float, default=15.0, help="thời gian đo mỗi cấu hình (giây)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="thời gian chạy trước khi đo (giây)")
+    parser.add_argument("--people", type=int, default=20, help="số người trong video giả lập")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--video-seconds", type=float, default=10.0, help="độ dài video giả lập (được lặp lại)")
+    parser.add_argument("--detector-latency", type=float, default=20.0, help="thời gian cố định mỗi batch (ms)")
+    parser.add_argument("--per-frame-latency", type=float, default=5.0, help="thời gian thêm cho mỗi frame (ms)")
+    parser.add_argument("--ingestion", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--bev-config", default=os.path.join(ROOT, "config", "config_BEV_CAM001.json"),
+                        help="file hiệu chỉnh BEV dùng cho mọi camera")
+    parser.add_argument("--max-drop", type=float, default=0.05,
+                        help="tỉ lệ frame không được xử lý tối đa trước khi coi là bão hoà")
+    parser.add_argument("--max-latency", type=float, default=500.0,
+                        help="p95 end-to-end tối đa (ms) trước khi coi là bão hoà")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "pipeline.json"))
+    parser.add_argument("--baseline", default=os.path.join("benchmarks", "baselines", "pipeline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="ghi kết quả vào file baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="kém baseline quá tỉ lệ này (p95 end-to-end hoặc FPS xử lý) được tính là regression")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pipeline_bench_")
+    results = []
+    try:
+        for fps in args.fps:
+            for batch_size in args.batch_sizes:
+                for cameras in args.cameras:
+                    row = {'cameras': cameras, 'batch_size': batch_size, 'fps': fps,
+                           **run_case(cameras, batch_size, fps, workdir, args)}
+                    results.append(row)
+                    print(f"{cameras:>3} cameras  batch {batch_size:>2}  {fps:g} fps: processed "
+                          f"{row['processed_fps']:.1f}/{row['offered_fps']:g} fps, drop {row['drop_rate'] or 0:.1%}, "
+                          f"end-to-end p95 {row['end_to_end_p95_ms'] or 0:.0f} ms", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    parameters = {name: getattr(args, name) for name in ("people", "width", "height", "detector_latency",
+                                                          "per_frame_latency", "ingestion", "duration", "warmup",
+                                                          "max_drop", "max_latency", "seed")}
+    report = {'suite': "pipeline", 'environment': BenchmarkReport.environment(), 'parameters': parameters,
+              'results': results, 'saturation': saturation(results, args)}
+    BenchmarkReport.save(args.output, report)
+    print(f"Results written to {args.output}\n")
+    BenchmarkReport.print_table(results, KEY_FIELDS + ("offered_fps", "processed_fps", "drop_rate", "mean_batch_size",
+                                                       "end_to_end_p50_ms", "end_to_end_p95_ms"))
+    print()
+    BenchmarkReport.print_table(report['saturation'], ("batch_size", "fps", "max_cameras", "saturated_at"))
+
+    if args.save_baseline:
+        BenchmarkReport.save(args.baseline, report)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = 0
+    for metric, higher_is_better in (("end_to_end_p95_ms", False), ("processed_fps", True)):
+        rows = BenchmarkReport.compare(results, baseline, KEY_FIELDS, metric, args.tolerance, higher_is_better)
+        print(f"\nComparison with {args.baseline} ({metric}):")
+        BenchmarkReport.print_table(rows, KEY_FIELDS + ("baseline", "current", "ratio", "regression"))
+        regressions += sum(row['regression'] for row in rows)
+    if regressions:
+        print(f"\n{regressions} comparison(s) worse than baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Micro-benchmark của PersonTracker và BirdEyeViewTransform với đám đông giả lập (chỉ dùng CPU).
+
+Chạy từ thư mục gốc của project:
+
+    python -m benchmarks.tracker_bench                  # đo và so sánh với baseline nếu đã có
+    python -m benchmarks.tracker_bench --save-baseline  # lưu kết quả làm baseline mới
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+from BackEnd.common.DataClass import CameraConfig
+from BackEnd.core.PersonTracker import PersonTracker
+from benchmarks import BenchmarkReport
+from benchmarks.SyntheticCrowd import SyntheticCrowd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = [10, 50, 100, 250, 500, 1000, 2000]
+KEY_FIELDS = ("benchmark", "calibration", "people")
+DISTANCE_BATCH = 1000  # Số lần gọi calculate_distance trong một mẫu đo
+
+
+def calibrations(camera_ids=None):
+    """camera_id -> đường dẫn các file config_BEV_*.json đi kèm project"""
+    found = {}
+    for path in sorted(glob.glob(os.path.join(ROOT, "config", "config_BEV_*.json"))):
+        camera_id = os.path.basename(path)[len("config_BEV_"):-len(".json")]
+        if not camera_ids or camera_id in camera_ids:
+            found[camera_id] = path
+    return found
+
+
+def make_tracker(camera_id: str, bev_path: str = None, frame_width: int = 1280, frame_height: int = 720):
+    config = CameraConfig(camera_id=camera_id, source="synthetic", position="benchmark", enable_recording=False,
+                          frame_width=frame_width, frame_height=frame_height)
+    # load_config_BEV in thông báo ra stdout, không để lẫn vào bảng kết quả
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracker = PersonTracker(camera_id, config)
+        if bev_path:
+            tracker.bev_config_path = bev_path
+            tracker.reload_bev()
+    return tracker
+
+
+def timed_frames(run_frame, frames: int, time_budget: float):
+    """Gọi ``run_frame`` (trả về thời gian đo được, giây) tối đa ``frames`` lần hoặc tới khi hết ``time_budget``"""
+    samples = []
+    deadline = time.perf_counter() + time_budget
+    while len(samples) < frames and (not samples or time.perf_counter() < deadline):
+        samples.append(run_frame())
+    return samples
+
+
+def bench_update_tracks(people: int, args) -> dict:
+    crowd = SyntheticCrowd(people, seed=args.seed)
+    tracker = make_tracker("BENCH")
+    tracker.update_tracks(crowd.to_detections(crowd.step()))  # Frame đầu chỉ tạo track mới
+
+    def run_frame():
+        detections = crowd.to_detections(crowd.step())
+        started = time.perf_counter()
+        tracker.update_tracks(detections)
+        return time.perf_counter() - started
+
+    samples = timed_frames(run_frame, args.frames, args.time_budget)
+    row = BenchmarkReport.summarize(samples)
+    row.update({'unit': "frame", 'per_person_us': row['mean_ms'] * 1000 / people, 'tracks': len(tracker.tracks)})
+    return row
+
+
+def bench_monitor(camera_id: str, bev_path: str, people: int, args) -> dict:
+    crowd = SyntheticCrowd(people, seed=args.seed)
+    tracker = make_tracker(camera_id, bev_path)
+    frame = np.zeros((crowd.frame_height, crowd.frame_width, 3), dtype=np.uint8)
+    stage_times = []
+
+    def run_frame():
+        tracker.update_tracks(crowd.to_detections(crowd.step()))
+        frame[:] = 0
+        started = time.perf_counter()
+        tracker.monitor_distances_and_draw(frame)
+        elapsed = time.perf_counter() - started
+        stage_times.append(tracker.stage_times)
+        return elapsed
+
+    run_frame()  # Lần đầu còn tạo lịch sử khoảng cách cho mọi cặp
+    stage_times.clear()
+    samples = timed_frames(run_frame, args.frames, args.time_budget)
+    row = BenchmarkReport.summarize(samples)
+    pairs = tracker.active_track_count * (tracker.active_track_count - 1) // 2
+    row.update({'unit': "frame", 'pairs': pairs, 'per_pair_us': row['mean_ms'] * 1000 / pairs if pairs else None,
+                'distance_ms': float(np.mean([t['distance'] for t in stage_times])) * 1000,
+                'render_ms': float(np.mean([t['render'] for t in stage_times])) * 1000})
+    return row
+
+
+def bench_calculate_distance(camera_id: str, bev_path: str, people: int, args) -> dict:
+    crowd = SyntheticCrowd(people, seed=args.seed, miss_rate=0)
+    bev = make_tracker(camera_id, bev_path).bev_distance
+    boxes = crowd.step()
+    legs = [(float((x1 + x2) / 2), float(y2)) for x1, _, x2, y2, _ in boxes]
+    rng = np.random.default_rng(args.seed)
+    pairs = rng.integers(0, len(legs), size=(DISTANCE_BATCH, 2))
+
+    def run_batch():
+        started = time.perf_counter()
+        for i, j in pairs:
+            bev.calculate_distance(legs[i], legs[j])
+        return time.perf_counter() - started
+
+    run_batch()
+    samples = timed_frames(run_batch, args.frames, args.time_budget)
+    row = BenchmarkReport.summarize(samples)
+    per_call_ms = row['mean_ms'] / DISTANCE_BATCH
+    # Thời gian nếu đo mọi cặp của một frame bằng calculate_distance như monitor_distances_and_draw đang làm
+    row.update({'unit': f"{DISTANCE_BATCH} calls", 'per_call_us': per_call_ms * 1000,
+                'all_pairs_ms': per_call_ms * people * (people - 1) / 2})
+    return row
+
+
+def scaling(results):
+    """Số mũ k trong thời gian ~ people^k của từng benchmark (hồi quy log-log, bỏ các đám đông < 50 người)"""
+    series = {}
+    for row in results:
+        if row['people'] >= 50:
+            series.setdefault((row['benchmark'], row['calibration']), []).append((row['people'], row['p50_ms']))
+    fits = []
+    for (benchmark, calibration), points in series.items():
+        if len(points) < 2:
+            continue
+        people, times = zip(*points)
+        exponent = np.polyfit(np.log(people), np.log(times), 1)[0]
+        fits.append({'benchmark': benchmark, 'calibration': calibration, 'exponent': float(exponent),
+                     'from_people': min(people), 'to_people': max(people)})
+    return fits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark tracking và đo khoảng cách với đám đông giả lập")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="số người trong đám đông")
+    parser.add_argument("--calibrations", nargs="+", metavar="CAMERA_ID",
+                        help="chỉ dùng các file config_BEV_<CAMERA_ID>.json này (mặc định: tất cả)")
+    parser.add_argument("--benchmarks", nargs="+", default=["update_tracks", "monitor", "calculate_distance"],
+                        choices=["update_tracks", "monitor", "calculate_distance"])
+    parser.add_argument("--frames", type=int, default=30, help="số mẫu đo tối đa của mỗi trường hợp")
+    parser.add_argument("--time-budget", type=float, default=15.0,
+                        help="thời gian đo tối đa của mỗi trường hợp (giây, luôn có ít nhất một mẫu)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "tracker.json"))
+    parser.add_argument("--baseline", default=os.path.join("benchmarks", "baselines", "tracker.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="ghi kết quả vào file baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="chậm hơn baseline quá tỉ lệ này (theo p50) được tính là regression")
+    args = parser.parse_args()
+
+    bev_files = calibrations(args.calibrations)
+    if not bev_files and set(args.benchmarks) - {"update_tracks"}:
+        parser.error("no config_BEV_*.json calibration found")
+    cases = []
+    for people in args.sizes:
+        if "update_tracks" in args.benchmarks:
+            cases.append(("update_tracks", None, people, lambda p=people: bench_update_tracks(p, args)))
+        for camera_id, path in bev_files.items():
+            if "monitor" in args.benchmarks:
+                cases.append(("monitor_distances_and_draw", camera_id, people,
+                              lambda c=camera_id, f=path, p=people: bench_monitor(c, f, p, args)))
+            if "calculate_distance" in args.benchmarks:
+                cases.append(("calculate_distance", camera_id, people,
+                              lambda c=camera_id, f=path, p=people: bench_calculate_distance(c, f, p, args)))
+
+    results = []
+    for benchmark, calibration, people, run in cases:
+        row = {'benchmark': benchmark, 'calibration': calibration, 'people': people, **run()}
+        results.append(row)
+        print(f"{benchmark:<28} {calibration or '-':<8} {people:>5} people  p50 {row['p50_ms']:10.3f} ms / "
+              f"{row['unit']}  ({row['samples']} samples)", file=sys.stderr)
+
+    report = {'suite': "tracker", 'environment': BenchmarkReport.environment(),
+              'parameters': {'sizes': args.sizes, 'frames': args.frames, 'seed': args.seed,
+                             'calibrations': sorted(bev_files)},
+              'results': results, 'scaling': scaling(results)}
+    BenchmarkReport.save(args.output, report)
+    print(f"Results written to {args.output}\n")
+    BenchmarkReport.print_table(report['scaling'], ("benchmark", "calibration", "exponent", "from_people",
+                                                    "to_people"))
+
+    if args.save_baseline:
+        BenchmarkReport.save(args.baseline, report)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows = BenchmarkReport.compare(results, baseline, KEY_FIELDS, tolerance=args.tolerance)
+    print(f"\nComparison with {args.baseline} (p50, ms):")
+    BenchmarkReport.print_table(rows, KEY_FIELDS + ("baseline", "current", "ratio", "regression"))
+    regressions = [row for row in rows if row['regression']]
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -1,13 +1,40 @@
-from FontEnd import gui_app
+import argparse
+import sys
 import warnings
 import logging
-import torch
-torch.cuda.empty_cache()     # Giải phóng bộ nhớ không còn dùng trong cache
-torch.cuda.ipc_collect()     # Thu gom các vùng nhớ IPC bị rò rỉ (ít người biết nhưng rất hữu ích)
-torch.backends.cudnn.benchmark = True     # Tối ưu kernel cho batch size cố định
-torch.backends.cudnn.fastest = True       # Ưu tiên thuật toán nhanh nhất
+# torch và model YOLO được import/nạp lười ở background trong BatchProcessor để cửa sổ mở ngay
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Hệ thống giám sát khoảng cách xã hội đa camera")
+    parser.add_argument("--headless", action="store_true", help="chạy không có giao diện (không cần PyQt5)")
+    parser.add_argument("--config", default="config/cameras.json", help="file cấu hình camera")
+    parser.add_argument("--columnar-log", metavar="DIR",
+                        help="(headless) lưu toàn bộ detection và track dạng cột để phân tích offline")
+    parser.add_argument("--audio", action="store_true",
+                        help="phát cảnh báo âm thanh (giọng đọc edge-tts cần mạng, không có mạng thì phát tiếng bíp)")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="mở endpoint Prometheus http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--detection-cache", metavar="PATH",
+                        help="cache kết quả YOLO của camera là file video vào PATH, video lặp lại (loop_video) không "
+                             "phải chạy inference lại mỗi vòng")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="ghi timeline từng frame/batch từ lúc khởi động, xuất ra FILE (Chrome trace) khi thoát")
+    parser.add_argument("--vacuum-db", nargs="?", const="surveillance.db", metavar="PATH",
+                        help="chuyển database cũ sang auto_vacuum=INCREMENTAL (VACUUM toàn bộ, chạy khi hệ thống "
+                             "đang dừng) rồi thoát")
+    args = parser.parse_args()
+
     warnings.filterwarnings("ignore", category=FutureWarning, message=".*torch.cuda.amp.autocast.*")
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    gui_app.main()
\ No newline at end of file
+    if args.vacuum_db:
+        from BackEnd.data.DatabaseManager import DatabaseManager
+        DatabaseManager.enable_incremental_vacuum(args.vacuum_db)
+    elif args.headless:
+        from BackEnd.HeadlessRunner import run_headless
+        sys.exit(run_headless(config_file=args.config, columnar_log_dir=args.columnar_log, alert_audio=args.audio,
+                              metrics_port=args.metrics_port, trace_file=args.trace,
+                              detection_cache_path=args.detection_cache))
+    else:
+        from FontEnd import gui_app
+        gui_app.main(config_file=args.config, metrics_port=args.metrics_port, trace_file=args.trace,
+                     alert_audio=args.audio, detection_cache_path=args.detection_cache)
@@ -0,0 +1,59 @@
+import argparse
+import json
+import logging
+import warnings
+from datetime import datetime
+
+from BackEnd.VideoReplay import VideoReplay
+from BackEnd.data.DatabaseManager import DatabaseManager
+from BackEnd.data.DetectionCache import DetectionCache
+
+
+def parse_video(value: str):
+    camera_id, sep, path = value.partition("=")
+    if not sep or not camera_id or not path:
+        raise argparse.ArgumentTypeError(f"expected CAMERA_ID=PATH, got '{value}'")
+    return camera_id, path
+
+
+def parse_start_time(value: str):
+    camera_id, sep, start = value.partition("=")
+    try:
+        if not sep or not camera_id:
+            raise ValueError
+        return camera_id, datetime.fromisoformat(start).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected CAMERA_ID=YYYY-MM-DDTHH:MM:SS, got '{value}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Phân tích lại video lưu trữ nhanh nhất có thể (không giữ nhịp thời gian thực)")
+    parser.add_argument("videos", nargs="+", type=parse_video,
+                        help="danh sách CAMERA_ID=PATH; CAMERA_ID chọn file hiệu chỉnh BEV và ngưỡng trong cameras.json")
+    parser.add_argument("--config", default="config/cameras.json", help="file cấu hình camera")
+    parser.add_argument("--batch-size", type=int, default=16, help="số frame mỗi batch inference")
+    parser.add_argument("--db", default="surveillance.db", help="đường dẫn database SQLite")
+    parser.add_argument("--columnar-log", metavar="DIR",
+                        help="lưu toàn bộ detection và track của từng frame dạng cột vào thư mục này")
+    parser.add_argument("--detection-cache", default="detection_cache.db", metavar="PATH",
+                        help="cache detection trên đĩa, lần phân tích sau của cùng video không cần chạy lại YOLO")
+    parser.add_argument("--start-time", type=parse_start_time, action="append", default=[],
+                        metavar="CAMERA_ID=YYYY-MM-DDTHH:MM:SS",
+                        help="thời điểm bắt đầu quay của video; mặc định suy ra từ thời gian sửa file trừ độ dài video")
+    parser.add_argument("--no-detection-cache", action="store_true", help="luôn chạy YOLO, không dùng cache")
+    args = parser.parse_args()
+
+    detection_cache = None if args.no_detection_cache else DetectionCache(args.detection_cache)
+    replay = VideoReplay(args.videos, config_file=args.config, batch_size=args.batch_size,
+                         db_manager=DatabaseManager(args.db), columnar_log_dir=args.columnar_log,
+                         detection_cache=detection_cache, start_times=dict(args.start_time))
+    report = replay.run()
+    if detection_cache:
+        detection_cache.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    warnings.filterwarnings("ignore", category=FutureWarning, message=".*torch.cuda.amp.autocast.*")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()